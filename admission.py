@@ -0,0 +1,229 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# 优先级：数值越小越先获得执行机会
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+class AdmissionRejected(Exception):
+    """请求被准入控制拒绝（限流、排队已满或排队超时）"""
+
+    def __init__(self, reason: str, status_code: int = 503, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    def retry_after_header(self) -> str:
+        """Retry-After响应头的值（整数秒，至少为1）"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """令牌桶：以固定速率补充令牌，允许一定的突发"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def try_acquire(self) -> Tuple[bool, float]:
+        """尝试取一个令牌，返回 (是否成功, 需要等待的秒数)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        if self.rate <= 0:
+            return False, 60.0
+        return False, (1 - self.tokens) / self.rate
+
+
+class ClientRateLimiter:
+    """按客户端维护令牌桶，只保留最近活跃的客户端"""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def check(self, client_id: str) -> None:
+        """检查客户端是否超出速率限制，超出时抛出429"""
+        if self.rate <= 0:
+            return
+
+        with self._lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[client_id] = bucket
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client_id)
+
+            allowed, wait = bucket.try_acquire()
+            if not allowed:
+                self.limited += 1
+
+        if not allowed:
+            raise AdmissionRejected("请求过于频繁", status_code=429, retry_after=wait)
+
+
+class _Waiter:
+    """排队中的请求"""
+    __slots__ = ('event', 'granted', 'cancelled', 'client_id')
+
+    def __init__(self, client_id: str):
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+        self.client_id = client_id
+
+
+class ConcurrencyGate:
+    """有界并发闸门：超出并发上限的请求按优先级和客户端轮转公平排队
+
+    同一优先级内，每个客户端的第n个排队请求排在所有客户端的第n-1个之后，
+    避免单个客户端的突发请求占满队列。
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        self._client_waiting: Dict[str, int] = {}
+        self._active = 0
+        self._queued = 0
+
+        # 平均占用时间（指数滑动平均），用于估算Retry-After
+        self._avg_hold = 1.0
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    @contextmanager
+    def slot(self, client_id: str = "", priority: int = PRIORITY_INTERACTIVE,
+             timeout: Optional[float] = None) -> Iterator[None]:
+        """占用一个并发名额，退出时释放"""
+        self.acquire(client_id, priority, timeout)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def acquire(self, client_id: str = "", priority: int = PRIORITY_INTERACTIVE,
+                timeout: Optional[float] = None) -> None:
+        """获取并发名额，队列已满或排队超时抛出AdmissionRejected"""
+        if timeout is None:
+            timeout = self.queue_timeout
+
+        with self._lock:
+            if self._active < self.max_concurrent and self._queued == 0:
+                self._active += 1
+                self.admitted += 1
+                return
+
+            if self._queued >= self.max_queue or timeout <= 0:
+                self.rejected += 1
+                raise AdmissionRejected(f"{self.name}服务繁忙，排队已满",
+                                        retry_after=self._estimate_wait_locked())
+
+            client_round = self._client_waiting.get(client_id, 0)
+            self._client_waiting[client_id] = client_round + 1
+            waiter = _Waiter(client_id)
+            heapq.heappush(self._heap, (priority, client_round, next(self._seq), waiter))
+            self._queued += 1
+
+        waiter.event.wait(timeout)
+
+        with self._lock:
+            if waiter.granted:
+                self.admitted += 1
+                return
+            # 超时：标记取消，由release时惰性跳过
+            waiter.cancelled = True
+            self._queued -= 1
+            self._leave_queue_locked(client_id)
+            self.timeouts += 1
+            retry_after = self._estimate_wait_locked()
+
+        raise AdmissionRejected(f"{self.name}服务繁忙，排队超时", retry_after=retry_after)
+
+    def try_acquire(self) -> bool:
+        """有空闲名额且没有排队的请求时立即占用一个名额，否则返回False（不排队，不计入拒绝数）"""
+        with self._lock:
+            if self._active < self.max_concurrent and self._queued == 0:
+                self._active += 1
+                self.admitted += 1
+                return True
+            return False
+
+    def release(self, held_seconds: float = 0.0) -> None:
+        """释放名额，优先直接转交给队首请求"""
+        with self._lock:
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * held_seconds
+
+            while self._heap:
+                _, _, _, waiter = heapq.heappop(self._heap)
+                if waiter.cancelled:
+                    continue
+                waiter.granted = True
+                self._queued -= 1
+                self._leave_queue_locked(waiter.client_id)
+                waiter.event.set()
+                return
+
+            self._active -= 1
+
+    def queue_fill(self) -> float:
+        """排队数占队列上限的比例"""
+        with self._lock:
+            return self._queued / self.max_queue if self.max_queue else 1.0
+
+    def _leave_queue_locked(self, client_id: str) -> None:
+        """更新客户端排队计数"""
+        remaining = self._client_waiting.get(client_id, 1) - 1
+        if remaining > 0:
+            self._client_waiting[client_id] = remaining
+        else:
+            self._client_waiting.pop(client_id, None)
+
+    def _estimate_wait_locked(self) -> float:
+        """估算队列排空所需时间"""
+        return self._avg_hold * (self._queued + 1) / self.max_concurrent
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取闸门统计信息"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'active': self._active,
+                'queued': self._queued,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'avg_hold_seconds': round(self._avg_hold, 3)
+            }
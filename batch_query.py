@@ -0,0 +1,140 @@
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO
+
+from config import *
+from admission import AdmissionRejected, PRIORITY_BACKGROUND
+from deadline import Deadline
+from partitions import LANGUAGE_AUTO
+
+# 批量任务在准入控制中使用的客户端ID
+BATCH_CLIENT_ID = "batch"
+
+
+def iter_questions(path: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取问题，跳过空行和#开头的注释
+
+    每行可以是纯文本问题，也可以是JSON对象（query字段为问题，可选source、language、mode、id）。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                item = json.loads(line)
+            else:
+                item = {'query': line}
+            item.setdefault('id', line_number)
+            yield item
+
+
+class BatchRunner:
+    """以有限并发批量执行问题，结果逐条写入JSONL文件
+
+    同时在处理中的问题不超过concurrency的两倍，内存占用与问题总数无关；
+    结果按完成顺序写入，用id字段（默认为输入行号）对应原问题。
+    """
+
+    def __init__(self, rag, concurrency: int = BATCH_CONCURRENCY, retrieval_only: bool = False,
+                 mode: str = ANSWER_MODE, source: str = "", language: str = LANGUAGE_AUTO,
+                 client_id: str = BATCH_CLIENT_ID):
+        self.rag = rag
+        self.client_id = client_id
+        self.concurrency = max(1, concurrency)
+        self.retrieval_only = retrieval_only
+        self.mode = mode
+        self.source = source
+        self.language = language
+
+    def run(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """执行问题文件中的全部问题，返回汇总统计"""
+        with open(output_path, 'w', encoding='utf-8') as output:
+            return self.run_items(iter_questions(input_path), output)
+
+    def run_items(self, items: Iterable[Dict[str, Any]], output: Optional[TextIO] = None) -> Dict[str, Any]:
+        """执行给定的问题，output为None时只统计不输出结果（缓存预热使用）"""
+        stats = {'total': 0, 'failed': 0}
+        started = time.perf_counter()
+        pending = set()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=self.client_id) as executor:
+            for item in items:
+                if len(pending) >= self.concurrency * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._write(output, done, stats)
+                pending.add(executor.submit(self._process, item))
+            done, _ = wait(pending)
+            self._write(output, done, stats)
+
+        elapsed = time.perf_counter() - started
+        stats['elapsed_seconds'] = round(elapsed, 2)
+        stats['questions_per_second'] = round(stats['total'] / elapsed, 2) if elapsed > 0 else 0.0
+        return stats
+
+    @staticmethod
+    def _write(output: Optional[TextIO], done, stats: Dict[str, Any]) -> None:
+        for future in done:
+            record = future.result()
+            stats['total'] += 1
+            if not record['success']:
+                stats['failed'] += 1
+            if output is not None:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if output is not None:
+            output.flush()
+
+    def _process(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """处理一个问题，被准入控制拒绝时等待后重试，其他错误记录在结果中"""
+        started = time.perf_counter()
+        record = {'id': item['id'], 'query': item['query']}
+        for attempt in range(BATCH_MAX_RETRIES + 1):
+            try:
+                if self.retrieval_only:
+                    record.update(self._retrieve(item))
+                else:
+                    record.update(self._answer(item))
+                break
+            except AdmissionRejected as e:
+                if attempt == BATCH_MAX_RETRIES:
+                    record.update({'success': False, 'error': e.reason, 'timings': {}})
+                else:
+                    time.sleep(e.retry_after)
+            except Exception as e:
+                print(f"批量处理问题 {item['id']} 时出错: {e}")
+                record.update({'success': False, 'error': str(e), 'timings': {}})
+                break
+        record['timings']['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return record
+
+    def _retrieve(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        timings = {}
+        degraded = []
+        hits, filters = self.rag.retrieve(item['query'], Deadline(REQUEST_TIMEOUT_SECONDS),
+                                          item.get('source', self.source), item.get('language', self.language),
+                                          timings, degraded)
+        return {
+            'success': bool(hits),
+            'hits': [{'id': hit.id, 'source': hit.source, 'header': hit.header, 'similarity': hit.similarity}
+                     for hit in hits],
+            'filters': filters,
+            'degraded': degraded,
+            'timings': timings
+        }
+
+    def _answer(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        result = self.rag.generate_response(item['query'], client_id=self.client_id, priority=PRIORITY_BACKGROUND,
+                                            mode=item.get('mode', self.mode),
+                                            source=item.get('source', self.source),
+                                            language=item.get('language', self.language))
+        return {
+            'success': result['success'],
+            'response': result['response'],
+            'mode': result.get('mode'),
+            'sources': [source.to_dict() for source in result['sources']],
+            'filters': result.get('filters'),
+            'degraded': result.get('degraded', []),
+            'error': result.get('reason'),
+            'timings': dict(result.get('timings', {}))
+        }
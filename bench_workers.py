@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Web服务吞吐量随worker进程数变化的基准测试
+在本地启动Chroma服务和模拟上游，用哈希嵌入在独立目录中建立测试索引（首次运行时构建），
+再依次以不同的worker数启动Web服务：各worker为只读副本，通过HTTP共享同一个Chroma服务中的索引。
+每轮以固定并发持续发送互不相同的查询（不命中缓存），报告吞吐量、延迟和错误数
+
+用法:
+    python bench_workers.py                                      # worker数 1,2,4，并发16，每轮20秒
+    python bench_workers.py --workers 1,2,4,8 --concurrency 32 --duration 30
+    python bench_workers.py --embedding-delay 0.05 --mode extractive --json bench.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+import requests
+
+import config
+from replay_queries import apply_stub_config, free_port, percentiles
+
+# 主进程通过该环境变量把测试配置传给worker进程
+BENCH_ENV = "MCP_KB_BENCH_SETTINGS"
+
+
+def apply_settings(settings: Dict[str, Any]) -> None:
+    """把测试配置写入config模块，必须在导入web_interface、rag_system等模块之前调用
+
+    其他模块通过 from config import * 在导入时读取配置，之后修改config不再生效。
+    """
+    apply_stub_config(settings['db_path'], settings['embedding_url'], settings['llm_url'])
+    config.CHROMA_MODE = "http"
+    config.CHROMA_HOST = "127.0.0.1"
+    config.CHROMA_PORT = settings['chroma_port']
+    # 只测量服务本身的处理能力：不限流（apply_stub_config已关闭预热）
+    config.CLIENT_RATE_LIMIT = 0
+
+
+def create_app():
+    """uvicorn的应用工厂，在每个worker进程中调用：先应用测试配置，再导入Web应用"""
+    apply_settings(json.loads(os.environ[BENCH_ENV]))
+    import web_interface
+    return web_interface.app
+
+
+def wait_until_ready(url: str, timeout: float = 120) -> bool:
+    """等待服务可以响应请求"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def start_chroma_server(path: str, port: int) -> subprocess.Popen:
+    """在本地启动Chroma服务（chroma run），日志写入path下的chroma.log"""
+    os.makedirs(path, exist_ok=True)
+    log = open(os.path.join(path, "chroma.log"), 'ab')
+    process = subprocess.Popen(["chroma", "run", "--path", path, "--host", "127.0.0.1", "--port", str(port)],
+                               stdout=log, stderr=subprocess.STDOUT)
+    if not wait_until_ready(f"http://127.0.0.1:{port}/api/v2/heartbeat"):
+        process.terminate()
+        raise RuntimeError(f"Chroma服务启动失败，请查看 {path}/chroma.log")
+    return process
+
+
+def build_index() -> Dict[str, Any]:
+    """测试索引为空时用模拟嵌入构建（在主进程中以写入节点身份执行）"""
+    from rag_system import RAGSystem
+    rag = RAGSystem()
+    rag.warm_up_enabled = False
+    info = rag.get_knowledge_base_info()
+    if info.get('document_count', 0) == 0:
+        print("构建基准测试用的模拟索引...")
+        rag.build_knowledge_base(clear_existing=True, resume=False, warm_up=False)
+        info = rag.get_knowledge_base_info()
+    return info
+
+
+def load_queries(paths: List[str]) -> List[str]:
+    """基准测试使用的问题（常见问题和检索评估问题）"""
+    from batch_query import iter_questions
+    queries = []
+    for path in paths:
+        if os.path.exists(path):
+            queries.extend(item['query'] for item in iter_questions(path))
+    return queries or ["What is MCP?"]
+
+
+def run_load(url: str, queries: List[str], concurrency: int, duration: float, mode: str) -> Dict[str, Any]:
+    """以concurrency个并发连接持续发送请求duration秒，每个请求的问题都不相同，不会命中缓存"""
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+    errors = []
+    unanswered = [0]
+    deadline = time.perf_counter() + duration
+
+    def client(index: int) -> None:
+        session = requests.Session()
+        # 每个并发连接使用不同的客户端标识
+        headers = {"X-Forwarded-For": f"10.0.{index // 256}.{index % 256}"}
+        while time.perf_counter() < deadline:
+            n = next(counter)
+            data = {"message": f"{queries[n % len(queries)]} #{n}", "mode": mode}
+            started = time.perf_counter()
+            try:
+                response = session.post(f"{url}/chat", data=data, headers=headers, timeout=60)
+                reason = None if response.status_code == 200 else f"HTTP {response.status_code}"
+                answered = reason is None and response.json().get('success')
+            except (requests.RequestException, ValueError) as e:
+                reason = type(e).__name__
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if reason is None:
+                    # 知识库中没有相关内容的问题同样完成了完整的检索流程，计入吞吐量
+                    latencies.append(elapsed)
+                    unanswered[0] += not answered
+                else:
+                    errors.append(reason)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies) + len(errors),
+        'unanswered': unanswered[0],
+        'errors': len(errors),
+        'error_reasons': sorted(set(errors)),
+        'throughput': round(len(latencies) / elapsed, 1),
+        'latency_ms': percentiles(latencies)
+    }
+
+
+def bench_workers(workers: int, settings: Dict[str, Any], queries: List[str], args) -> Dict[str, Any]:
+    """以workers个进程启动Web服务，预热一轮后测量吞吐量"""
+    port = free_port()
+    env = dict(os.environ)
+    env[BENCH_ENV] = json.dumps(settings)
+    env[config.READ_ONLY_ENV] = "1"
+    server = subprocess.Popen([sys.executable, __file__, "--serve", "--port", str(port),
+                               "--serve-workers", str(workers)], env=env)
+    try:
+        url = f"http://127.0.0.1:{port}"
+        if not wait_until_ready(f"{url}/info"):
+            raise RuntimeError(f"{workers} 个worker的Web服务启动失败")
+        # 各worker的连接池、词法分词器等在首批请求中初始化，不计入结果
+        run_load(url, queries, args.concurrency, min(3.0, args.duration), args.mode)
+        result = run_load(url, queries, args.concurrency, args.duration, args.mode)
+        result['workers'] = workers
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"\n{'workers':>8} {'req/s':>8} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    base = results[0]['throughput'] if results and results[0]['throughput'] else None
+    for result in results:
+        latency = result['latency_ms']
+        speedup = f"{result['throughput'] / base:.2f}x" if base else "-"
+        print(f"{result['workers']:>8} {result['throughput']:>8} {speedup:>8} {latency.get('p50', '-'):>8} "
+              f"{latency.get('p95', '-'):>8} {latency.get('p99', '-'):>8} {result['errors']:>7}")
+    print(f"\nCPU核数: {os.cpu_count()}（worker数超过核数后吞吐量不再增加）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web服务吞吐量随worker进程数变化的基准测试')
+    parser.add_argument('--workers', default="1,2,4", help='依次测试的worker数，逗号分隔')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发连接数')
+    parser.add_argument('--duration', type=float, default=20, help='每轮测量的秒数')
+    parser.add_argument('--mode', default="llm", help='回答模式：auto / llm / extractive')
+    parser.add_argument('--db-path', default="./chroma_db_bench", help='测试索引目录（Chroma服务数据和旁路存储）')
+    parser.add_argument('--embedding-delay', type=float, default=0.0, help='模拟嵌入接口耗时（秒）')
+    parser.add_argument('--llm-delay', type=float, default=0.0, help='模拟LLM接口耗时（秒）')
+    parser.add_argument('--json', help='结果写入JSON文件')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--serve-workers', type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        # 由bench_workers在子进程中调用，多worker时uvicorn需要以导入字符串指定应用
+        import uvicorn
+        uvicorn.run("bench_workers:create_app", factory=True, host="127.0.0.1", port=args.port,
+                    workers=args.serve_workers, log_level="warning")
+        return
+
+    from stub_upstream import StubUpstream
+    stub = StubUpstream(embedding_delay=args.embedding_delay, llm_delay=args.llm_delay).start()
+    chroma_port = free_port()
+    chroma = start_chroma_server(os.path.join(args.db_path, "chroma"), chroma_port)
+    try:
+        settings = {
+            'db_path': args.db_path,
+            'chroma_port': chroma_port,
+            'embedding_url': stub.embedding_url,
+            'llm_url': stub.llm_url
+        }
+        apply_settings(settings)
+        info = build_index()
+        print(f"测试索引: {info.get('document_count', 0)} 个文本块，Chroma服务 127.0.0.1:{chroma_port}")
+        queries = load_queries([config.WARMUP_QUERIES_PATH, "eval_questions.jsonl"])
+
+        results = []
+        for workers in [int(n) for n in args.workers.split(",") if n.strip()]:
+            print(f"\n测试 {workers} 个worker，并发 {args.concurrency}，持续 {args.duration} 秒...")
+            result = bench_workers(workers, settings, queries, args)
+            print(f"吞吐量 {result['throughput']} req/s，延迟 {result['latency_ms']}，错误 {result['errors']}")
+            results.append(result)
+
+        print_results(results)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({'results': results, 'upstream': stub.get_stats(), 'args': vars(args)},
+                          f, ensure_ascii=False, indent=2)
+    finally:
+        chroma.terminate()
+        chroma.wait(timeout=30)
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
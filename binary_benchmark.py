@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+二值量化检索基准测试
+对比ChromaDB(HNSW)与二值编码汉明预筛 + 全精度重排两种引擎的
+每向量常驻内存、查询吞吐(QPS)和 recall@k（以暴力检索为基准）
+二值引擎与线上一样从FullVectorStore的内存映射文件读取候选的全精度向量，QPS包含这部分读取
+（文件刚写入，在操作系统页缓存中，不含冷读磁盘的耗时）
+
+用法:
+    python binary_benchmark.py                          # 使用现有知识库中的向量
+    python binary_benchmark.py --synthetic 100000 --dim 1024
+    python binary_benchmark.py --candidates 5 10 20 --json binary.json
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import chromadb
+from chromadb.config import Settings
+
+from config import *
+from vector_store import collection_metadata
+from binary_index import pack_signs, hamming_distances, cosine_rescore
+from full_vector_store import FullVectorStore
+from hnsw_sweep import load_store_vectors, synthetic_vectors, brute_force_top_k
+
+
+def recall(found: List[List[int]], truth: np.ndarray, k: int) -> float:
+    """recall@k"""
+    hits = sum(len(set(rows) & set(expected.tolist())) for rows, expected in zip(found, truth))
+    return round(hits / (len(truth) * k), 4)
+
+
+def bench_chroma(corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int) -> Dict[str, Any]:
+    """ChromaDB HNSW检索"""
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False, allow_reset=True))
+    collection = client.create_collection(name="binary_benchmark", metadata=collection_metadata(coarse_dim=0))
+    ids = [str(i) for i in range(len(corpus))]
+    for offset in range(0, len(corpus), MIGRATION_BATCH_SIZE):
+        collection.add(ids=ids[offset:offset + MIGRATION_BATCH_SIZE],
+                       embeddings=corpus[offset:offset + MIGRATION_BATCH_SIZE].tolist())
+
+    found = []
+    started = time.perf_counter()
+    for query in queries:
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        found.append([int(doc_id) for doc_id in result['ids'][0]])
+    elapsed = time.perf_counter() - started
+    client.reset()
+
+    # 常驻内存：float32向量 + HNSW第0层邻接表（2*M个int32）
+    return {
+        'engine': 'chroma',
+        'bytes_per_vector': corpus.shape[1] * 4 + 2 * HNSW_M * 4,
+        'mmap_bytes_per_vector': 0,
+        'qps': round(len(queries) / elapsed, 1),
+        f'recall@{k}': recall(found, truth, k)
+    }
+
+
+def bench_binary(corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int,
+                 candidates: int) -> Dict[str, Any]:
+    """二值编码汉明预筛 + 全精度重排（全精度向量从FullVectorStore读取）"""
+    codes = pack_signs(corpus)
+    count = min(k * candidates, len(corpus))
+
+    path = tempfile.mkdtemp(prefix="binary_benchmark_")
+    try:
+        FullVectorStore(path).add([str(i) for i in range(len(corpus))], corpus)
+        full_vectors = FullVectorStore(path)
+
+        found = []
+        started = time.perf_counter()
+        for query in queries:
+            distances = hamming_distances(codes, pack_signs(query)[0])
+            rows = np.sort(np.argpartition(distances, count - 1)[:count])
+            vectors = np.stack(full_vectors.get([str(row) for row in rows]))
+            ranked = cosine_rescore(query, vectors, k)
+            found.append([int(rows[i]) for i, _ in ranked])
+        elapsed = time.perf_counter() - started
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    # 常驻内存只有编码，全精度向量按候选从内存映射文件中读取
+    return {
+        'engine': f'binary(x{candidates})',
+        'bytes_per_vector': int(codes.shape[1] * 8),
+        'mmap_bytes_per_vector': corpus.shape[1] * 4,
+        'qps': round(len(queries) / elapsed, 1),
+        f'recall@{k}': recall(found, truth, k)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='二值量化检索基准：内存 / QPS / recall@k')
+    parser.add_argument('--synthetic', type=int, default=0, help='使用N个随机向量代替现有知识库')
+    parser.add_argument('--dim', type=int, default=1024, help='随机向量维度')
+    parser.add_argument('--queries', type=int, default=200, help='查询数量')
+    parser.add_argument('--k', type=int, default=TOP_K_RESULTS, help='计算recall@k的k')
+    parser.add_argument('--candidates', type=int, nargs='+', default=[BINARY_CANDIDATES],
+                        help='二值预筛候选数为 k 的倍数（可给多个）')
+    parser.add_argument('--skip-chroma', action='store_true', help='不测ChromaDB（大规模时建索引较慢）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic + args.queries, args.dim, args.seed)
+    else:
+        vectors = load_store_vectors()
+    if len(vectors) <= args.queries + args.k:
+        print(f"❌ 向量数量不足: {len(vectors)}")
+        return
+
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(vectors))
+    queries = vectors[order[:args.queries]]
+    queries = queries + 0.05 * np.std(queries) * rng.normal(size=queries.shape).astype(np.float32)
+    corpus = np.ascontiguousarray(vectors[order[args.queries:]])
+
+    print(f"语料: {len(corpus)} 个向量, 维度 {corpus.shape[1]}, 查询: {len(queries)}, k={args.k}")
+    truth = brute_force_top_k(corpus, queries, args.k, "cosine")
+
+    results = []
+    if not args.skip_chroma:
+        results.append(bench_chroma(corpus, queries, truth, args.k))
+    for candidates in args.candidates:
+        results.append(bench_binary(corpus, queries, truth, args.k, candidates))
+
+    header = f"{'engine':<14} {'bytes/vec':>10} {'mmap/vec':>10} {'qps':>10} {'recall@' + str(args.k):>10}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(f"{row['engine']:<14} {row['bytes_per_vector']:>10} {row['mmap_bytes_per_vector']:>10} "
+              f"{row['qps']:>10.1f} {row[f'recall@{args.k}']:>10.4f}")
+    print("bytes/vec: 常驻内存；mmap/vec: 按需从内存映射文件读取的全精度向量（QPS在页缓存已预热时测得）")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'corpus_size': len(corpus),
+                'dim': int(corpus.shape[1]),
+                'queries': len(queries),
+                'k': args.k,
+                'results': results
+            }, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
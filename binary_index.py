@@ -0,0 +1,134 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+if hasattr(np, 'bitwise_count'):
+    # NumPy 2.0+ 提供向量化的popcount
+    popcount = np.bitwise_count
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(words: np.ndarray) -> np.ndarray:
+        """按字节查表计算每个uint64的置位数"""
+        counts = _POPCOUNT_TABLE[words.view(np.uint8)]
+        return counts.reshape(words.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def pack_signs(vectors: np.ndarray) -> np.ndarray:
+    """把向量的符号位打包为uint64数组，每个向量占 ceil(dim/64) 个字"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    packed = np.packbits(vectors > 0, axis=1, bitorder='little')
+    padding = (-packed.shape[1]) % 8
+    if padding:
+        packed = np.pad(packed, ((0, 0), (0, padding)))
+    return np.ascontiguousarray(packed).view('<u8')
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """查询编码与全部编码的汉明距离"""
+    return popcount(np.bitwise_xor(codes, query_code)).sum(axis=1, dtype=np.uint32)
+
+
+def cosine_rescore(query_embedding: List[float], vectors: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+    """按全精度余弦相似度重排候选，返回 (候选下标, 相似度) 列表"""
+    if len(vectors) == 0:
+        return []
+    query = np.asarray(query_embedding, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)
+    scores = vectors @ query / norms / max(float(np.linalg.norm(query)), 1e-12)
+    order = np.argsort(-scores)[:top_k]
+    return [(int(i), float(scores[i])) for i in order]
+
+
+class BinaryIndex:
+    """二值量化索引：只在内存中保存每个向量的符号位编码（dim/8字节），按汉明距离预筛候选
+
+    全精度向量不常驻内存，由调用方按候选ID读取后重排。
+    每个向量可以带若干标签（如来源、语言，每个标签可有多个取值），按标签值记录行号，
+    过滤检索时只扫描对应分区的编码。
+    索引在第一次查询时由loader分页构建，向量变更后调用invalidate重建。
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[Tuple[List[str], np.ndarray, List[Dict[str, List[str]]]]]]):
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._built = False
+        self._ids: List[str] = []
+        self._codes = np.zeros((0, 0), dtype=np.uint64)
+        self._label_rows: Dict[str, Dict[str, np.ndarray]] = {}
+
+    def invalidate(self) -> None:
+        """标记索引需要重建"""
+        with self._lock:
+            self._built = False
+
+    def _ensure_built(self) -> None:
+        """按需构建二值编码，逐页打包，构建期间也不会一次读入全部全精度向量"""
+        with self._lock:
+            if self._built:
+                return
+
+            ids = []
+            pages = []
+            label_rows: Dict[str, Dict[str, List[int]]] = {}
+            for page_ids, page_vectors, page_labels in self.loader():
+                if not len(page_ids):
+                    continue
+                for offset, labels in enumerate(page_labels):
+                    for field, values in labels.items():
+                        for value in values:
+                            label_rows.setdefault(field, {}).setdefault(value, []).append(len(ids) + offset)
+                ids.extend(page_ids)
+                pages.append(pack_signs(page_vectors))
+
+            self._ids = ids
+            self._codes = np.concatenate(pages) if pages else np.zeros((0, 0), dtype=np.uint64)
+            self._label_rows = {field: {value: np.asarray(rows, dtype=np.int64) for value, rows in values.items()}
+                                for field, values in label_rows.items()}
+            self._built = True
+            print(f"二值索引构建完成: {len(ids)} 个向量, 每个向量 {self._codes.shape[1] * 8 if pages else 0} 字节")
+
+    def candidates(self, query_embedding: List[float], count: int,
+                   filters: Optional[Dict[str, List[str]]] = None) -> List[str]:
+        """汉明距离最小的count个向量ID（未排序），filters为 {标签: 允许的取值}"""
+        self._ensure_built()
+        with self._lock:
+            ids, codes, label_rows = self._ids, self._codes, self._label_rows
+        if not ids:
+            return []
+
+        rows = self._filtered_rows(label_rows, filters) if filters else None
+        if rows is not None:
+            if len(rows) == 0:
+                return []
+            codes = codes[rows]
+
+        distances = hamming_distances(codes, pack_signs(query_embedding)[0])
+        count = min(count, len(distances))
+        if count < len(distances):
+            selected = np.argpartition(distances, count - 1)[:count]
+        else:
+            selected = np.arange(len(distances))
+        if rows is not None:
+            selected = rows[selected]
+        return [ids[row] for row in np.sort(selected)]
+
+    @staticmethod
+    def _filtered_rows(label_rows: Dict[str, Dict[str, np.ndarray]],
+                       filters: Dict[str, List[str]]) -> np.ndarray:
+        """满足全部过滤条件的行号（已排序）"""
+        rows = None
+        empty = np.zeros(0, dtype=np.int64)
+        for field, values in filters.items():
+            field_rows = np.unique(np.concatenate([label_rows.get(field, {}).get(value, empty) for value in values]))
+            rows = field_rows if rows is None else np.intersect1d(rows, field_rows, assume_unique=True)
+        return rows
+
+    def memory_bytes(self) -> int:
+        """二值编码占用的内存"""
+        return int(self._codes.nbytes)
+
+    def __len__(self) -> int:
+        return len(self._ids)
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from models import Chunk
+
+
+class BuildJournal:
+    """知识库构建的检查点日志
+
+    第一行记录本次构建的指纹（文本块列表和影响向量的配置的哈希），之后每写入一批向量追加一行已提交的ID。
+    构建中断后，指纹相同的重建可以跳过已提交的文本块继续执行；构建完成后删除日志。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._header: Optional[Dict[str, Any]] = None
+        self._committed: Set[str] = set()
+        self._load()
+
+    @staticmethod
+    def fingerprint(documents: Iterable[Chunk], *settings: Any) -> str:
+        """文本块序列（顺序、来源和内容）及相关配置的指纹，逐个读取文本块"""
+        digest = hashlib.sha256(json.dumps(settings, ensure_ascii=False, default=str).encode('utf-8'))
+        for doc in documents:
+            digest.update(doc.source.encode('utf-8'))
+            digest.update(b'\0')
+            digest.update(doc.content.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _load(self) -> None:
+        """读取已有的日志，忽略中断时可能写了一半的最后一行"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if self._header is None:
+                    self._header = entry
+                else:
+                    self._committed.update(entry.get('ids', []))
+
+    def resumable(self, fingerprint: str) -> bool:
+        """是否存在指纹相同、尚未完成的构建"""
+        return self._header is not None and self._header.get('fingerprint') == fingerprint
+
+    def start(self, fingerprint: str, total: int) -> None:
+        """开始新的构建，覆盖旧日志"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._header = {'fingerprint': fingerprint, 'total': total}
+        self._committed = set()
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self._header) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def committed(self) -> Set[str]:
+        """已写入向量存储的文本块ID"""
+        return set(self._committed)
+
+    def record(self, ids: List[str]) -> None:
+        """记录一批已写入的ID（写入向量存储之后调用）"""
+        if not ids:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'ids': ids}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._committed.update(ids)
+
+    def finish(self) -> None:
+        """构建完成，删除日志"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._header = None
+        self._committed = set()
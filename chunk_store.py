@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import threading
+import zlib
+from typing import List, Optional
+
+
+class ChunkStore:
+    """文本块内容的压缩存储，与向量索引分离
+
+    每个文本块按ID保存为一行zlib压缩的文本（SQLite），向量索引只返回ID和距离，
+    内容在确定要使用时才按ID批量读取和解压。
+    """
+
+    def __init__(self, path: str, level: int = 6):
+        self.path = path
+        self.level = level
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, body BLOB NOT NULL)")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def put(self, ids: List[str], texts: List[str]) -> None:
+        """添加或覆盖文本块"""
+        if not ids:
+            return
+        rows = [(doc_id, zlib.compress(text.encode('utf-8'), self.level)) for doc_id, text in zip(ids, texts)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (id, body) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def get(self, ids: List[str]) -> List[Optional[str]]:
+        """按ID读取文本，不存在的ID对应None"""
+        found = {}
+        # SQLite对单条语句的参数个数有限制，分批查询
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            with self._lock:
+                rows = self._conn.execute(f"SELECT id, body FROM chunks WHERE id IN ({placeholders})",
+                                          batch).fetchall()
+            for doc_id, body in rows:
+                found[doc_id] = body
+        return [zlib.decompress(found[doc_id]).decode('utf-8') if doc_id in found else None for doc_id in ids]
+
+    def delete(self, ids: List[str]) -> None:
+        """删除文本块"""
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(doc_id,) for doc_id in ids])
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """删除全部文本块"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    def nbytes(self) -> int:
+        """压缩后文本占用的字节数"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM chunks").fetchone()[0]
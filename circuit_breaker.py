@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+    def __init__(self, name: str):
+        super().__init__(f"{name}服务暂时不可用（已熔断）")
+        self.name = name
+
+
+class CircuitBreaker:
+    """基于错误率和慢调用率的熔断器
+
+    最近window_size次调用中，失败或慢调用比例超过阈值即打开熔断，
+    open_seconds后进入半开状态，放行少量探测请求，探测成功则恢复。
+    """
+
+    def __init__(self, name: str, window_size: int = 20, min_calls: int = 5,
+                 failure_rate: float = 0.5, slow_call_seconds: float = 10.0,
+                 slow_call_rate: float = 0.8, open_seconds: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        # 每次调用的结果：(是否失败, 是否慢调用)
+        self._outcomes = deque(maxlen=window_size)
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """当前状态（打开状态到期后视为半开）"""
+        with self._lock:
+            self._refresh_locked()
+            return self._state
+
+    def is_open(self) -> bool:
+        """是否处于熔断状态（半开时仍视为可用，以便放行探测请求）"""
+        return self.state == STATE_OPEN
+
+    def ensure_closed(self) -> None:
+        """熔断打开时直接抛出CircuitOpenError（不消耗半开探测名额）"""
+        with self._lock:
+            self._refresh_locked()
+            if self._state == STATE_OPEN:
+                self.rejected += 1
+                raise CircuitOpenError(self.name)
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """通过熔断器执行调用，熔断时抛出CircuitOpenError"""
+        self._before_call()
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._record(True, time.monotonic() - started)
+            raise
+        self._record(False, time.monotonic() - started)
+        return result
+
+    def _before_call(self) -> None:
+        """检查是否允许发起调用"""
+        with self._lock:
+            self._refresh_locked()
+            if self._state == STATE_OPEN:
+                self.rejected += 1
+                raise CircuitOpenError(self.name)
+            if self._state == STATE_HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name)
+                self._half_open_calls += 1
+
+    def _record(self, failed: bool, duration: float) -> None:
+        """记录一次调用结果并更新状态"""
+        slow = duration >= self.slow_call_seconds
+
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                if failed or slow:
+                    self._open_locked()
+                else:
+                    print(f"[{self.name}] 探测请求成功，熔断恢复")
+                    self._state = STATE_CLOSED
+                    self._outcomes.clear()
+                return
+
+            self._outcomes.append((failed, slow))
+            if self._state == STATE_CLOSED and len(self._outcomes) >= self.min_calls:
+                total = len(self._outcomes)
+                failures = sum(1 for f, _ in self._outcomes if f)
+                slow_calls = sum(1 for _, s in self._outcomes if s)
+                if failures / total >= self.failure_rate or slow_calls / total >= self.slow_call_rate:
+                    self._open_locked()
+
+    def _refresh_locked(self) -> None:
+        """打开状态到期后转为半开"""
+        if self._state == STATE_OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = STATE_HALF_OPEN
+            self._half_open_calls = 0
+
+    def _open_locked(self) -> None:
+        """打开熔断"""
+        print(f"[{self.name}] 错误率或延迟过高，熔断 {self.open_seconds} 秒")
+        self._state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.times_opened += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断器统计信息"""
+        with self._lock:
+            self._refresh_locked()
+            total = len(self._outcomes)
+            return {
+                'name': self.name,
+                'state': self._state,
+                'recent_calls': total,
+                'recent_failure_rate': round(sum(1 for f, _ in self._outcomes if f) / total, 3) if total else 0.0,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected
+            }
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import *
+from partitions import known_languages
+
+
+def _connect_readonly(path: str) -> sqlite3.Connection:
+    """以只读方式打开SQLite文件，不会创建文件或加锁写入"""
+    return sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+
+
+def _collection_row(conn: sqlite3.Connection, name: str) -> Optional[str]:
+    row = conn.execute("SELECT id FROM collections WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _collection_metadata(conn: sqlite3.Connection, collection_id: str) -> Dict[str, Any]:
+    metadata = {}
+    for key, str_value, int_value, float_value, bool_value in conn.execute(
+            "SELECT key, str_value, int_value, float_value, bool_value FROM collection_metadata "
+            "WHERE collection_id = ?", (collection_id,)):
+        for value in (str_value, int_value, float_value, bool_value):
+            if value is not None:
+                metadata[key] = value
+                break
+    return metadata
+
+
+def _collection_count(conn: sqlite3.Connection, collection_id: str) -> int:
+    """集合中的文档数（元数据段中的记录数）"""
+    return conn.execute(
+        "SELECT COUNT(*) FROM embeddings e JOIN segments s ON e.segment_id = s.id "
+        "WHERE s.collection = ? AND s.scope = 'METADATA'", (collection_id,)
+    ).fetchone()[0]
+
+
+def _chunk_store_bytes(db_path: str) -> int:
+    """文本块存储中正文的字节数，与VectorStore的取值方式相同"""
+    path = CHUNK_STORE_PATH if db_path == CHROMA_DB_PATH else os.path.join(db_path, "chunks.sqlite3")
+    if not os.path.exists(path):
+        return 0
+    conn = _connect_readonly(path)
+    try:
+        return conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM chunks").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _index_version(db_path: str) -> str:
+    """写入节点记录的知识库版本号，与VectorStore的取值方式相同"""
+    path = INDEX_VERSION_PATH if db_path == CHROMA_DB_PATH else os.path.join(db_path, "index_version")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def read_collection_stats(db_path: str = CHROMA_DB_PATH) -> Optional[Dict[str, Any]]:
+    """直接读取ChromaDB的SQLite文件获取集合信息，不导入chromadb、不打开向量索引
+
+    返回格式与VectorStore.get_collection_info相同（只用于本地persistent模式）；数据库不存在或结构无法识别时返回None，
+    调用方应改用VectorStore获取。
+    """
+    path = os.path.join(db_path, "chroma.sqlite3")
+    if not os.path.exists(path):
+        return None
+    try:
+        conn = _connect_readonly(path)
+        try:
+            collection_id = _collection_row(conn, COLLECTION_NAME)
+            if collection_id is None:
+                return None
+            metadata = _collection_metadata(conn, collection_id)
+            partitions = {}
+            if PARTITION_INDEXES_ENABLED:
+                for language in known_languages():
+                    partition_id = _collection_row(conn, f"{COLLECTION_NAME}_{language}")
+                    if partition_id is not None:
+                        partitions[language] = _collection_count(conn, partition_id)
+            external_text = bool(metadata.get("chunk_store", False))
+            return {
+                'name': COLLECTION_NAME,
+                'document_count': _collection_count(conn, collection_id),
+                'path': db_path,
+                'mode': "persistent",
+                'read_only': CHROMA_READ_ONLY,
+                'index_version': _index_version(db_path),
+                'space': metadata.get("hnsw:space", "l2"),
+                'coarse_dim': int(metadata.get("matryoshka_dim", 0)),
+                'chunk_store': external_text,
+                'chunk_store_bytes': _chunk_store_bytes(db_path) if external_text else 0,
+                'partitions': partitions
+            }
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"读取集合统计信息时出错: {e}")
+        return None
@@ -2,11 +2,25 @@
 API_KEY = "your-api-key-here"  # 你的阿里云百炼API密钥
 EMBEDDING_MODEL = "text-embedding-v4"  # 阿里云百炼Embedding模型
 LLM_MODEL = "qwen2.5-72b-instruct"  # 千问2.5 72B指令模型
+EMBEDDING_API_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1/embeddings"  # 嵌入接口地址
+LLM_API_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"  # LLM接口地址
 
 # ChromaDB配置
 CHROMA_DB_PATH = "./chroma_db"
 COLLECTION_NAME = "mcp_knowledge"
 
+# Chroma服务配置
+CHROMA_MODE = "persistent"  # persistent：进程内打开本地索引；http：连接独立运行的Chroma服务，多个Web进程共享同一个索引
+CHROMA_HOST = "localhost"  # Chroma服务地址（启动方式：chroma run --path ./chroma_db --port 8001）
+CHROMA_PORT = 8001  # Chroma服务端口（Web界面占用8000）
+CHROMA_HTTP_POOL_SIZE = 32  # 每个进程到Chroma服务的HTTP连接数，应不小于并发数
+CHROMA_HTTP_KEEPALIVE_SECONDS = 30  # 空闲连接保持时间（秒）
+CHROMA_READ_ONLY = False  # 只读副本：不写入、不迁移索引，定期检查写入节点是否更新了知识库
+CHROMA_REFRESH_SECONDS = 5  # 只读副本检查知识库版本的间隔（秒）
+INDEX_VERSION_PATH = f"{CHROMA_DB_PATH}/index_version"  # 写入节点每次更新知识库后写入的版本号（与旁路存储一样，副本需要能读到该目录）
+WEB_WORKERS = 1  # Web服务进程数，大于1时各进程以只读副本方式启动（需要CHROMA_MODE = "http"）
+READ_ONLY_ENV = "MCP_KB_READ_ONLY"  # 主进程通过该环境变量通知worker进程以只读副本方式启动
+
 # 文本分块配置
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
@@ -14,3 +28,149 @@ CHUNK_OVERLAP = 200
 # 检索配置
 TOP_K_RESULTS = 10
 SIMILARITY_THRESHOLD = 0.25
+
+# 并发请求合并配置
+SINGLE_FLIGHT_ENABLED = True  # 相同的并发查询/嵌入请求只向上游发起一次
+
+# 查询嵌入批处理配置
+EMBEDDING_BATCH_ENABLED = True  # 合并时间窗口内的并发查询嵌入请求
+EMBEDDING_BATCH_WINDOW_MS = 5  # 收集请求的最长等待时间（毫秒）
+EMBEDDING_BATCH_MAX_SIZE = 10  # 单次请求的最大输入条数（text-embedding-v4上限为10）
+
+# 准入控制配置
+LLM_MAX_CONCURRENCY = 8  # 同时进行的LLM调用上限
+EMBEDDING_MAX_CONCURRENCY = 16  # 同时进行的嵌入调用上限
+ADMISSION_MAX_QUEUE = 64  # 每类调用的最大排队数，超出直接返回503
+ADMISSION_QUEUE_TIMEOUT = 10  # 最长排队时间（秒），超时返回503
+CLIENT_RATE_LIMIT = 1.0  # 每个客户端每秒允许的/chat请求数，0表示不限制
+CLIENT_RATE_BURST = 5  # 每个客户端允许的突发请求数
+TRUSTED_PROXIES = ["127.0.0.1", "::1"]  # 只信任来自这些地址（可写网段，如"10.0.0.0/8"）的X-Forwarded-For，其他请求按连接地址限流
+
+# 请求时间预算配置
+REQUEST_TIMEOUT_SECONDS = 30  # 单个/chat请求的总时间预算（SLO）
+EMBEDDING_STAGE_SHARE = 0.2  # 查询向量生成阶段可使用的剩余时间比例
+EMBEDDING_HTTP_TIMEOUT = 10  # 嵌入接口单次调用的超时时间（秒）
+LLM_HTTP_TIMEOUT = 60  # LLM接口单次调用的超时时间（秒）
+CONTEXT_TRIM_SECONDS = 10  # 生成前剩余时间低于该值时缩减上下文
+TRIMMED_CONTEXT_DOCS = 3  # 缩减后保留的文档数
+GENERATION_MIN_SECONDS = 3  # 剩余时间低于该值时跳过LLM，直接返回检索到的段落
+
+# 抽取式快速回答配置
+ANSWER_MODE = "auto"  # 默认回答模式：auto（自动选择）/ llm / extractive（直接返回原文摘录）
+EXTRACTIVE_CONFIDENCE_THRESHOLD = 0.6  # 自动模式下最相关文档的相似度达到该值才跳过LLM
+EXTRACTIVE_MIN_MARGIN = 0.05  # 最相关文档需领先第二名的相似度差
+EXTRACTIVE_MAX_QUERY_CHARS = 60  # 只有较短的查找类问题才走抽取式回答
+EXTRACTIVE_MAX_PASSAGES = 3  # 摘录的段落数
+EXTRACTIVE_MAX_SENTENCES = 3  # 每个段落高亮的句子数
+EXTRACTIVE_PASSAGE_CHARS = 1200  # 每个段落展示的最大字符数
+LLM_DEGRADED_QUEUE_RATIO = 0.5  # LLM排队数超过队列上限的该比例时视为LLM降级，自动改用抽取式回答
+
+# 熔断配置
+CIRCUIT_WINDOW_SIZE = 20  # 统计最近多少次调用
+CIRCUIT_MIN_CALLS = 5  # 至少有多少次调用才判断是否熔断
+CIRCUIT_FAILURE_RATE = 0.5  # 失败比例达到该值时熔断
+CIRCUIT_SLOW_CALL_RATE = 0.8  # 慢调用比例达到该值时熔断
+CIRCUIT_OPEN_SECONDS = 30  # 熔断持续时间，之后放行探测请求
+EMBEDDING_SLOW_CALL_SECONDS = 3  # 嵌入调用超过该时长视为慢调用
+LLM_SLOW_CALL_SECONDS = 40  # LLM调用超过该时长视为慢调用
+
+# 对冲请求配置
+HEDGE_EMBEDDING_ENABLED = True  # 嵌入调用是幂等的，默认开启对冲
+HEDGE_LLM_ENABLED = False  # LLM调用成本高，默认不对冲
+HEDGE_PERCENTILE = 95  # 调用耗时超过近期该分位数仍未返回时发出对冲请求
+HEDGE_MIN_SAMPLES = 20  # 积累足够样本后才开始对冲
+HEDGE_MIN_DELAY_MS = 50  # 对冲等待时间下限（毫秒）
+HEDGE_MAX_EXTRA_RATIO = 0.05  # 对冲带来的额外请求不超过调用量的该比例
+HEDGE_BURST = 10  # 允许短时间内集中发出的对冲请求数
+
+# HNSW索引配置（修改后需运行 python main.py --migrate-index 重建现有索引）
+HNSW_SPACE = "cosine"  # 距离空间：cosine / l2 / ip
+HNSW_CONSTRUCTION_EF = 200  # 建索引时的候选集大小，越大召回越高、构建越慢
+HNSW_SEARCH_EF = 100  # 查询时的候选集大小，越大召回越高、查询越慢
+HNSW_M = 16  # 每个节点的最大连接数
+MIGRATION_BATCH_SIZE = 500  # 迁移索引时每批复制的向量数
+
+# Matryoshka降维检索配置（修改后需运行 python main.py --migrate-index 或 --rebuild）
+MATRYOSHKA_ENABLED = False  # 是否在ChromaDB中只存储截断后的低维向量做粗检索
+MATRYOSHKA_DIM = 256  # 粗检索使用的向量维度（取嵌入向量的前N维并重新归一化）
+MATRYOSHKA_CANDIDATES = 4  # 粗检索取 top_k 的倍数作为候选，再用全维度向量精确重排
+FULL_VECTOR_PATH = f"{CHROMA_DB_PATH}/full_vectors"  # 全维度向量的旁路存储目录
+
+# 文本块存储配置
+CHUNK_STORE_ENABLED = True  # 文本块内容压缩存储在ChromaDB之外，检索只返回ID和距离，内容按需读取
+CHUNK_STORE_PATH = f"{CHROMA_DB_PATH}/chunks.sqlite3"  # 文本块存储文件
+CHUNK_STORE_COMPRESSION_LEVEL = 6  # zlib压缩级别（1-9）
+
+# 检索引擎配置
+SEARCH_ENGINE = "chroma"  # chroma: HNSW索引；binary: 二值编码汉明预筛 + 全精度重排
+BINARY_CANDIDATES = 10  # 二值预筛取 top_k 的倍数作为重排候选
+
+# 分区检索配置
+SOURCE_LANGUAGES = {  # 文档来源所属的语言分区
+    "mcp_rule.txt": "spec",
+    "mcp_rule_py.txt": "python",
+    "mcp_rule_ts.txt": "typescript"
+}
+DEFAULT_LANGUAGE = "spec"  # 未列出的文档归入的分区
+LANGUAGE_ROUTING_ENABLED = True  # 自动识别查询针对的SDK语言并只检索相关分区
+PARTITION_INDEXES_ENABLED = True  # 为每个语言分区单独建立索引（额外占用一份向量存储）
+
+# 近似重复去重配置
+DEDUP_ENABLED = True  # 构建知识库时合并近似重复的文本块
+DEDUP_THRESHOLD = 0.85  # Jaccard相似度不低于该值视为重复
+DEDUP_SHINGLE_SIZE = 5  # 字符k-gram长度
+DEDUP_NUM_PERM = 64  # MinHash签名长度
+DEDUP_BANDS = 16  # LSH分段数（每段 DEDUP_NUM_PERM / DEDUP_BANDS 个值）
+
+# 知识库构建配置
+WRITE_BATCH_SIZE = 50  # 每生成这么多个嵌入向量就写入一次向量存储并记录检查点
+BUILD_JOURNAL_PATH = f"{CHROMA_DB_PATH}/build_journal.jsonl"  # 构建检查点日志
+
+# 文档目录监视配置（python main.py --watch 或设为True启用）
+WATCH_ENABLED = False  # 启动Web界面时监视txt目录，文件变化后增量更新向量
+WATCH_POLL_INTERVAL = 1.0  # 轮询间隔（秒）
+WATCH_DEBOUNCE_SECONDS = 2.0  # 文件在这么长时间内不再变化后才重新处理
+
+# 批量查询配置（python main.py query）
+BATCH_CONCURRENCY = 4  # 同时处理的问题数
+BATCH_MAX_RETRIES = 3  # 被准入控制拒绝时的重试次数
+HTTP_POOL_SIZE = 32  # 每个主机保持的HTTP连接数，应不小于并发数
+
+# 服务缓存配置（重建或增量更新知识库后自动清空检索结果和回答缓存）
+EMBEDDING_CACHE_SIZE = 10000  # 查询向量缓存条数，0表示不缓存
+RETRIEVAL_CACHE_SIZE = 2000  # 检索结果缓存条数，0表示不缓存
+ANSWER_CACHE_SIZE = 1000  # 回答缓存条数，0表示不缓存
+CACHE_TTL_SECONDS = 3600  # 检索结果和回答缓存的有效期（秒），0表示不过期
+
+# 缓存预热配置（服务启动和知识库构建完成后，后台执行常见问题填充缓存）
+WARMUP_ENABLED = True  # 是否预热
+WARMUP_QUERIES_PATH = "warmup_queries.txt"  # 常见问题文件，格式与 main.py query 的输入相同
+WARMUP_FROM_QUERY_LOG = True  # 同时按出现次数从查询日志中选取高频问题
+WARMUP_TOP_N = 50  # 预热的问题数
+WARMUP_CONCURRENCY = 4  # 同时预热的问题数
+WARMUP_ANSWERS = True  # 是否预先生成回答（会调用LLM），False时只预热查询向量和检索结果
+
+# 输入预取配置（Web界面在用户停止输入后预先生成查询向量并检索，提交时直接命中缓存）
+PREFETCH_ENABLED = True  # 是否启用
+PREFETCH_DEBOUNCE_MS = 300  # 停止输入多久后发起预取（毫秒）
+PREFETCH_MIN_CHARS = 4  # 输入少于该字符数时不预取
+PREFETCH_MAX_COMPLETIONS = 2  # 额外预取的可能补全数（以当前输入为前缀的常见问题）
+PREFETCH_RATE_LIMIT = 2.0  # 每个客户端每秒允许的预取请求数（与/chat分开计算）
+PREFETCH_RATE_BURST = 4  # 每个客户端允许的突发预取请求数
+PREFETCH_TIMEOUT_SECONDS = 5  # 单次预取的时间预算
+
+# MCP服务配置（python mcp_server.py，通过stdio提供search/answer工具）
+MCP_SERVER_NAME = "mcp-knowledge"  # 向客户端报告的服务名
+MCP_MAX_WORKERS = 8  # 同时处理的工具调用数
+MCP_BATCH_MAX_QUERIES = 50  # 批量工具单次最多的问题数（批内并发数为BATCH_CONCURRENCY）
+
+# 查询日志配置（记录真实流量形态，用 python replay_queries.py 回放压测）
+QUERY_LOG_ENABLED = False  # 是否采样记录/chat请求
+QUERY_LOG_SAMPLE_RATE = 0.1  # 采样比例（0-1）
+QUERY_LOG_PATH = "./logs/query_log.jsonl"  # 日志文件，写满后轮转为 .1 .2 ...
+QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024  # 单个日志文件的最大字节数
+QUERY_LOG_BACKUP_COUNT = 5  # 保留的轮转文件数
+QUERY_LOG_SALT = "change-me"  # 客户端标识哈希使用的盐，日志中不保存原始IP
+
+# 检索评估配置（python retrieval_eval.py）
+EVAL_EMBEDDING_CACHE_PATH = f"{CHROMA_DB_PATH}/eval_embeddings.sqlite3"  # 评估时嵌入向量的本地缓存，重复评估不再调用接口
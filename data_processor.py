@@ -1,140 +1,140 @@
-from typing import List, Dict, Any
-from pathlib import Path
-import tiktoken
-
-class DataProcessor:
-    def __init__(self, txt_dir: str = "txt"):
-        self.txt_dir = Path(txt_dir)
-        self.encoding = tiktoken.get_encoding("cl100k_base")
-        
-    def read_txt_files(self) -> List[Dict[str, Any]]:
-        """读取所有txt文件并返回结构化数据"""
-        documents = []
-        
-        for txt_file in self.txt_dir.glob("*.txt"):
-            print(f"正在处理文件: {txt_file.name}")
-            
-            try:
-                with open(txt_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # 提取文件名作为文档类型
-                doc_type = txt_file.stem
-                
-                documents.append({
-                    'content': content,
-                    'source': txt_file.name,
-                    'type': doc_type,
-                    'size': len(content)
-                })
-                
-            except Exception as e:
-                print(f"处理文件 {txt_file.name} 时出错: {e}")
-                
-        return documents
-    
-    def split_text_by_headers(self, text: str, source: str) -> List[Dict[str, Any]]:
-        """按标题分割文本"""
-        chunks = []
-        
-        # 分割文本为段落
-        paragraphs = text.split('\n\n')
-        
-        current_header = ""
-        current_content = []
-        
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-                
-            # 检查是否是标题（以#开头）
-            if para.startswith('#'):
-                # 保存之前的块
-                if current_content:
-                    chunk_text = f"{current_header}\n\n" + '\n\n'.join(current_content)
-                    chunks.append({
-                        'content': chunk_text,
-                        'source': source,
-                        'header': current_header.strip('#').strip(),
-                        'size': len(chunk_text)
-                    })
-                
-                # 开始新的块
-                current_header = para
-                current_content = []
-            else:
-                current_content.append(para)
-        
-        # 保存最后一个块
-        if current_content:
-            chunk_text = f"{current_header}\n\n" + '\n\n'.join(current_content)
-            chunks.append({
-                'content': chunk_text,
-                'source': source,
-                'header': current_header.strip('#').strip(),
-                'size': len(chunk_text)
-            })
-        
-        return chunks
-    
-    def split_text_by_size(self, text: str, source: str, chunk_size: int = 1000, overlap: int = 200) -> List[Dict[str, Any]]:
-        """按大小分割文本"""
-        chunks = []
-        
-        # 使用tiktoken计算token数量
-        tokens = self.encoding.encode(text)
-        
-        start = 0
-        while start < len(tokens):
-            end = start + chunk_size
-            
-            # 提取当前块的tokens
-            chunk_tokens = tokens[start:end]
-            chunk_text = self.encoding.decode(chunk_tokens)
-            
-            chunks.append({
-                'content': chunk_text,
-                'source': source,
-                'size': len(chunk_text),
-                'token_count': len(chunk_tokens)
-            })
-            
-            # 移动到下一个块，考虑重叠
-            start = end - overlap
-            
-            # 如果剩余内容少于chunk_size，直接结束
-            if start >= len(tokens):
-                break
-        
-        return chunks
-    
-    def process_documents(self, use_header_splitting: bool = True) -> List[Dict[str, Any]]:
-        """处理所有文档并返回分块结果"""
-        documents = self.read_txt_files()
-        all_chunks = []
-        
-        for doc in documents:
-            if use_header_splitting:
-                chunks = self.split_text_by_headers(doc['content'], doc['source'])
-            else:
-                chunks = self.split_text_by_size(doc['content'], doc['source'])
-            
-            all_chunks.extend(chunks)
-            print(f"文档 {doc['source']} 分割为 {len(chunks)} 个块")
-        
-        print(f"总共生成 {len(all_chunks)} 个文本块")
-        return all_chunks
-
-if __name__ == "__main__":
-    processor = DataProcessor()
-    chunks = processor.process_documents()
-    
-    # 显示前几个块的示例
-    for i, chunk in enumerate(chunks[:3]):
-        print(f"\n=== 块 {i+1} ===")
-        print(f"来源: {chunk['source']}")
-        print(f"大小: {chunk['size']} 字符")
-        if 'header' in chunk:
-            print(f"标题: {chunk['header']}")
-        print(f"内容预览: {chunk['content'][:200]}...") 
\ No newline at end of file
+from functools import lru_cache
+from typing import List, Iterable, Iterator, Optional
+from pathlib import Path
+
+from config import CHUNK_SIZE, CHUNK_OVERLAP
+from mmap_reader import MappedTextFile
+from models import Chunk
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = "cl100k_base"):
+    """tiktoken编码，首次使用时才导入并加载，进程内缓存（按标题分块用不到）"""
+    import tiktoken
+    return tiktoken.get_encoding(name)
+
+
+class DataProcessor:
+    def __init__(self, txt_dir: str = "txt", chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+        self.txt_dir = Path(txt_dir)
+        # 按大小分块时每块的token数和重叠token数
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+    
+    @property
+    def encoding(self):
+        return get_encoding("cl100k_base")
+        
+    def iter_header_chunks(self, mapped: MappedTextFile, source: str) -> Iterator[Chunk]:
+        """按文件的标题索引把每个章节（标题及其后到下一个标题前的段落）组合为一个文本块，逐个产出
+        
+        没有内容的标题（紧接着下一个标题）不单独成块。
+        """
+        for header, start, end in mapped.sections():
+            if start >= end:
+                continue
+            header_text = mapped.paragraph(header) if header is not None else ""
+            yield self._header_chunk(header_text, [mapped.paragraph(i) for i in range(start, end)], source)
+    
+    def _header_chunk(self, header: str, content: List[str], source: str) -> Chunk:
+        chunk_text = f"{header}\n\n" + '\n\n'.join(content)
+        return Chunk(chunk_text, source, header=header.strip('#').strip())
+    
+    def iter_size_chunks(self, paragraphs: Iterable[str], source: str, chunk_size: int = 1000, overlap: int = 200) -> Iterator[Chunk]:
+        """按大小分割段落序列，逐段编码，只在内存中保留一个块的tokens
+        
+        段落之间补回空行后分别编码，块边界处的token与整体编码可能略有不同。
+        """
+        buffer = []
+        emitted = 0  # buffer开头已经输出过的token数（重叠部分）
+        separator = ""
+        
+        for para in paragraphs:
+            buffer.extend(self.encoding.encode(separator + para))
+            separator = "\n\n"
+            while len(buffer) >= chunk_size:
+                yield self._size_chunk(buffer[:chunk_size], source)
+                buffer = buffer[chunk_size - overlap:]
+                emitted = min(overlap, len(buffer))
+        
+        # 剩余部分还有未输出的内容时作为最后一个块
+        if len(buffer) > emitted:
+            yield self._size_chunk(buffer, source)
+    
+    def _size_chunk(self, chunk_tokens: List[int], source: str) -> Chunk:
+        return Chunk(self.encoding.decode(chunk_tokens), source, token_count=len(chunk_tokens))
+    
+    def iter_file_chunks(self, txt_file: Path, use_header_splitting: bool = True) -> Iterator[Chunk]:
+        """以内存映射方式读取文件并逐个产出文本块，内存占用与文件大小无关"""
+        with MappedTextFile(txt_file) as mapped:
+            if use_header_splitting:
+                yield from self.iter_header_chunks(mapped, txt_file.name)
+            else:
+                yield from self.iter_size_chunks(mapped.iter_paragraphs(), txt_file.name,
+                                                 self.chunk_size, self.chunk_overlap)
+    
+    def read_file_chunks(self, txt_file: Path, use_header_splitting: bool = True) -> Optional[List[Chunk]]:
+        """读取并分割单个文件，出错时返回None"""
+        print(f"正在处理文件: {txt_file.name}")
+        
+        try:
+            return list(self.iter_file_chunks(txt_file, use_header_splitting))
+        except Exception as e:
+            print(f"处理文件 {txt_file.name} 时出错: {e}")
+            return None
+    
+    def iter_documents(self, use_header_splitting: bool = True, verbose: bool = True) -> Iterator[Chunk]:
+        """逐个产出所有文档的文本块，不在内存中保留已产出的文本块
+
+        某个文件读取出错时跳过该文件的剩余部分（出错前已产出的文本块不会撤回）。
+        """
+        for txt_file in sorted(self.txt_dir.glob("*.txt")):
+            if verbose:
+                print(f"正在处理文件: {txt_file.name}")
+            count = 0
+            try:
+                for chunk in self.iter_file_chunks(txt_file, use_header_splitting):
+                    count += 1
+                    yield chunk
+            except Exception as e:
+                print(f"处理文件 {txt_file.name} 时出错: {e}")
+                continue
+            if verbose:
+                print(f"文档 {txt_file.name} 分割为 {count} 个块")
+    
+    def process_documents(self, use_header_splitting: bool = True) -> List[Chunk]:
+        """处理所有文档并返回分块结果"""
+        all_chunks = list(self.iter_documents(use_header_splitting))
+        print(f"总共生成 {len(all_chunks)} 个文本块")
+        return all_chunks
+    
+    def process_files(self, names: List[str], use_header_splitting: bool = True) -> List[Chunk]:
+        """只处理指定的文件（文件名），已删除的文件被忽略"""
+        all_chunks = []
+        
+        for name in names:
+            txt_file = self.txt_dir / name
+            if not txt_file.exists():
+                continue
+            chunks = self.read_file_chunks(txt_file, use_header_splitting)
+            if chunks is None:
+                # 文件存在但读取失败（例如正在写入），不能当作删除处理
+                raise IOError(f"无法读取文件 {name}")
+            
+            all_chunks.extend(chunks)
+            print(f"文档 {name} 分割为 {len(chunks)} 个块")
+        
+        return all_chunks
+
+if __name__ == "__main__":
+    processor = DataProcessor()
+    chunks = processor.process_documents()
+    
+    # 显示前几个块的示例
+    for i, chunk in enumerate(chunks[:3]):
+        print(f"\n=== 块 {i+1} ===")
+        print(f"来源: {chunk.source}")
+        print(f"大小: {chunk.size} 字符")
+        if chunk.header is not None:
+            print(f"标题: {chunk.header}")
+        print(f"内容预览: {chunk.content[:200]}...") 
\ No newline at end of file
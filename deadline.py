@@ -0,0 +1,38 @@
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """某个处理阶段超出了请求的剩余时间预算"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"{stage}阶段超时")
+        self.stage = stage
+
+
+class Deadline:
+    """请求级别的截止时间，在检索和生成各阶段之间传递"""
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """剩余时间（秒），不小于0"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """是否已经超时"""
+        return time.monotonic() >= self.expires_at
+
+    def stage_timeout(self, share: float, cap: Optional[float] = None) -> float:
+        """按比例分配剩余时间给某个阶段，可选上限"""
+        timeout = self.remaining() * share
+        if cap is not None:
+            timeout = min(timeout, cap)
+        return timeout
+
+    def check(self, stage: str) -> None:
+        """已超时则抛出DeadlineExceeded"""
+        if self.expired():
+            raise DeadlineExceeded(stage)
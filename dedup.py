@@ -0,0 +1,170 @@
+import zlib
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+import numpy as np
+
+from config import *
+from models import Chunk
+from single_flight import normalize_text
+
+# MinHash哈希函数 h(x) = (a*x + b) mod p，p为大于2^32的素数
+_MERSENNE_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def shingles(text: str, size: int = DEDUP_SHINGLE_SIZE) -> Set[int]:
+    """归一化文本的字符k-gram集合（以crc32哈希表示），中英文混排都适用"""
+    text = normalize_text(text, casefold=True)
+    if len(text) <= size:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """MinHash签名：签名中相同位置取值相等的比例是Jaccard相似度的无偏估计"""
+
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a、b小于2^31，保证 a*x + b 不会溢出uint64
+        self.a = rng.integers(1, 2 ** 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2 ** 31, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, hashes: Set[int]) -> np.ndarray:
+        """计算集合的MinHash签名"""
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        permuted = (self.a[:, None] * values[None, :] + self.b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=1)
+
+
+def estimate_jaccard(left: np.ndarray, right: np.ndarray) -> float:
+    """用MinHash签名估计Jaccard相似度"""
+    return float(np.mean(left == right))
+
+
+def find_duplicate_groups(texts: List[str], threshold: float = DEDUP_THRESHOLD,
+                          bands: int = DEDUP_BANDS) -> List[List[int]]:
+    """用MinHash + LSH分桶找出近似重复的文本，返回分组（每组为下标列表，按原顺序）"""
+    hasher = MinHasher()
+    return group_signatures([hasher.signature(shingles(text)) for text in texts], threshold, bands)
+
+
+def group_signatures(signatures: List[np.ndarray], threshold: float = DEDUP_THRESHOLD,
+                     bands: int = DEDUP_BANDS) -> List[List[int]]:
+    """按MinHash签名分组
+
+    签名分为bands段，任意一段完全相同的文本成为候选对，再用签名估计的Jaccard相似度确认。
+    """
+    rows = len(signatures[0]) // bands if signatures else 0
+
+    parent = list(range(len(signatures)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        for i, signature in enumerate(signatures):
+            buckets.setdefault(signature[band * rows:(band + 1) * rows].tobytes(), []).append(i)
+        for members in buckets.values():
+            for offset, left in enumerate(members):
+                for right in members[offset + 1:]:
+                    if find(left) != find(right) and \
+                            estimate_jaccard(signatures[left], signatures[right]) >= threshold:
+                        parent[find(right)] = find(left)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(signatures)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+class DuplicatePlanner:
+    """两遍流式去重：第一遍只记录每个文本块的MinHash签名、长度、来源和内容校验值，不保留文本；
+    分组后，第二遍重新分块时只产出每组的规范块
+
+    内存占用与文本块数量成正比（每块约 DEDUP_NUM_PERM * 4 字节），与文本总量无关。
+    dedup为False时不计算签名，全部文本块原样保留。
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, dedup: bool = True):
+        self.threshold = threshold
+        self.dedup = dedup
+        self._hasher = MinHasher() if dedup else None
+        self._signatures: List[np.ndarray] = []
+        self._lengths: List[int] = []
+        self._sources: List[str] = []
+        self._checksums: List[int] = []
+        # 规范块的下标 -> (组内全部来源, 合并的块数)
+        self._kept: Dict[int, Tuple[List[str], int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._checksums)
+
+    def add(self, chunk: Chunk) -> None:
+        """第一遍：记录一个文本块"""
+        if self._hasher is not None:
+            # 签名值不超过2^32-1，以uint32保存
+            self._signatures.append(self._hasher.signature(shingles(chunk.content)).astype(np.uint32))
+        self._lengths.append(len(chunk.content))
+        self._sources.append(chunk.source)
+        self._checksums.append(zlib.crc32(chunk.content.encode('utf-8')))
+
+    def scan(self, chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        """第一遍：记录并原样产出文本块（可同时用于计算构建指纹）"""
+        for chunk in chunks:
+            self.add(chunk)
+            yield chunk
+
+    def plan(self) -> int:
+        """分组并选出每组的规范块（内容最长的块，长度相同时取先出现的），返回去重后的文本块数"""
+        if self.dedup:
+            groups = group_signatures(self._signatures, self.threshold)
+        else:
+            groups = [[i] for i in range(len(self))]
+        self._kept = {}
+        for group in groups:
+            canonical = max(group, key=lambda i: (self._lengths[i], -i))
+            sources = list(dict.fromkeys([self._sources[canonical]] + [self._sources[i] for i in group]))
+            self._kept[canonical] = (sources, len(group))
+        self._signatures = []
+        if self.dedup:
+            print(f"近似重复去重: {len(self)} -> {len(self._kept)} 个文本块")
+        return len(self._kept)
+
+    def apply(self, chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        """第二遍：按原顺序只产出规范块，并记录组内全部来源和合并的块数
+
+        文本块与第一遍不一致（文档在两遍之间被修改）时抛出ValueError。
+        """
+        count = 0
+        for i, chunk in enumerate(chunks):
+            if i >= len(self) or chunk.source != self._sources[i] or \
+                    zlib.crc32(chunk.content.encode('utf-8')) != self._checksums[i]:
+                raise ValueError(f"文档 {chunk.source} 在去重过程中发生了变化")
+            count += 1
+            if i not in self._kept:
+                continue
+            sources, duplicate_count = self._kept[i]
+            if duplicate_count > 1:
+                chunk.sources = sources
+                chunk.duplicate_count = duplicate_count
+            yield chunk
+        if count != len(self):
+            raise ValueError("文档在去重过程中发生了变化")
+
+
+def deduplicate_chunks(chunks: List[Chunk], threshold: float = DEDUP_THRESHOLD) -> List[Chunk]:
+    """把近似重复的文本块合并为一个规范块
+
+    每组保留内容最长的块（长度相同时取先出现的），在规范块上记录组内全部来源文件（sources）
+    和合并的块数（duplicate_count）。返回结果保持原有顺序。
+    """
+    planner = DuplicatePlanner(threshold)
+    for chunk in chunks:
+        planner.add(chunk)
+    planner.plan()
+    return list(planner.apply(chunks))
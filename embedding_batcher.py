@@ -0,0 +1,118 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class _PendingEmbedding:
+    """一个等待批量处理的嵌入请求"""
+    __slots__ = ('text', 'event', 'embedding', 'error', 'promoted')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.event = threading.Event()
+        self.embedding: Optional[List[float]] = None
+        self.error: Optional[BaseException] = None
+        self.promoted = False
+
+
+class EmbeddingBatcher:
+    """收集短时间窗口内到达的查询嵌入请求，合并为一次多输入调用后再分发结果
+
+    不使用后台线程：窗口内第一个到达的调用者负责收集和发送本批请求，
+    超出批大小的请求会由下一批的第一个调用者接手。
+    """
+
+    def __init__(self, request_fn: Callable[[List[str], Optional[float]], List[List[float]]],
+                 window_ms: float = 5, max_batch_size: int = 10):
+        self.request_fn = request_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._cond = threading.Condition()
+        self._pending: List[_PendingEmbedding] = []
+        self._collecting = False
+
+        self.batches = 0
+        self.requests = 0
+
+    def embed(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        """提交单条文本并等待其所在批次返回嵌入向量，超时抛出TimeoutError"""
+        item = _PendingEmbedding(text)
+
+        with self._cond:
+            self.requests += 1
+            self._pending.append(item)
+            if self._collecting:
+                is_leader = False
+                if len(self._pending) >= self.max_batch_size:
+                    self._cond.notify_all()
+            else:
+                self._collecting = True
+                is_leader = True
+
+        if not is_leader:
+            if not item.event.wait(timeout):
+                with self._cond:
+                    # 仍在排队则直接退出；已被取走的请求等待所在批次完成
+                    if item in self._pending and not item.promoted:
+                        self._pending.remove(item)
+                        raise TimeoutError("等待批量嵌入结果超时")
+                item.event.wait()
+            if item.promoted and item.embedding is None and item.error is None:
+                # 上一批已满，由本请求负责下一批
+                item.event.clear()
+                self._lead(timeout)
+        else:
+            self._lead(timeout)
+
+        if item.error is not None:
+            raise item.error
+        return item.embedding
+
+    def _lead(self, timeout: Optional[float]) -> None:
+        """等待窗口结束或批次已满，然后发送一批请求"""
+        window_end = time.monotonic() + self.window
+
+        with self._cond:
+            while len(self._pending) < self.max_batch_size:
+                remaining = window_end - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+
+            if self._pending:
+                next_leader = self._pending[0]
+                next_leader.promoted = True
+                next_leader.event.set()
+            else:
+                self._collecting = False
+
+            self.batches += 1
+
+        self._dispatch(batch, timeout)
+
+    def _dispatch(self, batch: List[_PendingEmbedding], timeout: Optional[float]) -> None:
+        """执行批量请求并把结果分发给各个等待者"""
+        try:
+            embeddings = self.request_fn([item.text for item in batch], timeout)
+            if len(embeddings) != len(batch):
+                raise ValueError(f"批量嵌入返回数量不匹配: 期望 {len(batch)}，实际 {len(embeddings)}")
+            for item, embedding in zip(batch, embeddings):
+                item.embedding = embedding
+        except Exception as e:
+            for item in batch:
+                item.error = e
+        finally:
+            for item in batch:
+                item.event.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取批处理统计信息"""
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'avg_batch_size': round(self.requests / self.batches, 2) if self.batches else 0
+        }
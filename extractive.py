@@ -0,0 +1,196 @@
+import re
+from typing import List, Dict, Any, Tuple
+
+from config import *
+from models import Hit, RETRIEVAL_LEXICAL
+
+# 回答模式
+MODE_AUTO = "auto"
+MODE_LLM = "llm"
+MODE_EXTRACTIVE = "extractive"
+ANSWER_MODES = (MODE_AUTO, MODE_LLM, MODE_EXTRACTIVE)
+
+# 需要综合、解释或推理的问题交给LLM
+_GENERATIVE_PATTERNS = re.compile(
+    r'如何|怎么|怎样|为什么|为何|区别|比较|对比|优缺点|解释|总结|举例|示例代码|写一个|实现|设计|'
+    r'\bhow\b|\bwhy\b|\bexplain\b|\bcompare\b|\bdifference|\bsummar|\bexample\b|\bimplement|\bwrite\b',
+    re.IGNORECASE
+)
+
+# 查找事实或定义的问题
+_LOOKUP_PATTERNS = re.compile(
+    r'是什么|是啥|什么是|返回|哪些|哪个|字段|参数|格式|定义|含义|默认|'
+    r'\bwhat\b|\bwhich\b|\breturns?\b|\bfields?\b|\bparams?\b|\bdefault\b',
+    re.IGNORECASE
+)
+
+# 形如 `resources/list`、tools/call、listChanged 的协议标识符
+_IDENTIFIER_PATTERN = re.compile(r'`[^`]+`|[A-Za-z_][\w.-]*/[\w./-]+|[a-z]+[A-Z]\w*')
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[。！？；!?;])\s*|(?<=[.])\s+(?=[A-Z`*\[(])')
+
+_ASCII_STOPWORDS = {
+    'the', 'a', 'an', 'is', 'are', 'of', 'to', 'in', 'on', 'for', 'and', 'or', 'what', 'which',
+    'how', 'does', 'do', 'can', 'with', 'mcp', 'this', 'that', 'it', 'be'
+}
+
+
+def query_terms(query: str) -> List[str]:
+    """提取查询中的检索词：协议标识符、英文单词和中文二元组"""
+    terms = []
+    lowered = query.lower()
+
+    for identifier in _IDENTIFIER_PATTERN.findall(query):
+        terms.append(identifier.strip('`').lower())
+
+    for word in re.findall(r'[a-z][a-z0-9_]+', lowered):
+        if word not in _ASCII_STOPWORDS:
+            terms.append(word)
+
+    for run in re.findall(r'[一-鿿]+', query):
+        if len(run) == 1:
+            terms.append(run)
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+
+    # 去重并保持顺序
+    return list(dict.fromkeys(terms))
+
+
+def split_sentences(text: str) -> List[str]:
+    """把段落切分为句子，折行的段落先合并，跳过代码块和标题"""
+    sentences = []
+    paragraph = []
+    in_code = False
+
+    def flush():
+        if paragraph:
+            joined = ' '.join(paragraph)
+            sentences.extend(part.strip() for part in _SENTENCE_SPLIT.split(joined) if part and part.strip())
+            paragraph.clear()
+
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if stripped.startswith('```'):
+            flush()
+            in_code = not in_code
+            continue
+        if in_code:
+            continue
+        if not stripped or stripped.startswith('#'):
+            flush()
+            continue
+        paragraph.append(stripped)
+    flush()
+
+    return sentences
+
+
+def score_sentence(sentence: str, terms: List[str]) -> float:
+    """按命中的检索词计分，协议标识符等长词权重更高"""
+    lowered = sentence.lower()
+    score = 0.0
+    for term in terms:
+        if term in lowered:
+            score += 2.0 if ('/' in term or len(term) >= 6) else 1.0
+    return score
+
+
+def highlight_sentences(query: str, content: str, limit: int = EXTRACTIVE_MAX_SENTENCES) -> List[str]:
+    """选出段落中与查询最相关的若干句子（保持原文顺序）"""
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    scored = [(score_sentence(sentence, terms), i, sentence) for i, sentence in enumerate(split_sentences(content))]
+    best = sorted((item for item in scored if item[0] > 0), key=lambda item: (-item[0], item[1]))[:limit]
+    return [sentence for _, _, sentence in sorted(best, key=lambda item: item[1])]
+
+
+def build_extractive_answer(query: str, relevant_docs: List[Hit],
+                            notice: str = "") -> Tuple[str, List[Dict[str, Any]]]:
+    """不调用LLM，直接由最相关的段落和高亮句子组成回答，返回 (Markdown文本, 高亮信息)"""
+    parts = ["# 知识库原文摘录", ""]
+    if notice:
+        parts.extend([f"**{notice}**", ""])
+
+    highlights = []
+    for i, doc in enumerate(relevant_docs[:EXTRACTIVE_MAX_PASSAGES], 1):
+        header = doc.header
+        title = f"{doc.source} - {header}" if header else doc.source
+
+        sentences = highlight_sentences(query, doc.content)
+        highlights.append({
+            'source': doc.source,
+            'header': header,
+            'sentences': sentences
+        })
+
+        parts.append(f"## {i}. {title}")
+        parts.append("")
+        for sentence in sentences:
+            # 去掉句子自带的粗体标记，避免与高亮标记嵌套
+            parts.append(f"> **{sentence.replace('**', '')}**")
+        if sentences:
+            parts.append("")
+
+        content = doc.content.strip()
+        if len(content) > EXTRACTIVE_PASSAGE_CHARS:
+            content = content[:EXTRACTIVE_PASSAGE_CHARS].rstrip() + "\n\n……"
+        # 截断可能留下未闭合的代码块
+        if content.count('```') % 2 == 1:
+            content += "\n```"
+        parts.append(content)
+        parts.append("")
+
+    return "\n".join(parts), highlights
+
+
+class QueryRouter:
+    """决定一个查询走LLM生成还是抽取式快速回答"""
+
+    def __init__(self, confidence_threshold: float = EXTRACTIVE_CONFIDENCE_THRESHOLD,
+                 min_margin: float = EXTRACTIVE_MIN_MARGIN,
+                 max_query_chars: int = EXTRACTIVE_MAX_QUERY_CHARS):
+        self.confidence_threshold = confidence_threshold
+        self.min_margin = min_margin
+        self.max_query_chars = max_query_chars
+        self.routed = {MODE_LLM: 0, MODE_EXTRACTIVE: 0}
+
+    def is_lookup_query(self, query: str) -> bool:
+        """是否为查找事实/定义类的简短问题"""
+        if len(query) > self.max_query_chars or _GENERATIVE_PATTERNS.search(query):
+            return False
+        return bool(_LOOKUP_PATTERNS.search(query) or _IDENTIFIER_PATTERN.search(query))
+
+    def route(self, query: str, relevant_docs: List[Hit], requested_mode: str = MODE_AUTO,
+              llm_available: bool = True) -> Tuple[str, str]:
+        """返回 (回答模式, 选择原因)"""
+        mode, reason = self._decide(query, relevant_docs, requested_mode, llm_available)
+        self.routed[mode] += 1
+        return mode, reason
+
+    def _decide(self, query: str, relevant_docs: List[Hit], requested_mode: str,
+                llm_available: bool) -> Tuple[str, str]:
+        if requested_mode == MODE_EXTRACTIVE:
+            return MODE_EXTRACTIVE, "requested"
+        if requested_mode == MODE_LLM:
+            return MODE_LLM, "requested"
+        if not llm_available:
+            return MODE_EXTRACTIVE, "llm_degraded"
+        if not relevant_docs:
+            return MODE_LLM, "default"
+
+        # 词法检索的分数是相对值，不能作为置信度
+        if relevant_docs[0].retrieval == RETRIEVAL_LEXICAL:
+            return MODE_LLM, "default"
+
+        top = relevant_docs[0].similarity
+        runner_up = relevant_docs[1].similarity if len(relevant_docs) > 1 else 0.0
+        if top >= self.confidence_threshold and top - runner_up >= self.min_margin and self.is_lookup_query(query):
+            return MODE_EXTRACTIVE, "high_confidence"
+
+        return MODE_LLM, "default"
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取路由统计信息"""
+        return dict(self.routed)
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class FileWatcher:
+    """轮询目录中的文件变化，合并短时间内的连续修改后回调
+
+    每隔poll_interval秒比较一次文件的修改时间和大小；检测到变化后，
+    等到debounce秒内不再有新的变化才调用on_change(变化的文件名列表)。
+    回调在监视线程中执行，抛出异常或返回False时这些文件会在去抖时间后重试。
+    """
+
+    def __init__(self, directory: str, on_change: Callable[[List[str]], Any], suffix: str = ".txt",
+                 poll_interval: float = 1.0, debounce: float = 2.0):
+        self.directory = directory
+        self.on_change = on_change
+        self.suffix = suffix
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+
+        self._snapshot = self._scan()
+        self._pending: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.batches = 0
+        self.failures = 0
+        self.last_change_files: List[str] = []
+        self.last_duration = 0.0
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """当前目录中文件的 (修改时间, 大小)"""
+        snapshot = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(self.suffix):
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+        return snapshot
+
+    def start(self) -> None:
+        """启动后台监视线程"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="file-watcher", daemon=True)
+        self._thread.start()
+        print(f"👀 开始监视目录: {self.directory}（轮询间隔 {self.poll_interval} 秒，去抖 {self.debounce} 秒）")
+
+    def stop(self) -> None:
+        """停止监视"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.poll()
+
+    def poll(self) -> None:
+        """检查一次文件变化，去抖时间已过时触发回调"""
+        now = time.monotonic()
+        snapshot = self._scan()
+        for name in set(snapshot) | set(self._snapshot):
+            if snapshot.get(name) != self._snapshot.get(name):
+                self._pending[name] = now
+        self._snapshot = snapshot
+
+        if not self._pending or now - max(self._pending.values()) < self.debounce:
+            return
+
+        changed = sorted(self._pending)
+        self._pending.clear()
+        started = time.monotonic()
+        try:
+            success = self.on_change(changed) is not False
+        except Exception as e:
+            print(f"处理文件变化时出错: {e}")
+            success = False
+        if success:
+            self.batches += 1
+            self.last_change_files = changed
+        else:
+            self.failures += 1
+            for name in changed:
+                # 期间又有新变化的文件保留更晚的时间
+                self._pending.setdefault(name, time.monotonic())
+            print(f"文件变化处理失败，将重试: {', '.join(changed)}")
+        self.last_duration = time.monotonic() - started
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取监视统计信息"""
+        return {
+            'directory': self.directory,
+            'files': len(self._snapshot),
+            'pending': len(self._pending),
+            'batches': self.batches,
+            'failures': self.failures,
+            'last_change_files': self.last_change_files,
+            'last_duration_seconds': round(self.last_duration, 3)
+        }
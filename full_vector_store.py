@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 旧版本的单文件布局，作为第一个段继续读取
+LEGACY_SEGMENT = "vectors"
+
+
+class FullVectorStore:
+    """全维度向量的旁路存储，供降维粗检索后的精确重排使用
+
+    向量按段保存：每次写入追加一个新段（seg_xxxxxx.npy + seg_xxxxxx.ids.json），以内存映射方式读取，
+    查询时只会读入候选向量所在的页；manifest.json 记录全部段的顺序，后写入的段覆盖同ID的旧向量。
+    批量构建时每批只写入本批的向量，不重写已有文件；删除时才把全部有效向量合并为一个段。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        self._lock = threading.Lock()
+        self._segments: List[str] = []
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._rows: Dict[str, Tuple[str, int]] = {}
+        self._stale_rows = 0
+        self._load()
+
+    def _vectors_path(self, segment: str) -> str:
+        return os.path.join(self.path, f"{segment}.npy")
+
+    def _ids_path(self, segment: str) -> str:
+        if segment == LEGACY_SEGMENT:
+            return os.path.join(self.path, "ids.json")
+        return os.path.join(self.path, f"{segment}.ids.json")
+
+    def _load(self) -> None:
+        """加载已有的段"""
+        with self._lock:
+            self._segments = []
+            self._vectors = {}
+            self._rows = {}
+            self._stale_rows = 0
+            if os.path.exists(self.manifest_path):
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    segments = json.load(f)['segments']
+            elif os.path.exists(self._vectors_path(LEGACY_SEGMENT)) and os.path.exists(self._ids_path(LEGACY_SEGMENT)):
+                segments = [LEGACY_SEGMENT]
+            else:
+                segments = []
+            for segment in segments:
+                with open(self._ids_path(segment), 'r', encoding='utf-8') as f:
+                    ids = json.load(f)
+                self._attach_locked(segment, ids, np.load(self._vectors_path(segment), mmap_mode='r'))
+
+    def _attach_locked(self, segment: str, ids: List[str], vectors: np.ndarray) -> None:
+        """登记一个段，段中的ID覆盖之前段中的同ID向量"""
+        self._segments.append(segment)
+        self._vectors[segment] = vectors
+        for row, doc_id in enumerate(ids):
+            if doc_id in self._rows:
+                self._stale_rows += 1
+            self._rows[doc_id] = (segment, row)
+
+    def reload(self) -> None:
+        """重新加载其他进程写入的向量文件（只读副本在写入节点更新知识库后调用）"""
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, ids: List[str], vectors: List[List[float]]) -> None:
+        """添加或覆盖向量（追加一个新段，已有的段不变）"""
+        if not ids:
+            return
+        new = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            segment = self._next_segment_locked()
+            self._write_segment_locked(segment, list(ids), new)
+            self._attach_locked(segment, list(ids), np.load(self._vectors_path(segment), mmap_mode='r'))
+            self._write_manifest_locked()
+
+    def delete(self, ids: List[str]) -> None:
+        """删除向量，并把剩余的有效向量合并为一个段"""
+        with self._lock:
+            removed = [doc_id for doc_id in ids if doc_id in self._rows]
+            if not removed:
+                return
+            for doc_id in removed:
+                del self._rows[doc_id]
+            self._compact_locked()
+
+    def compact(self) -> None:
+        """把全部段合并为一个段，去掉被覆盖的旧向量"""
+        with self._lock:
+            if len(self._segments) > 1 or self._stale_rows:
+                self._compact_locked()
+
+    def pages(self, page_size: int):
+        """按页遍历全部 (ID列表, 向量矩阵)"""
+        with self._lock:
+            ids = list(self._rows)
+        for start in range(0, len(ids), page_size):
+            page_ids = ids[start:start + page_size]
+            vectors = self.get(page_ids)
+            present = [(doc_id, vector) for doc_id, vector in zip(page_ids, vectors) if vector is not None]
+            if present:
+                yield [doc_id for doc_id, _ in present], np.stack([vector for _, vector in present])
+
+    def get(self, ids: List[str]) -> List[Optional[np.ndarray]]:
+        """按ID读取向量，不存在的ID对应None"""
+        with self._lock:
+            vectors = self._vectors
+            rows = [self._rows.get(doc_id) for doc_id in ids]
+        return [np.asarray(vectors[row[0]][row[1]], dtype=np.float32) if row is not None else None for row in rows]
+
+    def clear(self) -> None:
+        """删除全部向量"""
+        with self._lock:
+            self._clear_locked()
+
+    def nbytes(self) -> int:
+        """向量文件占用的字节数"""
+        return int(sum(vectors.nbytes for vectors in self._vectors.values()))
+
+    def _next_segment_locked(self) -> str:
+        numbered = [int(segment[4:]) for segment in self._segments if segment.startswith("seg_")]
+        return f"seg_{max(numbered, default=0) + 1:06d}"
+
+    def _write_segment_locked(self, segment: str, ids: List[str], vectors: np.ndarray) -> None:
+        """写入临时文件后原子替换"""
+        os.makedirs(self.path, exist_ok=True)
+        tmp_vectors = self._vectors_path(segment) + ".tmp.npy"
+        tmp_ids = self._ids_path(segment) + ".tmp"
+        np.save(tmp_vectors, np.ascontiguousarray(vectors, dtype=np.float32))
+        with open(tmp_ids, 'w', encoding='utf-8') as f:
+            json.dump(ids, f, ensure_ascii=False)
+        os.replace(tmp_vectors, self._vectors_path(segment))
+        os.replace(tmp_ids, self._ids_path(segment))
+
+    def _write_manifest_locked(self) -> None:
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'segments': self._segments}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _compact_locked(self) -> None:
+        """按当前的有效ID重写为一个新段，再删除旧段（读者持有的旧映射不受影响）"""
+        old_segments = list(self._segments)
+        rows = list(self._rows.items())
+        if not rows:
+            self._clear_locked()
+            return
+        segment = self._next_segment_locked()
+        ids = [doc_id for doc_id, _ in rows]
+        merged = np.stack([np.asarray(self._vectors[seg][row], dtype=np.float32) for _, (seg, row) in rows])
+        self._write_segment_locked(segment, ids, merged)
+        self._segments = []
+        self._vectors = {}
+        self._rows = {}
+        self._stale_rows = 0
+        self._attach_locked(segment, ids, np.load(self._vectors_path(segment), mmap_mode='r'))
+        self._write_manifest_locked()
+        self._remove_segments(old_segments)
+
+    def _remove_segments(self, segments: List[str]) -> None:
+        for segment in segments:
+            for path in (self._vectors_path(segment), self._ids_path(segment)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _clear_locked(self) -> None:
+        """删除全部段"""
+        self._remove_segments(self._segments)
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+        self._segments = []
+        self._vectors = {}
+        self._rows = {}
+        self._stale_rows = 0
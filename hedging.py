@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Optional
+
+from admission import ConcurrencyGate
+
+
+class LatencyTracker:
+    """记录最近若干次调用的耗时，用于计算分位数"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """记录一次耗时"""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self) -> int:
+        """当前样本数"""
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """第p百分位耗时，没有样本时返回None"""
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class Hedger:
+    """对冲请求：调用超过近期耗时的某个分位数仍未返回时，再发一个相同请求，取先成功的结果
+
+    额外请求受令牌预算限制：每次调用积累max_extra_ratio个令牌，每次对冲消耗一个，
+    因此除burst次突发外，对冲带来的额外负载不超过调用量的max_extra_ratio。
+    只应用于幂等的调用。落后的请求无法中断已发出的HTTP连接，其结果会被直接丢弃。
+    给出gate时，对冲请求同样占用并发闸门的一个名额（调用方已为首个请求占用名额），直到两个请求都结束；
+    闸门没有空闲名额或有请求在排队时不对冲，对冲不会让上游的实际并发超过闸门上限。
+    """
+
+    def __init__(self, name: str, percentile: float = 95, min_samples: int = 20,
+                 min_delay: float = 0.05, max_extra_ratio: float = 0.05,
+                 burst: int = 10, max_workers: int = 32, gate: Optional[ConcurrencyGate] = None):
+        self.name = name
+        self.gate = gate
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_extra_ratio = max_extra_ratio
+        self.burst = burst
+
+        self.tracker = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"hedge-{name}")
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.skipped_busy = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """发出对冲请求前的等待时间，样本不足时返回None（不对冲）"""
+        if self.tracker.count() < self.min_samples:
+            return None
+        return max(self.min_delay, self.tracker.percentile(self.percentile))
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """执行调用，必要时发出对冲请求"""
+        with self._lock:
+            self.calls += 1
+            self._tokens = min(self.burst, self._tokens + self.max_extra_ratio)
+
+        delay = self.hedge_delay()
+        if delay is None:
+            # 样本不足时直接在当前线程调用，只记录耗时
+            return self._timed(fn, args, kwargs)
+
+        primary = self._executor.submit(self._timed, fn, args, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_token():
+            return primary.result()
+
+        hedge = self._executor.submit(self._timed, fn, args, kwargs)
+        if self.gate is not None:
+            self._release_when_done(primary, hedge)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        # 尚未开始的请求直接取消，已发出的请求结果被丢弃
+                        other.cancel()
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _timed(self, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        """执行一次调用，成功时记录耗时"""
+        started = time.monotonic()
+        result = fn(*args, **kwargs)
+        self.tracker.record(time.monotonic() - started)
+        return result
+
+    def _release_when_done(self, *futures: Future) -> None:
+        """全部请求结束（或被取消）后归还对冲占用的闸门名额
+
+        调用方在取得先成功的结果后即释放自己的名额，落后的请求仍在执行时由对冲的名额继续计数。
+        """
+        started = time.monotonic()
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def finished(_: Future) -> None:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self.gate.release(time.monotonic() - started)
+
+        for future in futures:
+            future.add_done_callback(finished)
+
+    def _take_token(self) -> bool:
+        """尝试消耗一个对冲令牌，给出闸门时同时占用一个空闲名额"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            if self.gate is not None and not self.gate.try_acquire():
+                self.skipped_busy += 1
+                return False
+            self._tokens -= 1
+            self.hedged += 1
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取对冲统计信息"""
+        delay = self.hedge_delay()
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'skipped_busy': self.skipped_busy,
+            'hedge_delay_ms': round(delay * 1000, 1) if delay is not None else None
+        }
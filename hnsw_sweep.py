@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HNSW参数扫描工具
+以暴力检索的精确结果为基准，比较不同 M / construction_ef / search_ef 组合的
+recall@k、查询延迟和索引构建时间
+
+用法:
+    python hnsw_sweep.py                       # 使用现有知识库中的向量
+    python hnsw_sweep.py --synthetic 20000     # 使用随机生成的向量
+    python hnsw_sweep.py --m 8 16 32 --search-ef 10 50 100 200 --json result.json
+    python hnsw_sweep.py --matryoshka-dim 0 128 256 512   # 降维粗检索 + 全维度重排
+"""
+
+import argparse
+import json
+import time
+from typing import List, Dict, Any
+
+import numpy as np
+import chromadb
+from chromadb.config import Settings
+
+from config import *
+from vector_store import collection_metadata
+from full_vector_store import FullVectorStore
+
+
+def load_store_vectors() -> np.ndarray:
+    """读取现有知识库中的全部全维度向量"""
+    client = chromadb.PersistentClient(path=CHROMA_DB_PATH, settings=Settings(anonymized_telemetry=False))
+    collection = client.get_collection(COLLECTION_NAME)
+    total = collection.count()
+    vectors = []
+    for offset in range(0, total, MIGRATION_BATCH_SIZE):
+        page = collection.get(include=['embeddings'], limit=MIGRATION_BATCH_SIZE, offset=offset)
+        vectors.extend(page['embeddings'])
+
+    # 降维存储时集合中只有低维向量，改从旁路存储读取全维度向量
+    if (collection.metadata or {}).get("matryoshka_dim"):
+        full_vectors = FullVectorStore(FULL_VECTOR_PATH)
+        vectors = [vector for vector in full_vectors.get(collection.get(include=[])['ids']) if vector is not None]
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def synthetic_vectors(count: int, dim: int, seed: int) -> np.ndarray:
+    """生成带簇结构的随机向量，比均匀随机更接近真实嵌入的分布"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 50), dim))
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.3 * rng.normal(size=(count, dim))
+    return vectors.astype(np.float32)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2归一化"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def brute_force_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """暴力计算每个查询的精确top-k（返回语料下标）"""
+    if space == "l2":
+        scores = -(np.sum(queries ** 2, axis=1, keepdims=True) - 2 * queries @ corpus.T
+                   + np.sum(corpus ** 2, axis=1))
+    elif space == "cosine":
+        scores = normalize(queries) @ normalize(corpus).T
+    else:
+        scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def run_config(corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int, space: str,
+               m: int, construction_ef: int, search_ef: int, coarse_dim: int = 0,
+               candidates: int = MATRYOSHKA_CANDIDATES) -> Dict[str, Any]:
+    """用一组参数在内存中建索引并测量召回率和延迟
+
+    coarse_dim大于0时索引截断后的低维向量，取 k*candidates 个候选后用全维度余弦重排，
+    召回率仍以全维度暴力检索结果为基准。
+    """
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False, allow_reset=True))
+    collection = client.create_collection(
+        name="hnsw_sweep",
+        metadata=collection_metadata(space, construction_ef, search_ef, m, coarse_dim)
+    )
+
+    indexed = normalize(corpus[:, :coarse_dim]) if coarse_dim else corpus
+    full = normalize(corpus)
+    ids = [str(i) for i in range(len(corpus))]
+    started = time.perf_counter()
+    for offset in range(0, len(corpus), MIGRATION_BATCH_SIZE):
+        collection.add(ids=ids[offset:offset + MIGRATION_BATCH_SIZE],
+                       embeddings=indexed[offset:offset + MIGRATION_BATCH_SIZE].tolist())
+    build_seconds = time.perf_counter() - started
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        if coarse_dim:
+            result = collection.query(query_embeddings=[normalize(query[None, :coarse_dim])[0].tolist()],
+                                      n_results=k * candidates, include=[])
+            rows = np.asarray([int(doc_id) for doc_id in result['ids'][0]])
+            scores = full[rows] @ (query / max(float(np.linalg.norm(query)), 1e-12))
+            found = set(rows[np.argsort(-scores)[:k]].tolist())
+        else:
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+            found = {int(doc_id) for doc_id in result['ids'][0]}
+        latencies.append(time.perf_counter() - started)
+        hits += len(found & set(expected.tolist()))
+
+    client.reset()
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        'dim': coarse_dim or int(corpus.shape[1]),
+        'M': m,
+        'construction_ef': construction_ef,
+        'search_ef': search_ef,
+        f'recall@{k}': round(hits / (len(queries) * k), 4),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 3),
+        'build_seconds': round(build_seconds, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HNSW参数扫描：recall@k vs 查询延迟 / 构建时间')
+    parser.add_argument('--synthetic', type=int, default=0, help='使用N个随机向量代替现有知识库')
+    parser.add_argument('--dim', type=int, default=1024, help='随机向量维度')
+    parser.add_argument('--queries', type=int, default=200, help='查询数量')
+    parser.add_argument('--k', type=int, default=TOP_K_RESULTS, help='计算recall@k的k')
+    parser.add_argument('--space', default=HNSW_SPACE, choices=['cosine', 'l2', 'ip'], help='距离空间')
+    parser.add_argument('--m', type=int, nargs='+', default=[HNSW_M], help='M取值列表')
+    parser.add_argument('--construction-ef', type=int, nargs='+', default=[HNSW_CONSTRUCTION_EF],
+                        help='construction_ef取值列表')
+    parser.add_argument('--search-ef', type=int, nargs='+', default=[10, 20, 50, 100, 200],
+                        help='search_ef取值列表')
+    parser.add_argument('--matryoshka-dim', type=int, nargs='+', default=[0],
+                        help='粗检索维度列表，0表示全维度检索')
+    parser.add_argument('--candidates', type=int, default=MATRYOSHKA_CANDIDATES,
+                        help='降维检索时取 k 的多少倍作为重排候选')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic + args.queries, args.dim, args.seed)
+    else:
+        vectors = load_store_vectors()
+    if len(vectors) <= args.queries + args.k:
+        print(f"❌ 向量数量不足: {len(vectors)}")
+        return
+
+    # 从向量中留出一部分作为查询（加噪声，避免与语料完全重合）
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(vectors))
+    queries = vectors[order[:args.queries]]
+    queries = queries + 0.05 * np.std(queries) * rng.normal(size=queries.shape).astype(np.float32)
+    corpus = vectors[order[args.queries:]]
+
+    print(f"语料: {len(corpus)} 个向量, 维度 {corpus.shape[1]}, 查询: {len(queries)}, "
+          f"k={args.k}, space={args.space}")
+
+    started = time.perf_counter()
+    truth = brute_force_top_k(corpus, queries, args.k, args.space)
+    brute_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    print(f"暴力检索基准: 平均 {brute_ms:.3f} ms/查询")
+
+    results: List[Dict[str, Any]] = []
+    header = f"{'dim':>5} {'M':>4} {'c_ef':>6} {'s_ef':>6} {'recall@' + str(args.k):>10} {'p50_ms':>8} {'p95_ms':>8} {'build_s':>8}"
+    print(header)
+    print("-" * len(header))
+    for coarse_dim in args.matryoshka_dim:
+        for m in args.m:
+            for construction_ef in args.construction_ef:
+                for search_ef in args.search_ef:
+                    row = run_config(corpus, queries, truth, args.k, args.space, m, construction_ef, search_ef,
+                                     coarse_dim, args.candidates)
+                    results.append(row)
+                    print(f"{row['dim']:>5} {m:>4} {construction_ef:>6} {search_ef:>6} {row[f'recall@{args.k}']:>10.4f} "
+                          f"{row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f} {row['build_seconds']:>8.3f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'corpus_size': len(corpus),
+                'dim': int(corpus.shape[1]),
+                'queries': len(queries),
+                'k': args.k,
+                'space': args.space,
+                'brute_force_ms': round(brute_ms, 3),
+                'results': results
+            }, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
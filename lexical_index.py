@@ -0,0 +1,94 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from models import Hit, RETRIEVAL_LEXICAL
+
+# BM25参数
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """分词：英文按单词（小写），中文按二元组"""
+    tokens = re.findall(r'[a-z0-9_]+(?:/[a-z0-9_]+)*', text.lower())
+    for run in re.findall(r'[一-鿿]+', text):
+        if len(run) == 1:
+            tokens.append(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class LexicalIndex:
+    """内存中的BM25倒排索引，嵌入服务不可用时作为检索降级方案
+
+    索引在第一次查询时从loader加载的文档构建，文档变更后调用invalidate重建。
+    构建结果作为一个不可变的快照整体替换，检索只读取开始时取得的快照，不会读到新旧索引混合的状态。
+    """
+
+    def __init__(self, loader: Callable[[], Tuple[List[str], List[str], List[Dict[str, Any]]]]):
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._built = False
+        # (ids, documents, metadatas, postings, lengths, avg_length)
+        self._snapshot: Tuple[List[str], List[str], List[Dict[str, Any]],
+                              Dict[str, List[Tuple[int, int]]], List[int], float] = ([], [], [], {}, [], 0.0)
+
+    def invalidate(self) -> None:
+        """标记索引需要重建"""
+        with self._lock:
+            self._built = False
+
+    def _ensure_built(self) -> tuple:
+        """按需构建倒排索引，返回当前的快照"""
+        with self._lock:
+            if self._built:
+                return self._snapshot
+
+            ids, documents, metadatas = self.loader()
+            postings = defaultdict(list)
+            lengths = []
+            for doc_index, document in enumerate(documents):
+                tokens = tokenize(document or "")
+                lengths.append(len(tokens))
+                for term, tf in Counter(tokens).items():
+                    postings[term].append((doc_index, tf))
+
+            avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+            self._snapshot = (ids, documents, metadatas, dict(postings), lengths, avg_length)
+            self._built = True
+            print(f"词法索引构建完成: {len(ids)} 个文档, {len(postings)} 个词项")
+            return self._snapshot
+
+    def search(self, query: str, top_k: int,
+               predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Hit]:
+        """BM25检索，相似度为相对最高分归一化后的分数，predicate按元数据过滤文档"""
+        ids, documents, metadatas, all_postings, lengths, avg_length = self._ensure_built()
+
+        doc_count = len(lengths)
+        if doc_count == 0:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = all_postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_index, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_index] / (avg_length or 1))
+                scores[doc_index] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        if predicate is not None:
+            scores = {doc_index: score for doc_index, score in scores.items() if predicate(metadatas[doc_index])}
+
+        if not scores:
+            return []
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        best = ranked[0][1]
+        return [Hit(ids[doc_index], metadatas[doc_index], score / best, 1 - score / best,
+                    content=documents[doc_index], retrieval=RETRIEVAL_LEXICAL)
+                for doc_index, score in ranked]
@@ -7,13 +7,60 @@ MCP智能知识库助手
 作者: wink-wink-wink555
 """
 
-from rag_system import RAGSystem
 import argparse
 
+from config import (BATCH_CONCURRENCY, ANSWER_MODE, CHROMA_MODE, WEB_WORKERS, READ_ONLY_ENV,
+                    WATCH_ENABLED, WATCH_POLL_INTERVAL, WATCH_DEBOUNCE_SECONDS)
+from extractive import ANSWER_MODES
+
+# 各子命令只导入自己需要的模块（chromadb、requests等导入较慢），健康检查和定时任务启动更快
+
+def run_workers(workers: int, watch: bool) -> bool:
+    """多进程启动Web服务，返回是否已启动（不满足条件时由调用方按单进程启动）
+
+    每个worker进程独立导入web_interface，作为只读副本通过HTTP连接同一个Chroma服务；
+    主进程不加载知识库，watch为True时主进程作为唯一的写入节点监视文档目录并增量更新。
+    """
+    import os
+    
+    if CHROMA_MODE != "http":
+        print("⚠️ 多个worker进程需要设置 CHROMA_MODE = \"http\"（本地索引不能在进程间共享），改为单进程启动")
+        return False
+    
+    import uvicorn
+    os.environ[READ_ONLY_ENV] = "1"
+    if watch:
+        from rag_system import RAGSystem
+        from file_watcher import FileWatcher
+        writer = RAGSystem()
+        # 主进程不处理请求，缓存由各worker在发现知识库更新后自行预热
+        writer.warm_up_enabled = False
+        FileWatcher(str(writer.data_processor.txt_dir), writer.reindex_files,
+                    poll_interval=WATCH_POLL_INTERVAL, debounce=WATCH_DEBOUNCE_SECONDS).start()
+    
+    print(f"🌐 访问地址: http://localhost:8000（{workers} 个worker进程）")
+    uvicorn.run("web_interface:app", host="localhost", port=8000, workers=workers)
+    return True
+
 def main():
     parser = argparse.ArgumentParser(description='MCP智能知识库助手')
-    parser.add_argument('--rebuild', action='store_true', help='重新构建知识库')
+    parser.add_argument('--rebuild', action='store_true', help='重新构建知识库（上次中断时从检查点继续）')
+    parser.add_argument('--no-resume', action='store_true', help='配合--rebuild使用，忽略检查点从头构建')
     parser.add_argument('--info', action='store_true', help='显示知识库信息')
+    parser.add_argument('--watch', action='store_true', help='启动Web界面并监视txt目录，文档变化后自动增量更新')
+    parser.add_argument('--migrate-index', action='store_true', help='按配置的距离空间和HNSW参数重建现有索引')
+    parser.add_argument('--workers', type=int, default=WEB_WORKERS,
+                        help='Web服务进程数，大于1时各进程为只读副本（需要CHROMA_MODE = "http"）')
+    
+    subparsers = parser.add_subparsers(dest='command')
+    query_parser = subparsers.add_parser('query', help='批量执行问题文件中的问题，结果写入JSONL文件')
+    query_parser.add_argument('--input', required=True, help='问题文件，每行一个问题或一个JSON对象')
+    query_parser.add_argument('--output', required=True, help='结果文件（JSONL，逐条写入）')
+    query_parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY, help='同时处理的问题数')
+    query_parser.add_argument('--retrieval-only', action='store_true', help='只执行检索，不生成回答')
+    query_parser.add_argument('--mode', default=ANSWER_MODE, choices=ANSWER_MODES, help='回答模式')
+    query_parser.add_argument('--source', default="", help='只检索指定的来源文件')
+    query_parser.add_argument('--language', default="auto", help='语言分区：auto / all / 分区名')
     
     args = parser.parse_args()
     
@@ -26,16 +73,38 @@ def main():
     print("="*60)
     
     # 处理命令行参数
+    if args.command == 'query':
+        from rag_system import RAGSystem
+        from batch_query import BatchRunner
+        runner = BatchRunner(RAGSystem(), args.concurrency, args.retrieval_only, args.mode,
+                             args.source, args.language)
+        stats = runner.run(args.input, args.output)
+        print(f"批量查询完成: {stats}")
+        return
+    
     if args.info:
-        rag = RAGSystem()
-        info = rag.get_knowledge_base_info()
+        # 直接读取ChromaDB的SQLite文件，读不到时（或索引在Chroma服务中）再打开向量存储
+        from collection_stats import read_collection_stats
+        info = read_collection_stats() if CHROMA_MODE != "http" else None
+        if info is None:
+            from vector_store import VectorStore
+            info = VectorStore().get_collection_info()
         print(f"知识库信息: {info}")
         return
     
+    if args.migrate_index:
+        from vector_store import VectorStore
+        vector_store = VectorStore()
+        success = vector_store.migrate_collection()
+        print("索引迁移完成" if success else "索引迁移失败")
+        return
+    
     if args.rebuild:
+        from rag_system import RAGSystem
         rag = RAGSystem()
         print("重新构建知识库...")
-        success = rag.build_knowledge_base(clear_existing=True)
+        # 缓存在进程内，命令行构建后进程即退出，由Web服务启动时预热
+        success = rag.build_knowledge_base(clear_existing=True, resume=not args.no_resume, warm_up=False)
         if success:
             print("知识库重建完成")
         else:
@@ -45,8 +114,13 @@ def main():
     # 默认启动Web界面
     print("🚀 启动Web界面...")
     try:
+        if args.workers > 1 and run_workers(args.workers, args.watch or WATCH_ENABLED):
+            return
         from web_interface import main as web_main
-        web_main()
+        if args.watch:
+            web_main(watch=True)
+        else:
+            web_main()
     except ImportError as e:
         print(f"❌ 启动Web界面失败: {e}")
         print("请确保已安装FastAPI和uvicorn: pip install fastapi uvicorn[standard]")
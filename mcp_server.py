@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP知识库服务（stdio）
+以常驻进程的形式通过标准输入输出提供MCP（JSON-RPC 2.0，每行一条消息）工具，
+向量存储、分词器和各级缓存只在启动时加载一次，每次工具调用只需检索本身的耗时
+
+工具:
+    search          检索相关文档片段
+    search_batch    批量检索，每完成一个问题发送一次进度通知（附带该问题的结果）
+    answer          基于知识库生成回答，检索完成和生成完成时各发送一次进度通知
+    answer_batch    批量回答，每完成一个问题发送一次进度通知（附带该问题的回答）
+
+用法（在MCP客户端中配置）:
+    {"mcpServers": {"mcp-knowledge": {"command": "python", "args": ["/path/to/mcp_server.py"]}}}
+
+标准输出只用于协议消息，程序中的所有print输出都转到标准错误。
+"""
+
+import json
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from config import *
+from admission import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from deadline import Deadline
+from extractive import ANSWER_MODES
+from partitions import LANGUAGE_AUTO, LANGUAGE_ALL, known_languages
+
+# 支持的协议版本（按新旧排列），客户端请求的版本不在其中时使用第一个
+PROTOCOL_VERSIONS = ("2025-06-18", "2025-03-26", "2024-11-05")
+
+# JSON-RPC错误码
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# 工具调用在准入控制中使用的客户端ID
+MCP_CLIENT_ID = "mcp"
+
+
+class ToolError(Exception):
+    """工具执行失败，以 isError 结果返回给客户端"""
+
+
+def _scope_properties() -> Dict[str, Any]:
+    return {
+        'source': {'type': 'string', 'description': '只检索指定的来源文件，如 mcp_rule_py.txt'},
+        'language': {
+            'type': 'string',
+            'enum': [LANGUAGE_AUTO, LANGUAGE_ALL] + known_languages(),
+            'description': 'auto根据问题识别SDK语言，all不过滤，其他值只检索该语言分区'
+        }
+    }
+
+
+def tool_definitions() -> List[Dict[str, Any]]:
+    """tools/list 返回的工具定义"""
+    scope = _scope_properties()
+    mode = {'type': 'string', 'enum': list(ANSWER_MODES),
+            'description': 'auto自动选择，llm总是调用大模型，extractive直接返回原文摘录'}
+    queries = {'type': 'array', 'items': {'type': 'string'}, 'minItems': 1, 'maxItems': MCP_BATCH_MAX_QUERIES}
+    return [
+        {
+            'name': 'search',
+            'description': '在MCP协议及Python/TypeScript SDK文档中检索与问题相关的文档片段',
+            'inputSchema': {
+                'type': 'object',
+                'properties': dict(query={'type': 'string'},
+                                   top_k={'type': 'integer', 'minimum': 1, 'maximum': TOP_K_RESULTS}, **scope),
+                'required': ['query']
+            }
+        },
+        {
+            'name': 'search_batch',
+            'description': '批量检索多个问题，每完成一个问题通过进度通知返回该问题的结果',
+            'inputSchema': {
+                'type': 'object',
+                'properties': dict(queries=queries,
+                                   top_k={'type': 'integer', 'minimum': 1, 'maximum': TOP_K_RESULTS}, **scope),
+                'required': ['queries']
+            }
+        },
+        {
+            'name': 'answer',
+            'description': '基于MCP知识库回答问题，返回回答和引用的来源',
+            'inputSchema': {
+                'type': 'object',
+                'properties': dict(query={'type': 'string'}, mode=mode, **scope),
+                'required': ['query']
+            }
+        },
+        {
+            'name': 'answer_batch',
+            'description': '批量回答多个问题，每完成一个问题通过进度通知返回该问题的回答',
+            'inputSchema': {
+                'type': 'object',
+                'properties': dict(queries=queries, mode=mode, **scope),
+                'required': ['queries']
+            }
+        }
+    ]
+
+
+class MCPServer:
+    """stdio上的MCP服务：逐行读取JSON-RPC消息，工具调用在线程池中并发执行"""
+
+    def __init__(self, rag, output):
+        self.rag = rag
+        self.output = output
+        self._write_lock = threading.Lock()
+        self._cancelled: Dict[Any, threading.Event] = {}
+        self._cancel_lock = threading.Lock()
+        self._batches: List[threading.Thread] = []
+        self.executor = ThreadPoolExecutor(max_workers=MCP_MAX_WORKERS, thread_name_prefix="mcp")
+        self.tools: Dict[str, Callable] = {
+            'search': self._search,
+            'search_batch': self._search_batch,
+            'answer': self._answer,
+            'answer_batch': self._answer_batch
+        }
+
+    # ---------- 消息收发 ----------
+
+    def send(self, message: Any) -> None:
+        line = json.dumps(message, ensure_ascii=False)
+        with self._write_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def notify(self, method: str, params: Dict[str, Any]) -> None:
+        self.send({'jsonrpc': '2.0', 'method': method, 'params': params})
+
+    @staticmethod
+    def _error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+    def serve(self, input_stream) -> None:
+        """处理消息直到输入结束"""
+        for line in input_stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError as e:
+                self.send(self._error(None, PARSE_ERROR, f"无法解析的JSON: {e}"))
+                continue
+
+            if isinstance(message, list):
+                # JSON-RPC批量请求：各条消息并发处理，全部完成后一起返回
+                if not message:
+                    self.send(self._error(None, INVALID_REQUEST, "空的批量请求"))
+                    continue
+                for item in message:
+                    self._register(item)
+                thread = threading.Thread(target=self._handle_batch, args=(message,), daemon=True)
+                self._batches.append(thread)
+                thread.start()
+            else:
+                self._dispatch(message)
+
+        for thread in self._batches:
+            thread.join()
+        self.executor.shutdown(wait=True)
+
+    @staticmethod
+    def _is_tool_call(message: Any) -> bool:
+        return isinstance(message, dict) and message.get('method') == 'tools/call'
+
+    def _register(self, message: Any) -> None:
+        """登记工具调用，收到 notifications/cancelled 时据此停止"""
+        if self._is_tool_call(message) and 'id' in message:
+            with self._cancel_lock:
+                self._cancelled[message['id']] = threading.Event()
+
+    def _handle_batch(self, messages: List[Any]) -> None:
+        futures = [self.executor.submit(self._handle, message) for message in messages]
+        responses = [future.result() for future in futures]
+        responses = [response for response in responses if response is not None]
+        if responses:
+            self.send(responses)
+
+    def _dispatch(self, message: Any) -> None:
+        """通知和轻量请求直接处理，工具调用放入线程池，避免慢调用阻塞后续消息"""
+        if self._is_tool_call(message):
+            self._register(message)
+            self.executor.submit(self._respond, message)
+        else:
+            self._respond(message)
+
+    def _respond(self, message: Any) -> None:
+        response = self._handle(message)
+        if response is not None:
+            self.send(response)
+
+    def _handle(self, message: Any) -> Optional[Dict[str, Any]]:
+        """处理一条消息，返回响应（通知和已取消的请求返回None）"""
+        if not isinstance(message, dict) or message.get('jsonrpc') != '2.0' or 'method' not in message:
+            return self._error(message.get('id') if isinstance(message, dict) else None,
+                               INVALID_REQUEST, "不是有效的JSON-RPC 2.0消息")
+
+        method = message['method']
+        params = message.get('params') or {}
+        request_id = message.get('id')
+        is_notification = 'id' not in message
+
+        if is_notification:
+            if method == 'notifications/cancelled':
+                with self._cancel_lock:
+                    event = self._cancelled.get(params.get('requestId'))
+                if event is not None:
+                    event.set()
+            return None
+
+        try:
+            if method == 'initialize':
+                result = self._initialize(params)
+            elif method == 'ping':
+                result = {}
+            elif method == 'tools/list':
+                result = {'tools': tool_definitions()}
+            elif method == 'tools/call':
+                result = self._call_tool(request_id, params)
+            else:
+                return self._error(request_id, METHOD_NOT_FOUND, f"不支持的方法: {method}")
+        except ValueError as e:
+            return self._error(request_id, INVALID_PARAMS, str(e))
+        except Exception as e:
+            print(f"处理MCP请求 {method} 时出错: {e}")
+            return self._error(request_id, INTERNAL_ERROR, str(e))
+        finally:
+            with self._cancel_lock:
+                event = self._cancelled.pop(request_id, None)
+
+        # 客户端已取消的请求不再返回结果
+        if event is not None and event.is_set():
+            return None
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+    @staticmethod
+    def _initialize(params: Dict[str, Any]) -> Dict[str, Any]:
+        requested = params.get('protocolVersion')
+        return {
+            'protocolVersion': requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0],
+            'capabilities': {'tools': {'listChanged': False}},
+            'serverInfo': {'name': MCP_SERVER_NAME, 'version': '1.0.0'},
+            'instructions': '检索和回答Model Context Protocol（协议规范、Python SDK、TypeScript SDK）相关问题。'
+                            '需要原文依据时用search，需要整理好的回答时用answer；多个问题用对应的_batch工具。'
+        }
+
+    def _call_tool(self, request_id: Any, params: Dict[str, Any]) -> Dict[str, Any]:
+        name = params.get('name')
+        if name not in self.tools:
+            raise ValueError(f"未知的工具: {name}")
+        arguments = params.get('arguments') or {}
+        token = (params.get('_meta') or {}).get('progressToken')
+        with self._cancel_lock:
+            cancelled = self._cancelled.get(request_id) or threading.Event()
+
+        def progress(done: int, total: int, message: str = "") -> None:
+            if token is not None and not cancelled.is_set():
+                payload = {'progressToken': token, 'progress': done, 'total': total}
+                if message:
+                    payload['message'] = message
+                self.notify('notifications/progress', payload)
+
+        try:
+            result = self.tools[name](arguments, progress, cancelled)
+        except ToolError as e:
+            return {'content': [{'type': 'text', 'text': str(e)}], 'isError': True}
+        return {
+            'content': [{'type': 'text', 'text': json.dumps(result, ensure_ascii=False)}],
+            'structuredContent': result,
+            'isError': False
+        }
+
+    # ---------- 工具实现 ----------
+
+    @staticmethod
+    def _scope(arguments: Dict[str, Any]) -> Dict[str, str]:
+        language = arguments.get('language', LANGUAGE_AUTO)
+        if language not in [LANGUAGE_AUTO, LANGUAGE_ALL] + known_languages():
+            raise ToolError(f"不支持的语言分区: {language}")
+        return {'source': arguments.get('source', ""), 'language': language}
+
+    @staticmethod
+    def _queries(arguments: Dict[str, Any]) -> List[str]:
+        queries = arguments.get('queries')
+        if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+            raise ValueError("queries必须是非空的字符串列表")
+        if len(queries) > MCP_BATCH_MAX_QUERIES:
+            raise ValueError(f"单次最多 {MCP_BATCH_MAX_QUERIES} 个问题")
+        return queries
+
+    @staticmethod
+    def _query(arguments: Dict[str, Any]) -> str:
+        query = arguments.get('query')
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError("query必须是非空字符串")
+        return query
+
+    def _retrieve(self, query: str, top_k: int, scope: Dict[str, str]) -> Dict[str, Any]:
+        degraded = []
+        hits, filters = self.rag.retrieve(query, Deadline(REQUEST_TIMEOUT_SECONDS), scope['source'],
+                                          scope['language'], degraded=degraded)
+        return {
+            'query': query,
+            'results': [
+                {'id': hit.id, 'source': hit.source, 'header': hit.header,
+                 'similarity': round(hit.similarity, 4), 'content': hit.content}
+                for hit in hits[:top_k]
+            ],
+            'filters': filters,
+            'degraded': degraded
+        }
+
+    def _generate(self, query: str, mode: str, scope: Dict[str, str], priority: int) -> Dict[str, Any]:
+        result = self.rag.generate_response(query, client_id=MCP_CLIENT_ID, priority=priority, mode=mode,
+                                            source=scope['source'], language=scope['language'])
+        if not result['success']:
+            raise ToolError(result.get('response') or result.get('reason') or "无法生成回答")
+        return {
+            'query': query,
+            'answer': result['response'],
+            'mode': result.get('mode'),
+            'sources': [source.to_dict() for source in result['sources']],
+            'degraded': result.get('degraded', []),
+            'cached': result.get('cached', False)
+        }
+
+    @staticmethod
+    def _top_k(arguments: Dict[str, Any]) -> int:
+        top_k = arguments.get('top_k', TOP_K_RESULTS)
+        if not isinstance(top_k, int) or top_k < 1:
+            raise ValueError("top_k必须是正整数")
+        return min(top_k, TOP_K_RESULTS)
+
+    @staticmethod
+    def _mode(arguments: Dict[str, Any]) -> str:
+        mode = arguments.get('mode', ANSWER_MODE)
+        if mode not in ANSWER_MODES:
+            raise ToolError(f"不支持的回答模式: {mode}")
+        return mode
+
+    def _search(self, arguments, progress, cancelled) -> Dict[str, Any]:
+        return self._retrieve(self._query(arguments), self._top_k(arguments), self._scope(arguments))
+
+    def _answer(self, arguments, progress, cancelled) -> Dict[str, Any]:
+        query = self._query(arguments)
+        mode = self._mode(arguments)
+        scope = self._scope(arguments)
+        # 先单独检索并报告进度，随后的生成直接使用检索结果缓存
+        retrieved = self._retrieve(query, TOP_K_RESULTS, scope)
+        progress(1, 2, f"检索完成，找到 {len(retrieved['results'])} 个相关片段")
+        if cancelled.is_set():
+            return {'query': query, 'cancelled': True}
+        answer = self._generate(query, mode, scope, PRIORITY_INTERACTIVE)
+        progress(2, 2, "回答生成完成")
+        return answer
+
+    def _run_batch(self, queries: List[str], work: Callable[[str], Dict[str, Any]],
+                   progress, cancelled) -> Dict[str, Any]:
+        """以有限并发执行批量问题，每完成一个发送一次进度通知（消息为该问题的JSON结果）"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        pending = {}
+        done_count = 0
+
+        def run(index: int) -> Dict[str, Any]:
+            try:
+                return work(queries[index])
+            except ToolError as e:
+                return {'query': queries[index], 'error': str(e)}
+            except Exception as e:
+                print(f"批量处理问题 {queries[index]} 时出错: {e}")
+                return {'query': queries[index], 'error': str(e)}
+
+        def collect(finished) -> None:
+            nonlocal done_count
+            for future in finished:
+                index = pending.pop(future)
+                results[index] = future.result()
+                done_count += 1
+                progress(done_count, len(queries), json.dumps(results[index], ensure_ascii=False))
+
+        with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="mcp-batch") as executor:
+            for index in range(len(queries)):
+                if cancelled.is_set():
+                    break
+                if len(pending) >= BATCH_CONCURRENCY:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                pending[executor.submit(run, index)] = index
+            finished, _ = wait(pending)
+            collect(finished)
+
+        return {'results': [result for result in results if result is not None],
+                'cancelled': cancelled.is_set()}
+
+    def _search_batch(self, arguments, progress, cancelled) -> Dict[str, Any]:
+        queries = self._queries(arguments)
+        top_k = self._top_k(arguments)
+        scope = self._scope(arguments)
+        return self._run_batch(queries, lambda query: self._retrieve(query, top_k, scope), progress, cancelled)
+
+    def _answer_batch(self, arguments, progress, cancelled) -> Dict[str, Any]:
+        queries = self._queries(arguments)
+        mode = self._mode(arguments)
+        scope = self._scope(arguments)
+        return self._run_batch(queries, lambda query: self._generate(query, mode, scope, PRIORITY_BACKGROUND),
+                               progress, cancelled)
+
+
+def main():
+    # 标准输出只用于协议消息，其他模块的print输出转到标准错误
+    protocol_output = sys.stdout
+    sys.stdout = sys.stderr
+
+    from data_processor import get_encoding
+    from rag_system import RAGSystem
+
+    rag = RAGSystem()
+    # 提前加载分词器，第一次工具调用不再等待
+    get_encoding()
+    rag.start_warm_up()
+    print("MCP服务已启动（stdio），工具: search, search_batch, answer, answer_batch")
+
+    MCPServer(rag, protocol_output).serve(sys.stdin)
+
+
+if __name__ == "__main__":
+    main()
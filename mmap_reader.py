@@ -0,0 +1,94 @@
+import mmap
+import re
+from array import array
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+# 段落分隔符：空行（兼容 \r\n 换行），与文本模式读取后 split('\n\n') 的结果一致
+_PARAGRAPH_BREAK = re.compile(rb'\r?\n\r?\n')
+_LEADING_SPACE = re.compile(rb'\s*')
+
+
+class MappedTextFile:
+    """以内存映射方式打开的UTF-8文本文件
+
+    打开时扫描一遍文件，只记录每个段落的字节偏移和是否为标题（以#开头），
+    段落内容在遍历时才从映射中切片解码，文件本身不会被整体读入内存。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.name = self.path.name
+        self._file = open(self.path, 'rb')
+        size = self.path.stat().st_size
+        # 空文件无法映射
+        self._mm: Optional[mmap.mmap] = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.size = size
+
+        # 每个段落的 [起始, 结束) 字节偏移
+        self.starts = array('q')
+        self.ends = array('q')
+        # 标题段落的序号
+        self.headers = array('q')
+        self._scan()
+
+    def _scan(self) -> None:
+        """扫描段落边界，建立偏移索引"""
+        if self._mm is None:
+            return
+        position = 0
+        for match in _PARAGRAPH_BREAK.finditer(self._mm):
+            self._add_paragraph(position, match.start())
+            position = match.end()
+        self._add_paragraph(position, self.size)
+
+    def _add_paragraph(self, start: int, end: int) -> None:
+        """记录一个段落，跳过空白段落"""
+        # 与 str.strip() 一致地跳过首部空白
+        start = _LEADING_SPACE.match(self._mm, start, end).end()
+        if start >= end:
+            return
+        if self._mm[start:start + 1] == b'#':
+            self.headers.append(len(self.starts))
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def paragraph(self, index: int) -> str:
+        """解码第index个段落（去掉首尾空白，换行统一为\\n）"""
+        view = memoryview(self._mm)[self.starts[index]:self.ends[index]]
+        try:
+            return str(view, 'utf-8').replace('\r\n', '\n').strip()
+        finally:
+            view.release()
+
+    def iter_paragraphs(self) -> Iterator[str]:
+        """按顺序逐个解码段落"""
+        for index in range(len(self.starts)):
+            yield self.paragraph(index)
+
+    def sections(self) -> Iterator[Tuple[Optional[int], int, int]]:
+        """按标题索引遍历章节 (标题段落序号, 内容起始段落序号, 内容结束段落序号)
+
+        第一个标题之前的内容作为标题序号为None的章节；内容为空的章节同样产出，由调用方决定是否跳过。
+        """
+        bounds = list(self.headers) + [len(self.starts)]
+        if bounds[0] > 0:
+            yield None, 0, bounds[0]
+        for header, following in zip(self.headers, bounds[1:]):
+            yield header, header + 1, following
+
+    def close(self) -> None:
+        """关闭映射和文件"""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self) -> "MappedTextFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本块/检索结果数据模型的内存基准测试
+在合成语料上对比字典表示与 __slots__ 模型（models.py）在分块、去重、检索结果、
+来源列表各阶段新增的常驻内存和内存块数量（文本内容、ID和元数据两种表示共用，不计入）。
+耗时在tracemalloc跟踪下测得，只用于粗略比较
+
+用法:
+    python model_benchmark.py
+    python model_benchmark.py --chunks 500000 --json models.json
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from models import Chunk, Hit, Source
+
+
+def synthetic_corpus(count: int, size: int, seed: int) -> Dict[str, List[Any]]:
+    """合成语料：文本、来源、标题、ID和ChromaDB元数据"""
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz     "
+    sources = [f"doc_{i}.txt" for i in range(16)]
+    corpus = {'contents': [], 'sources': [], 'headers': [], 'ids': [], 'metadatas': [], 'similarities': []}
+    for i in range(count):
+        source = sources[i % len(sources)]
+        header = f"Section {i}"
+        corpus['contents'].append(''.join(rng.choice(alphabet) for _ in range(size)))
+        corpus['sources'].append(source)
+        corpus['headers'].append(header)
+        corpus['ids'].append(f"doc_{i}_{source}")
+        corpus['metadatas'].append({'source': source, 'header': header, 'size': size, 'language': 'spec'})
+        corpus['similarities'].append(rng.random())
+    return corpus
+
+
+def dict_stages(corpus: Dict[str, List[Any]]) -> List[Tuple[str, Callable[[Any], Any]]]:
+    """字典表示：每个阶段重新包装一次"""
+    def chunk(_):
+        return [{'content': content, 'source': source, 'header': header, 'size': len(content)}
+                for content, source, header in zip(corpus['contents'], corpus['sources'], corpus['headers'])]
+
+    def dedup(chunks):
+        return [dict(chunk) for chunk in chunks]
+
+    def hits(_):
+        return [{'id': doc_id, 'content': content, 'metadata': metadata,
+                 'similarity': similarity, 'distance': 1 - similarity}
+                for doc_id, content, metadata, similarity in
+                zip(corpus['ids'], corpus['contents'], corpus['metadatas'], corpus['similarities'])]
+
+    def sources(results):
+        return [{'source': hit['metadata']['source'], 'header': hit['metadata'].get('header', ''),
+                 'similarity': hit['similarity']} for hit in results]
+
+    return [('chunk', chunk), ('dedup', dedup), ('hits', hits), ('sources', sources)]
+
+
+def model_stages(corpus: Dict[str, List[Any]]) -> List[Tuple[str, Callable[[Any], Any]]]:
+    """__slots__ 模型：去重在原对象上标记，来源直接引用检索结果的字段"""
+    def chunk(_):
+        return [Chunk(content, source, header=header)
+                for content, source, header in zip(corpus['contents'], corpus['sources'], corpus['headers'])]
+
+    def dedup(chunks):
+        return list(chunks)
+
+    def hits(_):
+        return [Hit(doc_id, metadata, similarity, 1 - similarity, content=content)
+                for doc_id, content, metadata, similarity in
+                zip(corpus['ids'], corpus['contents'], corpus['metadatas'], corpus['similarities'])]
+
+    def sources(results):
+        return [Source.from_hit(hit) for hit in results]
+
+    return [('chunk', chunk), ('dedup', dedup), ('hits', hits), ('sources', sources)]
+
+
+def run(name: str, stages: List[Tuple[str, Callable[[Any], Any]]], count: int) -> Dict[str, Any]:
+    """依次执行各阶段，记录每个阶段新增的常驻内存、内存块数和耗时"""
+    keep = []
+    previous = None
+    rows = {}
+    gc.collect()
+    tracemalloc.start()
+    for stage, fn in stages:
+        before = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+        previous = fn(previous)
+        elapsed = time.perf_counter() - started
+        after = tracemalloc.take_snapshot()
+        keep.append(previous)
+        diff = after.compare_to(before, 'filename')
+        rows[stage] = {
+            'bytes_per_chunk': round(sum(stat.size_diff for stat in diff) / count, 1),
+            'blocks_per_chunk': round(sum(stat.count_diff for stat in diff) / count, 2),
+            'ms': round(elapsed * 1000, 1)
+        }
+    tracemalloc.stop()
+    total = {
+        'bytes_per_chunk': round(sum(row['bytes_per_chunk'] for row in rows.values()), 1),
+        'blocks_per_chunk': round(sum(row['blocks_per_chunk'] for row in rows.values()), 2),
+        'ms': round(sum(row['ms'] for row in rows.values()), 1)
+    }
+    return {'representation': name, 'stages': rows, 'total': total}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据模型内存基准：每个文本块的常驻内存和内存块数')
+    parser.add_argument('--chunks', type=int, default=200000, help='合成文本块数量')
+    parser.add_argument('--size', type=int, default=64, help='每个文本块的字符数（文本不计入结果）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.chunks, args.size, args.seed)
+    print(f"语料: {args.chunks} 个文本块")
+
+    results = [run('dict', dict_stages(corpus), args.chunks),
+               run('slots', model_stages(corpus), args.chunks)]
+
+    header = f"{'representation':<15} {'stage':<8} {'bytes/chunk':>12} {'blocks/chunk':>13} {'ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        for stage, row in list(result['stages'].items()) + [('total', result['total'])]:
+            print(f"{result['representation']:<15} {stage:<8} {row['bytes_per_chunk']:>12.1f} "
+                  f"{row['blocks_per_chunk']:>13.2f} {row['ms']:>9.1f}")
+
+    saved = 1 - results[1]['total']['bytes_per_chunk'] / max(results[0]['total']['bytes_per_chunk'], 1e-9)
+    print(f"每个文本块的对象开销减少 {saved:.1%}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'chunks': args.chunks, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from typing import Any, Dict, List, Optional
+
+# 检索方式
+RETRIEVAL_VECTOR = "vector"
+RETRIEVAL_LEXICAL = "lexical"
+
+
+class Chunk:
+    """分块产生的一个文本块，从分块、去重一直传递到写入向量存储"""
+    __slots__ = ('content', 'source', 'header', 'size', 'token_count', 'type', 'sources', 'duplicate_count')
+
+    def __init__(self, content: str, source: str, header: Optional[str] = None,
+                 token_count: Optional[int] = None, type: str = "unknown"):
+        self.content = content
+        self.source = source
+        self.header = header  # 按大小分块时没有标题
+        self.size = len(content)
+        self.token_count = token_count
+        self.type = type
+        # 去重合并后记录全部来源文件和合并的块数
+        self.sources: Optional[List[str]] = None
+        self.duplicate_count = 1
+
+    def all_sources(self) -> List[str]:
+        """文本块的全部来源文件"""
+        return self.sources or [self.source]
+
+    def __repr__(self) -> str:
+        return f"Chunk(source={self.source!r}, header={self.header!r}, size={self.size})"
+
+
+class Hit:
+    """一条检索结果，向量检索和词法检索共用"""
+    __slots__ = ('id', 'content', 'metadata', 'similarity', 'distance', 'retrieval')
+
+    def __init__(self, id: str, metadata: Dict[str, Any], similarity: float, distance: float,
+                 content: Optional[str] = None, retrieval: str = RETRIEVAL_VECTOR):
+        self.id = id
+        self.content = content  # 通过阈值后才从文本块存储读取
+        self.metadata = metadata
+        self.similarity = similarity
+        self.distance = distance
+        self.retrieval = retrieval
+
+    @property
+    def source(self) -> str:
+        return self.metadata.get('source', '')
+
+    @property
+    def header(self) -> str:
+        return self.metadata.get('header', '')
+
+    def source_label(self) -> str:
+        """上下文中显示的来源（合并的文本块列出全部来源）"""
+        return self.metadata.get('sources', self.source).replace(',', ', ')
+
+    def __repr__(self) -> str:
+        return f"Hit(id={self.id!r}, similarity={self.similarity:.3f})"
+
+
+class Source:
+    """回答引用的来源文档"""
+    __slots__ = ('source', 'header', 'similarity')
+
+    def __init__(self, source: str, header: str, similarity: float):
+        self.source = source
+        self.header = header
+        self.similarity = similarity
+
+    @classmethod
+    def from_hit(cls, hit: Hit) -> "Source":
+        return cls(hit.source, hit.header, hit.similarity)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为JSON响应中的格式"""
+        return {'source': self.source, 'header': self.header, 'similarity': self.similarity}
+
+    def __repr__(self) -> str:
+        return f"Source(source={self.source!r}, header={self.header!r}, similarity={self.similarity:.3f})"
@@ -0,0 +1,124 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import *
+
+# 语言过滤参数
+LANGUAGE_AUTO = "auto"  # 根据查询自动识别
+LANGUAGE_ALL = "all"  # 不过滤
+
+LANGUAGE_PYTHON = "python"
+LANGUAGE_TYPESCRIPT = "typescript"
+
+# 过滤用的布尔元数据键前缀：每个来源文件和语言分区各一个键，去重合并的文本块带有全部来源和语言的键
+SOURCE_KEY_PREFIX = "src:"
+LANGUAGE_KEY_PREFIX = "lang:"
+
+# 查询中提到Python SDK的特征
+_PYTHON_PATTERNS = re.compile(
+    r'\bpython\b|\bpy\b|\bpip\b|\buv\b|\bfastmcp\b|\basyncio\b|\bpydantic\b|\bdef\b|@mcp\.|\.py\b|'
+    r'python-sdk|mcp\.server\.|装饰器',
+    re.IGNORECASE
+)
+
+# 查询中提到TypeScript SDK的特征
+_TYPESCRIPT_PATTERNS = re.compile(
+    r'\btypescript\b|\bts\b|\bjavascript\b|\bjs\b|\bnode(?:\.?js)?\b|\bnpm\b|\bnpx\b|\bzod\b|\.ts\b|'
+    r'typescript-sdk|@modelcontextprotocol/sdk|\bMcpServer\b|\bexpress\b',
+    re.IGNORECASE
+)
+
+
+def source_language(source: str) -> str:
+    """文档来源所属的语言分区"""
+    return SOURCE_LANGUAGES.get(source, DEFAULT_LANGUAGE)
+
+
+def known_languages() -> List[str]:
+    """全部语言分区"""
+    return list(dict.fromkeys(list(SOURCE_LANGUAGES.values()) + [DEFAULT_LANGUAGE]))
+
+
+def detect_language(query: str) -> Optional[str]:
+    """识别查询针对的SDK语言，未提及或同时提及多种语言时返回None"""
+    python = bool(_PYTHON_PATTERNS.search(query))
+    typescript = bool(_TYPESCRIPT_PATTERNS.search(query))
+    if python and not typescript:
+        return LANGUAGE_PYTHON
+    if typescript and not python:
+        return LANGUAGE_TYPESCRIPT
+    return None
+
+
+def resolve_languages(query: str, language: str = LANGUAGE_AUTO) -> Tuple[Optional[List[str]], str]:
+    """把请求的语言参数解析为要检索的分区列表，返回 (分区列表或None, 原因)
+
+    自动识别出SDK语言时同时保留通用规范分区，规范内容对SDK问题同样有用。
+    """
+    if language == LANGUAGE_ALL or not language:
+        return None, "all"
+    if language != LANGUAGE_AUTO:
+        return [language], "requested"
+    if not LANGUAGE_ROUTING_ENABLED:
+        return None, "all"
+
+    detected = detect_language(query)
+    if detected is None:
+        return None, "all"
+    return list(dict.fromkeys([detected, DEFAULT_LANGUAGE])), "detected"
+
+
+def membership_metadata(sources: List[str], languages: List[str]) -> Dict[str, bool]:
+    """文本块所属来源文件和语言分区的布尔元数据键，用于ChromaDB过滤（标量的source/language只记录一个值）"""
+    metadata = {f"{SOURCE_KEY_PREFIX}{source}": True for source in sources}
+    metadata.update({f"{LANGUAGE_KEY_PREFIX}{language}": True for language in languages})
+    return metadata
+
+
+def has_membership_metadata(metadata: Dict[str, Any]) -> bool:
+    """元数据中是否已有过滤用的来源键（旧版本构建的知识库没有）"""
+    return any(key.startswith(SOURCE_KEY_PREFIX) for key in metadata)
+
+
+def any_of(prefix: str, values: List[str]) -> Dict[str, Any]:
+    """匹配任一给定值的布尔键条件"""
+    conditions = [{f"{prefix}{value}": True} for value in values]
+    return conditions[0] if len(conditions) == 1 else {"$or": conditions}
+
+
+def build_where(source: str = "", languages: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """构建ChromaDB的where过滤条件，与matches的判断一致（合并的文本块匹配其任一来源和语言）"""
+    conditions = []
+    if source:
+        conditions.append(any_of(SOURCE_KEY_PREFIX, [source]))
+    if languages:
+        conditions.append(any_of(LANGUAGE_KEY_PREFIX, languages))
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+def metadata_sources(metadata: Dict[str, Any]) -> List[str]:
+    """文本块的全部来源文件（去重合并的文本块有多个来源）"""
+    if metadata.get('sources'):
+        return metadata['sources'].split(',')
+    return [metadata.get('source', '')]
+
+
+def metadata_languages(metadata: Dict[str, Any]) -> List[str]:
+    """文本块所属的全部语言分区"""
+    if metadata.get('languages'):
+        return metadata['languages'].split(',')
+    return [metadata.get('language') or source_language(metadata.get('source', ''))]
+
+
+def matches(metadata: Dict[str, Any], source: str = "", languages: Optional[List[str]] = None) -> bool:
+    """元数据是否满足过滤条件（用于内存索引的过滤）"""
+    if source and source not in metadata_sources(metadata):
+        return False
+    if languages and not set(metadata_languages(metadata)) & set(languages):
+        return False
+    return True
@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config import *
+from admission import ClientRateLimiter
+from deadline import Deadline
+from partitions import LANGUAGE_AUTO
+from single_flight import normalize_text
+from warmup import popular_queries
+
+
+class Prefetcher:
+    """用户输入过程中预先生成查询向量并检索，提交时直接命中查询向量和检索结果缓存
+
+    每个客户端只有最新一次预取有效：新的预取到达后，旧预取在下一个阶段开始前停止；
+    嵌入服务排队或熔断时不预取，不与正式请求争抢资源。
+    除了当前输入，还会预取以当前输入为前缀的常见问题（可能的补全）。
+    """
+
+    def __init__(self, rag, rate: float = PREFETCH_RATE_LIMIT, burst: int = PREFETCH_RATE_BURST,
+                 min_chars: int = PREFETCH_MIN_CHARS, max_completions: int = PREFETCH_MAX_COMPLETIONS,
+                 max_clients: int = 10000):
+        self.rag = rag
+        self.rate_limiter = ClientRateLimiter(rate, burst, max_clients)
+        self.min_chars = min_chars
+        self.max_completions = max_completions
+        self.max_clients = max_clients
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._completions: Optional[List[str]] = None
+        self.requests = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.skipped = 0
+
+    def begin(self, client_id: str) -> int:
+        """登记客户端的一次新预取，之前未完成的预取随之过期"""
+        with self._lock:
+            generation = self._generations.pop(client_id, 0) + 1
+            self._generations[client_id] = generation
+            if len(self._generations) > self.max_clients:
+                self._generations.popitem(last=False)
+            self.requests += 1
+            return generation
+
+    def is_stale(self, client_id: str, generation: int) -> bool:
+        with self._lock:
+            return self._generations.get(client_id) != generation
+
+    def candidates(self, text: str) -> List[str]:
+        """需要预取的查询：当前输入，以及以它为前缀的常见问题"""
+        if self._completions is None:
+            self._completions = [item['query'] for item in popular_queries()
+                                 if item.get('mode', ANSWER_MODE) == ANSWER_MODE
+                                 and not item.get('source') and item.get('language', LANGUAGE_AUTO) == LANGUAGE_AUTO]
+        prefix = normalize_text(text, casefold=True)
+        queries = [text]
+        for query in self._completions:
+            if len(queries) > self.max_completions:
+                break
+            normalized = normalize_text(query, casefold=True)
+            if normalized != prefix and normalized.startswith(prefix):
+                queries.append(query)
+        return queries
+
+    def _upstream_busy(self) -> bool:
+        """嵌入服务有排队或处于熔断时跳过预取"""
+        store = self.rag.vector_store
+        return store.embedding_gate.queue_fill() > 0 or store.embedding_breaker.is_open()
+
+    def prefetch(self, client_id: str, generation: int, text: str, source: str = "",
+                 language: str = LANGUAGE_AUTO) -> Dict[str, Any]:
+        """依次预取候选查询，返回已预取的查询数和结束原因（done / cancelled / too_short / busy）"""
+        text = text.strip()
+        if len(text) < self.min_chars:
+            self.skipped += 1
+            return {'prefetched': 0, 'reason': "too_short"}
+        if self._upstream_busy():
+            self.skipped += 1
+            return {'prefetched': 0, 'reason': "busy"}
+
+        prefetched = 0
+        for query in self.candidates(text):
+            # 查询向量和检索分两步执行，中间检查是否已有更新的输入
+            if self.is_stale(client_id, generation):
+                self.cancelled += 1
+                return {'prefetched': prefetched, 'reason': "cancelled"}
+            deadline = Deadline(PREFETCH_TIMEOUT_SECONDS)
+            if not self.rag.vector_store.get_embedding(query, timeout=deadline.remaining()):
+                break
+            if self.is_stale(client_id, generation):
+                self.cancelled += 1
+                return {'prefetched': prefetched, 'reason': "cancelled"}
+            self.rag.retrieve(query, deadline, source, language)
+            prefetched += 1
+
+        self.completed += 1
+        return {'prefetched': prefetched, 'reason': "done"}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取预取统计信息"""
+        return {
+            'requests': self.requests,
+            'completed': self.completed,
+            'cancelled': self.cancelled,
+            'skipped': self.skipped,
+            'rate_limited': self.rate_limiter.limited
+        }
@@ -0,0 +1,151 @@
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import *
+
+# 查询文本中需要脱敏的内容，替换为占位符后保留查询的长度和结构
+_REDACTIONS = [
+    (re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+'), '<email>'),
+    (re.compile(r'\b(?:sk|ak|key|token)[-_][A-Za-z0-9_-]{8,}', re.IGNORECASE), '<secret>'),
+    (re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}\b'), '<ip>'),
+    (re.compile(r'(?<!\d)\+?\d[\d -]{9,}\d(?!\d)'), '<number>')
+]
+
+
+def anonymize_query(text: str) -> str:
+    """去掉查询中的邮箱、密钥、IP和长数字串（电话、证件号等）"""
+    for pattern, placeholder in _REDACTIONS:
+        text = pattern.sub(placeholder, text)
+    return text
+
+
+def anonymize_client(client_id: str, salt: str = QUERY_LOG_SALT) -> str:
+    """客户端标识加盐哈希，同一客户端的请求仍可关联，但无法还原原始地址"""
+    return hashlib.sha256(f"{salt}\0{client_id}".encode('utf-8')).hexdigest()[:16]
+
+
+class QueryLog:
+    """按比例采样记录查询的JSONL日志，超过max_bytes后轮转
+
+    每条记录包含脱敏后的查询文本、时间戳、匿名客户端标识、请求参数、响应状态、
+    检索到的文本块ID和各阶段耗时，可用 replay_queries.py 按原始节奏回放。
+    """
+
+    def __init__(self, path: str = QUERY_LOG_PATH, sample_rate: float = QUERY_LOG_SAMPLE_RATE,
+                 max_bytes: int = QUERY_LOG_MAX_BYTES, backup_count: int = QUERY_LOG_BACKUP_COUNT,
+                 enabled: bool = QUERY_LOG_ENABLED):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.enabled = enabled
+        self._random = random.Random()
+        self._file = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.skipped = 0
+        self.rotations = 0
+        self.errors = 0
+
+    def record(self, query: str, client_id: str, status: int, latency_ms: float,
+               result: Optional[Dict[str, Any]] = None, mode: str = ANSWER_MODE,
+               source: str = "", language: str = "") -> None:
+        """采样记录一次请求，result为generate_response的返回值（被拒绝的请求为None）"""
+        if not self.enabled:
+            return
+        if self._random.random() >= self.sample_rate:
+            self.skipped += 1
+            return
+
+        result = result or {}
+        timings = dict(result.get('timings', {}))
+        timings['total_ms'] = latency_ms
+        entry = {
+            'ts': round(time.time(), 3),
+            'query': anonymize_query(query),
+            'client': anonymize_client(client_id),
+            'mode': mode,
+            'source': source,
+            'language': language,
+            'status': status,
+            'success': bool(result.get('success', False)),
+            'answer_mode': result.get('mode'),
+            'retrieved_ids': result.get('retrieved_ids', []),
+            'degraded': result.get('degraded', []),
+            'coalesced': result.get('coalesced', False),
+            'timings': timings
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                self._file.write(line)
+                self._file.flush()
+                self.written += 1
+                if self._file.tell() >= self.max_bytes:
+                    self._rotate()
+            except OSError as e:
+                self.errors += 1
+                print(f"写入查询日志时出错: {e}")
+
+    def _rotate(self) -> None:
+        """当前文件改名为 .1，已有的 .N 依次后移，超出backup_count的删除"""
+        self._file.close()
+        self._file = None
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                older = f"{self.path}.{index}"
+                if os.path.exists(older):
+                    os.replace(older, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取日志统计信息"""
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'written': self.written,
+            'skipped': self.skipped,
+            'rotations': self.rotations,
+            'errors': self.errors
+        }
+
+
+def log_files(path: str = QUERY_LOG_PATH) -> List[str]:
+    """日志文件及其轮转文件，从旧到新排列"""
+    rotated = [name for name in glob.glob(f"{glob.escape(path)}.*") if name.rsplit(".", 1)[-1].isdigit()]
+    rotated.sort(key=lambda name: int(name.rsplit(".", 1)[-1]), reverse=True)
+    return rotated + ([path] if os.path.exists(path) else [])
+
+
+def read_query_log(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """读取日志记录并按时间排序，跳过无法解析的行（例如写入中断的最后一行）"""
+    records = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    records.sort(key=lambda record: record['ts'])
+    return records
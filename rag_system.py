@@ -1,150 +1,496 @@
 import requests
-from typing import List, Dict, Any
+import os
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from data_processor import DataProcessor
 from vector_store import VectorStore
+from single_flight import SingleFlight, normalize_text
+from admission import ConcurrencyGate, AdmissionRejected, PRIORITY_INTERACTIVE
+from deadline import Deadline, DeadlineExceeded
+from extractive import QueryRouter, build_extractive_answer, MODE_EXTRACTIVE
+from circuit_breaker import CircuitBreaker
+from hedging import Hedger
+from partitions import resolve_languages, LANGUAGE_AUTO
+from dedup import DuplicatePlanner, deduplicate_chunks
+from build_journal import BuildJournal
+from models import Hit, Source
+from serving_cache import LRUCache
+from warmup import popular_queries, warm_up
 from config import *
 
+# 无法调用LLM时改为返回原文摘录，并在回答开头说明原因
+_FALLBACK_NOTICES = {
+    'generation_skipped': "回答生成超时，以下是知识库中最相关的原文内容：",
+    'generation_timeout': "回答生成超时，以下是知识库中最相关的原文内容：",
+    'llm_unavailable': "大模型服务暂时不可用，以下是知识库中最相关的原文内容："
+}
+
+
+def _elapsed_ms(started: float) -> float:
+    """计算从started开始经过的毫秒数"""
+    return round((time.perf_counter() - started) * 1000, 1)
+
 class RAGSystem:
-    def __init__(self):
+    def __init__(self, read_only: bool = CHROMA_READ_ONLY):
+        """read_only为True时作为只读副本（多进程Web服务的worker），不构建或更新知识库"""
         # 初始化组件
         self.data_processor = DataProcessor()
-        self.vector_store = VectorStore()
+        self.vector_store = VectorStore(read_only=read_only)
         
         # 初始化阿里云百炼LLM配置
         self.api_key = API_KEY
-        self.llm_url = "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"
+        self.llm_url = LLM_API_URL
+        
+        # 复用HTTP连接，连接池大小与并发数匹配
+        self.session = requests.Session()
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE))
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE))
+        
+        # 相同问题的并发请求只检索并调用一次LLM
+        self.response_flight = SingleFlight("response")
+        
+        # 限制同时进行的LLM调用数量，超出部分公平排队
+        self.llm_gate = ConcurrencyGate(
+            "LLM",
+            max_concurrent=LLM_MAX_CONCURRENCY,
+            max_queue=ADMISSION_MAX_QUEUE,
+            queue_timeout=ADMISSION_QUEUE_TIMEOUT
+        )
+        
+        # LLM接口持续出错或变慢时熔断，避免请求堆积
+        self.llm_breaker = CircuitBreaker(
+            "LLM",
+            window_size=CIRCUIT_WINDOW_SIZE,
+            min_calls=CIRCUIT_MIN_CALLS,
+            failure_rate=CIRCUIT_FAILURE_RATE,
+            slow_call_seconds=LLM_SLOW_CALL_SECONDS,
+            slow_call_rate=CIRCUIT_SLOW_CALL_RATE,
+            open_seconds=CIRCUIT_OPEN_SECONDS
+        )
+        
+        # LLM对冲请求（默认关闭，开启后会增加少量重复调用）
+        self.llm_hedger = Hedger(
+            "LLM",
+            percentile=HEDGE_PERCENTILE,
+            min_samples=HEDGE_MIN_SAMPLES,
+            min_delay=HEDGE_MIN_DELAY_MS / 1000.0,
+            max_extra_ratio=HEDGE_MAX_EXTRA_RATIO,
+            burst=HEDGE_BURST,
+            gate=self.llm_gate
+        )
+        
+        # 选择LLM生成或抽取式快速回答
+        self.query_router = QueryRouter()
+        
+        # 检索结果和回答缓存，知识库变化后清空
+        self.retrieval_cache = LRUCache("retrieval", RETRIEVAL_CACHE_SIZE, CACHE_TTL_SECONDS)
+        self.answer_cache = LRUCache("answer", ANSWER_CACHE_SIZE, CACHE_TTL_SECONDS)
+        
+        # 常见问题预热（服务启动和知识库更新后在后台执行）
+        self.warm_up_enabled = WARMUP_ENABLED
+        self.warm_up_stats: Dict[str, Any] = {}
+        self._warm_up_lock = threading.Lock()
         
         print("RAG系统初始化完成")
     
-    def build_knowledge_base(self, use_header_splitting: bool = True, clear_existing: bool = False) -> bool:
-        """构建知识库"""
+    def build_knowledge_base(self, use_header_splitting: bool = True, clear_existing: bool = False,
+                             resume: bool = True, warm_up: bool = True) -> bool:
+        """构建知识库
+
+        resume为True且存在上次中断的相同构建（文本块和向量配置均未变化）时，
+        保留已写入的向量，从检查点继续。构建完成后清空检索结果和回答缓存，
+        warm_up为True时在后台预热常见问题（只构建不提供服务的进程应传False）。
+        """
         try:
             print("开始构建MCP知识库...")
             
-            # 清空现有数据（如果需要）
-            if clear_existing:
-                self.vector_store.clear_collection()
-            
-            # 处理文档
-            documents = self.data_processor.process_documents(use_header_splitting)
+            # 第一遍：分块并记录去重所需的签名，同时计算构建指纹，不在内存中保留文本
+            planner = DuplicatePlanner(dedup=DEDUP_ENABLED)
+            fingerprint = BuildJournal.fingerprint(
+                planner.scan(self.data_processor.iter_documents(use_header_splitting)),
+                EMBEDDING_MODEL, self.vector_store.coarse_dim, DEDUP_ENABLED, DEDUP_THRESHOLD)
             
-            if not documents:
+            if not len(planner):
                 print("没有找到可处理的文档")
                 return False
             
-            # 添加到向量存储
-            success = self.vector_store.add_documents(documents)
+            # 合并不同文档间近似重复的文本块，减少嵌入调用和索引大小
+            print(f"总共生成 {len(planner)} 个文本块")
+            total = planner.plan()
+            
+            journal = BuildJournal(BUILD_JOURNAL_PATH)
+            if resume and journal.resumable(fingerprint):
+                print(f"发现未完成的构建，已提交 {len(journal.committed())} 个文档，从检查点继续")
+            else:
+                # 清空现有数据（如果需要）
+                if clear_existing:
+                    self.vector_store.clear_collection()
+                journal.start(fingerprint, total)
+            
+            # 第二遍：重新分块，只把规范块逐批生成嵌入并写入向量存储
+            documents = planner.apply(self.data_processor.iter_documents(use_header_splitting, verbose=False))
+            success = self.vector_store.add_documents(documents, journal, total=total)
             
             if success:
+                journal.finish()
                 # 显示知识库信息
                 info = self.vector_store.get_collection_info()
                 print(f"知识库构建完成: {info}")
+                self.clear_caches()
+                if warm_up:
+                    self.start_warm_up()
                 return True
             else:
-                print("知识库构建失败")
+                # 保留检查点日志，下次重建从最后提交的批次继续
+                print("知识库构建失败，再次运行 python main.py --rebuild 将从检查点继续")
                 return False
                 
         except Exception as e:
             print(f"构建知识库时出错: {e}")
             return False
     
-    def generate_response(self, query: str, max_tokens: int = 1000) -> Dict[str, Any]:
-        """生成回答"""
+    def reindex_files(self, names: List[str], use_header_splitting: bool = True) -> bool:
+        """增量更新指定文件的向量：重新分块并替换这些文件的文本块，其他文件不受影响
+
+        新版本的文本块先以新ID写入，再删除旧版本，更新期间检索不会缺少这些文件的内容。
+        与这些文件共享去重文本块的文件会一起重新处理，保证合并后的来源信息正确。
+        """
+        try:
+            affected = sorted(set(names) | set(self.vector_store.linked_sources(names)))
+            print(f"增量更新文件: {', '.join(affected)}")
+            started = time.perf_counter()
+            
+            old_ids = self.vector_store.source_chunk_ids(affected)
+            documents = self.data_processor.process_files(affected, use_header_splitting)
+            if DEDUP_ENABLED and documents:
+                documents = deduplicate_chunks(documents)
+            
+            if documents:
+                id_prefix = f"r{time.time_ns()}_"
+                success = self.vector_store.add_documents(documents, id_prefix=id_prefix)
+                if not success:
+                    # 删除中止前已写入的新版本文本块，避免与旧版本同时出现在检索结果中
+                    partial = [doc_id for doc_id in self.vector_store.source_chunk_ids(affected)
+                               if doc_id.startswith(id_prefix)]
+                    self.vector_store.delete_ids(partial)
+                    print("增量更新失败，保留旧版本的向量")
+                    return False
+            
+            self.vector_store.delete_ids(old_ids)
+            print(f"增量更新完成: 删除 {len(old_ids)} 个旧文本块，写入 {len(documents)} 个新文本块，"
+                  f"耗时 {_elapsed_ms(started)} ms")
+            self.clear_caches()
+            self.start_warm_up()
+            return True
+            
+        except Exception as e:
+            print(f"增量更新文件时出错: {e}")
+            return False
+    
+    def generate_response(self, query: str, max_tokens: int = 1000, client_id: str = "",
+                          priority: int = PRIORITY_INTERACTIVE,
+                          deadline: Optional[Deadline] = None, mode: str = ANSWER_MODE,
+                          source: str = "", language: str = LANGUAGE_AUTO) -> Dict[str, Any]:
+        """生成回答，LLM繁忙时抛出AdmissionRejected
+
+        mode为auto时由查询路由决定是否调用LLM，extractive直接返回原文摘录，llm总是调用LLM。
+        source限定来源文件；language为auto时根据查询识别SDK语言，all不过滤，其他值只检索该语言分区。
+        """
+        if deadline is None:
+            deadline = Deadline(REQUEST_TIMEOUT_SECONDS)
+        
+        self.refresh_index()
+        key = (normalize_text(query, casefold=True), max_tokens, mode, source, language)
+        cached = self.answer_cache.get(key)
+        if cached is not None:
+            result = dict(cached)
+            result['cached'] = True
+            result['coalesced'] = False
+            result['timings'] = {}
+            return result
+        
+        if not SINGLE_FLIGHT_ENABLED:
+            result = self._answer_query(query, max_tokens, client_id, priority, deadline, mode, source, language)
+        else:
+            try:
+                result, shared = self.response_flight.do(key, self._answer_query, query, max_tokens, client_id,
+                                                         priority, deadline, mode, source, language,
+                                                         wait_timeout=deadline.remaining())
+            except TimeoutError as e:
+                print(f"生成回答时出错: {e}")
+                return self._timeout_result()
+            
+            # 返回副本，避免多个请求共享同一个结果对象
+            result = dict(result)
+            result['coalesced'] = shared
+        
+        # 只缓存完整的回答，降级（超时、LLM不可用等）的结果下次重新生成
+        if result['success'] and not result.get('degraded'):
+            self.answer_cache.put(key, result)
+        return result
+    
+    def _answer_query(self, query: str, max_tokens: int, client_id: str,
+                      priority: int, deadline: Deadline, mode: str,
+                      source: str = "", language: str = LANGUAGE_AUTO) -> Dict[str, Any]:
+        """执行检索和生成的完整流程，每个阶段只使用剩余时间预算的一部分"""
+        timings = {}
+        degraded = []
         try:
             print(f"处理查询: {query}")
             
-            # 检索相关文档
-            relevant_docs = self.vector_store.search(query)
+            relevant_docs, filters = self.retrieve(query, deadline, source, language, timings, degraded)
             
             if not relevant_docs:
                 return {
                     'success': False,
                     'response': "抱歉，我在知识库中没有找到相关信息。",
                     'sources': [],
-                    'reason': "没有找到相关文档"
+                    'reason': "没有找到相关文档",
+                    'filters': filters,
+                    'degraded': degraded,
+                    'timings': timings
                 }
             
-            # 构建上下文
-            context = self._build_context(relevant_docs)
+            # 高置信度的查找类问题或LLM降级时直接返回原文摘录
+            answer_mode, route_reason = self.query_router.route(query, relevant_docs, mode, self._llm_available())
             
-            # 构建提示词
-            prompt = self._build_prompt(query, context)
-            
-            # 生成回答
-            answer = self._generate_response(prompt)
+            context = ""
+            highlights = []
+            started = time.perf_counter()
+            if answer_mode == MODE_EXTRACTIVE:
+                answer, highlights = build_extractive_answer(query, relevant_docs)
+            else:
+                # 剩余时间不多时缩减上下文，缩短LLM处理时间
+                context_docs = relevant_docs
+                if deadline.remaining() < CONTEXT_TRIM_SECONDS and len(relevant_docs) > TRIMMED_CONTEXT_DOCS:
+                    context_docs = relevant_docs[:TRIMMED_CONTEXT_DOCS]
+                    degraded.append("context_trimmed")
+                
+                # 构建上下文
+                context = self.build_context(context_docs)
+                
+                # 构建提示词
+                prompt = self.build_prompt(query, context)
+                
+                # 生成回答，剩余时间不足、超时或LLM不可用时改为返回原文摘录
+                fallback = None
+                if deadline.remaining() < GENERATION_MIN_SECONDS:
+                    fallback = "generation_skipped"
+                else:
+                    try:
+                        answer = self._generate_response(prompt, client_id, priority, deadline.remaining())
+                    except AdmissionRejected:
+                        raise
+                    except DeadlineExceeded as e:
+                        print(f"生成回答时出错: {e}")
+                        fallback = "generation_timeout"
+                    except Exception as e:
+                        print(f"生成回答时出错: {e}")
+                        fallback = "llm_unavailable"
+                
+                if fallback:
+                    degraded.append(fallback)
+                    answer, highlights = build_extractive_answer(query, context_docs, notice=_FALLBACK_NOTICES[fallback])
+                    answer_mode = MODE_EXTRACTIVE
+            timings['generation_ms'] = _elapsed_ms(started)
             
             # 准备源文档信息
-            sources = []
-            for doc in relevant_docs:
-                sources.append({
-                    'source': doc['metadata']['source'],
-                    'header': doc['metadata'].get('header', ''),
-                    'similarity': doc['similarity']
-                })
+            sources = [Source.from_hit(doc) for doc in relevant_docs]
             
             return {
                 'success': True,
                 'response': answer,
                 'sources': sources,
-                'context_length': len(context)
+                'context_length': len(context),
+                'mode': answer_mode,
+                'route_reason': route_reason,
+                'highlights': highlights,
+                'filters': filters,
+                'degraded': degraded,
+                'retrieved_ids': [doc.id for doc in relevant_docs],
+                'timings': timings
             }
             
+        except AdmissionRejected:
+            raise
+        except DeadlineExceeded as e:
+            print(f"生成回答时出错: {e}")
+            return self._timeout_result(timings)
         except Exception as e:
             print(f"生成回答时出错: {e}")
             return {
                 'success': False,
                 'response': f"处理查询时出错: {str(e)}",
                 'sources': [],
-                'reason': str(e)
+                'reason': str(e),
+                'timings': timings
             }
     
-    def _build_context(self, relevant_docs: List[Dict[str, Any]]) -> str:
+    def retrieve(self, query: str, deadline: Deadline, source: str = "", language: str = LANGUAGE_AUTO,
+                 timings: Optional[Dict[str, float]] = None,
+                 degraded: Optional[List[str]] = None) -> Tuple[List[Hit], Dict[str, Any]]:
+        """只执行检索，返回 (相关文档, 检索范围)；各阶段耗时和降级原因追加到timings和degraded中"""
+        timings = {} if timings is None else timings
+        degraded = [] if degraded is None else degraded
+        
+        self.refresh_index()
+        key = (normalize_text(query, casefold=True), source, language)
+        cached = self.retrieval_cache.get(key)
+        if cached is not None:
+            relevant_docs, filters = cached
+            timings['retrieval_ms'] = 0.0
+            return list(relevant_docs), dict(filters)
+        
+        # 确定检索范围：指定的来源文件和语言分区
+        languages, filter_reason = resolve_languages(query, language)
+        filters = {'source': source, 'languages': languages, 'reason': filter_reason}
+        
+        # 生成查询向量
+        started = time.perf_counter()
+        query_embedding = self.vector_store.get_embedding(
+            query, timeout=deadline.stage_timeout(EMBEDDING_STAGE_SHARE, EMBEDDING_HTTP_TIMEOUT)
+        )
+        timings['embedding_ms'] = _elapsed_ms(started)
+        
+        # 检索相关文档，嵌入服务不可用时改用词法检索
+        deadline.check("检索")
+        started = time.perf_counter()
+        if query_embedding:
+            relevant_docs = self.vector_store.search_by_embedding(query_embedding, source=source,
+                                                                  languages=languages)
+        else:
+            relevant_docs = self.vector_store.lexical_search(query, source=source, languages=languages)
+            degraded.append("lexical_retrieval")
+        timings['retrieval_ms'] = _elapsed_ms(started)
+        
+        # 词法检索是嵌入服务不可用时的降级结果，不缓存；检索出错时search_by_embedding同样返回空列表，
+        # 无法与确实没有相关内容区分，空结果也不缓存
+        if query_embedding and relevant_docs:
+            self.retrieval_cache.put(key, (relevant_docs, filters))
+        return relevant_docs, filters
+    
+    def refresh_index(self) -> bool:
+        """只读副本发现写入节点更新了知识库时重新打开索引，清空检索结果和回答缓存并重新预热"""
+        if not self.vector_store.refresh_if_changed():
+            return False
+        self.clear_caches()
+        self.start_warm_up()
+        return True
+    
+    def clear_caches(self) -> None:
+        """知识库内容变化后清空检索结果和回答缓存（查询向量与知识库无关，保留）"""
+        self.retrieval_cache.clear()
+        self.answer_cache.clear()
+    
+    def warm_up_caches(self, items: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """执行常见问题（默认取常见问题文件和查询日志中的高频问题），填充查询向量、检索结果和回答缓存"""
+        if not self._warm_up_lock.acquire(blocking=False):
+            print("缓存预热正在进行，跳过本次预热")
+            return self.warm_up_stats
+        try:
+            if self.get_knowledge_base_info().get('document_count', 0) == 0:
+                return self.warm_up_stats
+            items = popular_queries() if items is None else items
+            if not items:
+                return self.warm_up_stats
+            print(f"开始预热 {len(items)} 个常见问题...")
+            self.warm_up_stats = warm_up(self, items)
+            print(f"缓存预热完成: {self.warm_up_stats}")
+            return self.warm_up_stats
+        except Exception as e:
+            print(f"缓存预热时出错: {e}")
+            return self.warm_up_stats
+        finally:
+            self._warm_up_lock.release()
+    
+    def start_warm_up(self) -> Optional[threading.Thread]:
+        """在后台线程中预热缓存，服务可以立即接收请求"""
+        if not self.warm_up_enabled:
+            return None
+        thread = threading.Thread(target=self.warm_up_caches, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+    
+    def _timeout_result(self, timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """请求超出时间预算时的返回结果"""
+        return {
+            'success': False,
+            'response': "抱歉，处理超时，请稍后重试。",
+            'sources': [],
+            'reason': "请求超时",
+            'timings': timings or {}
+        }
+    
+    def _llm_available(self) -> bool:
+        """LLM是否处于可用状态（熔断或排队过长视为降级）"""
+        return not self.llm_breaker.is_open() and self.llm_gate.queue_fill() < LLM_DEGRADED_QUEUE_RATIO
+    
+    @staticmethod
+    def build_context(relevant_docs: List[Hit]) -> str:
         """构建上下文"""
         context_parts = []
         
         for i, doc in enumerate(relevant_docs, 1):
-            context_parts.append(f"文档 {i} (来源: {doc['metadata']['source']}, 相似度: {doc['similarity']:.3f}):")
-            context_parts.append(doc['content'])
+            context_parts.append(f"文档 {i} (来源: {doc.source_label()}, 相似度: {doc.similarity:.3f}):")
+            context_parts.append(doc.content)
             context_parts.append("---")
         
         return "\n".join(context_parts)
     
-    def _generate_response(self, prompt: str) -> str:
-        """使用阿里云百炼LLM生成回答"""
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": LLM_MODEL,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "max_tokens": 2000,
-                "temperature": 0.7,
-                "top_p": 0.8
-            }
-            
-            response = requests.post(self.llm_url, headers=headers, json=data)
-            response.raise_for_status()
-            
-            result = response.json()
-            if 'choices' in result and len(result['choices']) > 0:
-                return result['choices'][0]['message']['content']
-            else:
-                print(f"LLM API响应格式错误: {result}")
-                return "抱歉，我无法生成有效的回答。"
-                
-        except Exception as e:
-            print(f"生成回答时出错: {e}")
-            return f"处理查询时出错: {str(e)}"
+    def _generate_response(self, prompt: str, client_id: str = "", priority: int = PRIORITY_INTERACTIVE,
+                           timeout: float = LLM_HTTP_TIMEOUT) -> str:
+        """使用阿里云百炼LLM生成回答
+
+        超出timeout时抛出DeadlineExceeded，熔断或调用失败时抛出异常，由调用方降级处理。
+        """
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        data = {
+            "model": LLM_MODEL,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "max_tokens": 2000,
+            "temperature": 0.7,
+            "top_p": 0.8
+        }
+        
+        # 熔断期间直接失败，不占用排队名额
+        self.llm_breaker.ensure_closed()
+        
+        started = time.monotonic()
+        with self.llm_gate.slot(client_id, priority, timeout=min(ADMISSION_QUEUE_TIMEOUT, timeout)):
+            # 排队时间同样计入预算
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                raise DeadlineExceeded("生成")
+            try:
+                if HEDGE_LLM_ENABLED:
+                    return self.llm_hedger.call(self.llm_breaker.call, self._post_chat, headers, data,
+                                                min(remaining, LLM_HTTP_TIMEOUT))
+                return self.llm_breaker.call(self._post_chat, headers, data, min(remaining, LLM_HTTP_TIMEOUT))
+            except requests.Timeout:
+                raise DeadlineExceeded("生成")
     
-    def _build_prompt(self, query: str, context: str) -> str:
+    def _post_chat(self, headers: Dict[str, str], data: Dict[str, Any], timeout: float) -> str:
+        """发送LLM请求并取出回答文本"""
+        response = self.session.post(self.llm_url, headers=headers, json=data, timeout=timeout)
+        response.raise_for_status()
+        
+        result = response.json()
+        if 'choices' in result and len(result['choices']) > 0:
+            return result['choices'][0]['message']['content']
+        raise ValueError(f"LLM API响应格式错误: {result}")
+    
+    @staticmethod
+    def build_prompt(query: str, context: str) -> str:
         """构建提示词"""
         prompt = f"""你是一个专业的MCP（Model Context Protocol）知识助手。请基于以下上下文信息回答用户的问题。
 
@@ -196,6 +542,42 @@ class RAGSystem:
         """获取知识库信息"""
         return self.vector_store.get_collection_info()
     
+    def get_runtime_stats(self) -> Dict[str, Any]:
+        """获取运行时统计信息"""
+        return {
+            'single_flight': {
+                'response': self.response_flight.get_stats(),
+                'embedding': self.vector_store.embedding_flight.get_stats()
+            },
+            'embedding_batcher': self.vector_store.embedding_batcher.get_stats(),
+            'answer_modes': self.query_router.get_stats(),
+            'admission': {
+                'llm': self.llm_gate.get_stats(),
+                'embedding': self.vector_store.embedding_gate.get_stats()
+            },
+            'circuit_breakers': {
+                'llm': self.llm_breaker.get_stats(),
+                'embedding': self.vector_store.embedding_breaker.get_stats()
+            },
+            'hedging': {
+                'llm': self.llm_hedger.get_stats(),
+                'embedding': self.vector_store.embedding_hedger.get_stats()
+            },
+            'caches': {
+                'embedding': self.vector_store.embedding_cache.get_stats(),
+                'retrieval': self.retrieval_cache.get_stats(),
+                'answer': self.answer_cache.get_stats()
+            },
+            'warm_up': self.warm_up_stats,
+            'index': {
+                'mode': self.vector_store.mode,
+                'read_only': self.vector_store.read_only,
+                'version': self.vector_store.index_version,
+                'refreshes': self.vector_store.refreshes,
+                'pid': os.getpid()
+            }
+        }
+    
     def test_query(self, query: str) -> None:
         """测试查询功能"""
         print(f"\n{'='*50}")
@@ -210,9 +592,9 @@ class RAGSystem:
             
             print(f"\n参考来源:")
             for source in result['sources']:
-                print(f"- {source['source']} (相似度: {source['similarity']:.3f})")
-                if source['header']:
-                    print(f"  标题: {source['header']}")
+                print(f"- {source.source} (相似度: {source.similarity:.3f})")
+                if source.header:
+                    print(f"  标题: {source.header}")
         else:
             print(f"查询失败: {result.get('reason', '未知错误')}")
 
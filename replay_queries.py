@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查询日志回放工具
+按日志中记录的时间间隔（可整体加速/减速）把查询重新发送到 /chat，
+报告端到端延迟分布、状态码、回答模式、降级原因和合并/缓存命中率，
+并与日志中记录的原始延迟对比，把线上流量变成可重复的性能测试
+
+用法:
+    python replay_queries.py --url http://localhost:8000                # 回放到已运行的服务（原始速率）
+    python replay_queries.py --local --speed 4                          # 本地启动服务和模拟上游，4倍速回放
+    python replay_queries.py --local --speed 0 --max-in-flight 32       # 不等待间隔，尽快发送
+    python replay_queries.py --log logs/query_log.jsonl.1 logs/query_log.jsonl --json replay.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import requests
+
+from config import *
+from query_log import log_files, read_query_log
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """延迟分布（毫秒）"""
+    if not values:
+        return {}
+    return {
+        'count': len(values),
+        'mean': round(float(np.mean(values)), 1),
+        'p50': round(float(np.percentile(values, 50)), 1),
+        'p90': round(float(np.percentile(values, 90)), 1),
+        'p95': round(float(np.percentile(values, 95)), 1),
+        'p99': round(float(np.percentile(values, 99)), 1),
+        'max': round(float(np.max(values)), 1)
+    }
+
+
+def hit_rates(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """根据回放前后的 /stats 计算本次回放期间的请求合并率和缓存命中率"""
+    rates = {}
+    for name in ('response', 'embedding'):
+        old = before.get('single_flight', {}).get(name, {})
+        new = after.get('single_flight', {}).get(name, {})
+        leaders = new.get('leaders', 0) - old.get('leaders', 0)
+        shared = new.get('shared', 0) - old.get('shared', 0)
+        if leaders + shared:
+            rates[f'single_flight_{name}'] = round(shared / (leaders + shared), 4)
+    for name, new in after.get('caches', {}).items():
+        old = before.get('caches', {}).get(name, {})
+        hits = new.get('hits', 0) - old.get('hits', 0)
+        misses = new.get('misses', 0) - old.get('misses', 0)
+        if hits + misses:
+            rates[f'cache_{name}'] = round(hits / (hits + misses), 4)
+    return rates
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def apply_stub_config(db_path: str, embedding_url: str, llm_url: str) -> None:
+    """让之后导入的模块使用db_path中的独立索引和模拟上游，必须在导入web_interface、rag_system等模块之前调用
+
+    其他模块通过 from config import * 在导入时读取配置，之后修改config不再生效。
+    """
+    import config
+    config.CHROMA_MODE = "persistent"
+    config.CHROMA_READ_ONLY = False
+    config.CHROMA_DB_PATH = db_path
+    config.FULL_VECTOR_PATH = f"{db_path}/full_vectors"
+    config.CHUNK_STORE_PATH = f"{db_path}/chunks.sqlite3"
+    config.BUILD_JOURNAL_PATH = f"{db_path}/build_journal.jsonl"
+    config.INDEX_VERSION_PATH = f"{db_path}/index_version"
+    config.EMBEDDING_API_URL = embedding_url
+    config.LLM_API_URL = llm_url
+    config.WARMUP_ENABLED = False
+
+
+def start_local_server(stub_db: str, embedding_delay: float, llm_delay: float,
+                       warm_up_logs: Optional[List[str]] = None):
+    """启动模拟上游和本地Web服务，返回 (服务地址, 模拟上游, uvicorn服务)
+
+    服务使用哈希嵌入在stub_db中建立的独立索引（首次运行时构建），不读写正式知识库、不调用真实接口。
+    Web应用在应用测试配置后才导入，因此进程中不能已经导入过web_interface。
+    给出warm_up_logs时先用其中的高频问题完成缓存预热再返回，用于对比部署后冷启动与预热后的延迟。
+    """
+    if 'web_interface' in sys.modules:
+        raise RuntimeError("web_interface已按正式配置导入，无法切换到模拟索引")
+
+    import uvicorn
+    from stub_upstream import StubUpstream
+
+    stub = StubUpstream(embedding_delay=embedding_delay, llm_delay=llm_delay).start()
+    apply_stub_config(stub_db, stub.embedding_url, stub.llm_url)
+
+    import web_interface
+    from dedup import deduplicate_chunks
+    from warmup import popular_queries
+
+    rag = web_interface.rag_system
+    if rag.get_knowledge_base_info().get('document_count', 0) == 0:
+        print(f"构建回放用的模拟索引: {stub_db}")
+        chunks = rag.data_processor.process_documents()
+        if DEDUP_ENABLED:
+            chunks = deduplicate_chunks(chunks)
+        rag.vector_store.add_documents(chunks)
+    if warm_up_logs:
+        rag.warm_up_caches(popular_queries(log_paths=warm_up_logs))
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(web_interface.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="replay-server", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", stub, server
+
+
+class Replayer:
+    """按日志节奏回放查询，同时在途的请求数不超过max_in_flight"""
+
+    def __init__(self, url: str, speed: float = 1.0, max_in_flight: int = 64, timeout: float = 120):
+        self.url = url.rstrip("/")
+        self.speed = speed
+        self.max_in_flight = max(1, max_in_flight)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get_stats(self) -> Dict[str, Any]:
+        try:
+            return self.session.get(f"{self.url}/stats", timeout=10).json().get('stats', {})
+        except (requests.RequestException, ValueError) as e:
+            print(f"读取服务统计信息时出错: {e}")
+            return {}
+
+    def _send(self, record: Dict[str, Any], scheduled: float) -> Dict[str, Any]:
+        sent = time.perf_counter()
+        outcome = {'lag_ms': (sent - scheduled) * 1000, 'recorded_ms': record.get('timings', {}).get('total_ms')}
+        try:
+            response = self.session.post(
+                f"{self.url}/chat",
+                data={
+                    'message': record['query'],
+                    'mode': record.get('mode') or ANSWER_MODE,
+                    'source': record.get('source', ""),
+                    'language': record.get('language') or "auto"
+                },
+                # 匿名客户端标识作为来源地址，按客户端限流的行为与线上一致
+                headers={'X-Forwarded-For': record.get('client', "replay")},
+                timeout=self.timeout
+            )
+            outcome['status'] = response.status_code
+            body = response.json()
+            outcome['success'] = bool(body.get('success'))
+            outcome['mode'] = body.get('mode')
+            outcome['degraded'] = body.get('degraded', [])
+        except (requests.RequestException, ValueError) as e:
+            outcome['status'] = 0
+            outcome['success'] = False
+            outcome['error'] = str(e)
+        outcome['latency_ms'] = (time.perf_counter() - sent) * 1000
+        return outcome
+
+    def run(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """回放全部记录并汇总结果"""
+        before = self.get_stats()
+        outcomes = []
+        pending = set()
+        started = time.perf_counter()
+        first_ts = records[0]['ts'] if records else 0.0
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="replay") as executor:
+            for record in records:
+                offset = (record['ts'] - first_ts) / self.speed if self.speed > 0 else 0.0
+                scheduled = started + offset
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                if len(pending) >= self.max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    outcomes.extend(future.result() for future in done)
+                pending.add(executor.submit(self._send, record, scheduled))
+            done, _ = wait(pending)
+            outcomes.extend(future.result() for future in done)
+
+        elapsed = time.perf_counter() - started
+        after = self.get_stats()
+        return self._summary(outcomes, elapsed, before, after)
+
+    def _summary(self, outcomes: List[Dict[str, Any]], elapsed: float,
+                 before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+        statuses = Counter(outcome['status'] for outcome in outcomes)
+        ok = [outcome for outcome in outcomes if outcome['status'] == 200]
+        degraded = Counter(reason for outcome in ok for reason in outcome['degraded'])
+        recorded = [outcome['recorded_ms'] for outcome in outcomes if outcome['recorded_ms'] is not None]
+        return {
+            'requests': len(outcomes),
+            'elapsed_seconds': round(elapsed, 2),
+            'requests_per_second': round(len(outcomes) / elapsed, 2) if elapsed > 0 else 0.0,
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'success_rate': round(sum(outcome['success'] for outcome in outcomes) / len(outcomes), 4) if outcomes else 0.0,
+            'latency_ms': percentiles([outcome['latency_ms'] for outcome in outcomes]),
+            'latency_ok_ms': percentiles([outcome['latency_ms'] for outcome in ok]),
+            'recorded_latency_ms': percentiles(recorded),
+            'schedule_lag_ms': percentiles([max(0.0, outcome['lag_ms']) for outcome in outcomes]),
+            'answer_modes': dict(Counter(outcome['mode'] for outcome in ok if outcome['mode'])),
+            'degraded': dict(degraded),
+            'hit_rates': hit_rates(before, after)
+        }
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(f"请求数: {summary['requests']}, 耗时: {summary['elapsed_seconds']}s, "
+          f"吞吐: {summary['requests_per_second']} req/s, 成功率: {summary['success_rate']:.2%}")
+    print(f"状态码: {summary['statuses']}")
+    print(f"{'':<12} {'count':>6} {'mean':>8} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for label, key in (('replayed', 'latency_ms'), ('replayed_ok', 'latency_ok_ms'),
+                       ('recorded', 'recorded_latency_ms'), ('send_lag', 'schedule_lag_ms')):
+        stats = summary[key]
+        if stats:
+            print(f"{label:<12} {stats['count']:>6} {stats['mean']:>8.1f} {stats['p50']:>8.1f} {stats['p90']:>8.1f} "
+                  f"{stats['p95']:>8.1f} {stats['p99']:>8.1f} {stats['max']:>8.1f}")
+    print(f"回答模式: {summary['answer_modes']}")
+    print(f"降级原因: {summary['degraded']}")
+    print(f"合并/缓存命中率: {summary['hit_rates']}")
+    if 'upstream' in summary:
+        print(f"模拟上游调用: {summary['upstream']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查询日志回放：按原始或缩放后的速率重放/chat请求')
+    parser.add_argument('--log', nargs='+', help='日志文件（默认为QUERY_LOG_PATH及其轮转文件）')
+    parser.add_argument('--url', default="http://localhost:8000", help='目标服务地址')
+    parser.add_argument('--local', action='store_true', help='在本进程启动服务，上游嵌入和LLM接口使用本地模拟')
+    parser.add_argument('--stub-db', default="./chroma_db_replay", help='--local 使用的模拟索引目录')
+    parser.add_argument('--embedding-delay-ms', type=float, default=50, help='模拟嵌入接口的耗时（毫秒）')
+    parser.add_argument('--llm-delay-ms', type=float, default=2000, help='模拟LLM接口的耗时（毫秒）')
+    parser.add_argument('--warm-up', action='store_true',
+                        help='配合 --local 使用，回放前先用常见问题文件和日志中的高频问题预热缓存')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放速率倍数，0表示不等待间隔')
+    parser.add_argument('--max-in-flight', type=int, default=64, help='同时在途的请求数上限')
+    parser.add_argument('--limit', type=int, default=0, help='只回放前N条记录')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    paths = args.log or log_files()
+    records = read_query_log(paths)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print(f"没有可回放的记录: {paths}")
+        return
+    span = records[-1]['ts'] - records[0]['ts']
+    print(f"回放 {len(records)} 条记录（原始时长 {span:.1f}s，速率 ×{args.speed or '∞'}）")
+
+    stub = None
+    server = None
+    url = args.url
+    if args.local:
+        url, stub, server = start_local_server(args.stub_db, args.embedding_delay_ms / 1000.0,
+                                               args.llm_delay_ms / 1000.0, paths if args.warm_up else None)
+
+    with contextlib.ExitStack() as stack:
+        if args.local:
+            # 本地服务的处理日志会和回放报告混在一起，回放期间不输出
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        summary = Replayer(url, args.speed, args.max_in_flight).run(records)
+
+    if stub is not None:
+        summary['upstream'] = stub.get_stats()
+        server.should_exit = True
+        stub.stop()
+
+    print_summary(summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检索效果评估工具
+用标注好的「问题 → 相关章节」集合，对不同的分块方式、CHUNK_SIZE / CHUNK_OVERLAP、
+TOP_K_RESULTS 和 SIMILARITY_THRESHOLD 组合分别构建临时索引（DataProcessor + VectorStore），
+报告 recall@k、MRR、提示词token数和检索延迟，并给出满足召回目标的最省token配置
+
+问题文件为JSONL，每行形如:
+    {"query": "如何定义工具？", "relevant": [{"source": "mcp_rule_py.txt", "header": "Tools"}]}
+
+用法:
+    python retrieval_eval.py                                   # 本地哈希嵌入，不调用嵌入接口
+    python retrieval_eval.py --embedding cached                # 调用嵌入接口，向量缓存在本地供重复评估
+    python retrieval_eval.py --splitting header size --chunk-size 500 1000 --overlap 0 200 \\
+        --top-k 3 5 10 --threshold 0 0.25 --target-recall 0.8 --json eval.json
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from config import *
+from data_processor import DataProcessor, get_encoding
+from dedup import deduplicate_chunks
+from mmap_reader import MappedTextFile
+from models import Chunk
+from partitions import resolve_languages
+from rag_system import RAGSystem
+from stub_upstream import hash_embeddings
+from vector_store import CHROMA_MODE_PERSISTENT, VectorStore
+
+# 文本块与章节重叠的字符数达到两者中较短一方的该比例，视为文本块覆盖该章节
+MIN_SECTION_OVERLAP = 0.5
+
+
+class EmbeddingCache:
+    """嵌入向量的本地缓存（SQLite），键为模型名和文本的哈希，重复评估时只为新文本调用接口"""
+
+    def __init__(self, path: str, fetch: Callable[[List[str]], List[List[float]]]):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self.fetch = fetch
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(f"{EMBEDDING_MODEL}\0{text}".encode('utf-8')).hexdigest()
+
+    def __call__(self, texts: List[str]) -> List[Optional[List[float]]]:
+        keys = [self._key(text) for text in texts]
+        found = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self.conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                                     batch).fetchall()
+            found.update({key: np.frombuffer(vector, dtype=np.float32).tolist() for key, vector in rows})
+
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            fetched = self.fetch([texts[i] for i in missing])
+            rows = []
+            for i, embedding in zip(missing, fetched):
+                if embedding is None:
+                    # 被嵌入接口拒绝的文本不缓存，交给调用方跳过
+                    found[keys[i]] = None
+                elif embedding:
+                    found[keys[i]] = embedding
+                    rows.append((keys[i], np.asarray(embedding, dtype=np.float32).tobytes()))
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self.conn.commit()
+        return [found.get(key, []) for key in keys]
+
+
+def load_questions(path: str) -> List[Dict[str, Any]]:
+    """读取标注问题，relevant中的章节以 (来源文件, 标题小写) 表示"""
+    questions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            item = json.loads(line)
+            item['labels'] = {(label['source'], label['header'].strip().casefold()) for label in item['relevant']}
+            questions.append(item)
+    return questions
+
+
+def load_sections(txt_dir: str) -> Dict[str, Tuple[str, List[Tuple[str, int, int]]]]:
+    """每个文档按分块时的段落规则拼接后的文本，以及其中各章节的 (标题小写, 起始, 结束) 位置"""
+    documents = {}
+    for path in sorted(os.listdir(txt_dir)):
+        if not path.endswith('.txt'):
+            continue
+        with MappedTextFile(os.path.join(txt_dir, path)) as mapped:
+            paragraphs = list(mapped.iter_paragraphs())
+        parts = []
+        sections = []
+        offset = 0
+        header, start = "", 0
+        for para in paragraphs:
+            if para.startswith('#'):
+                sections.append((header, start, max(start, offset - 2)))
+                header, start = para.strip('#').strip().casefold(), offset
+            parts.append(para)
+            offset += len(para) + 2
+        sections.append((header, start, max(start, offset - 2)))
+        documents[path] = ("\n\n".join(parts), [section for section in sections if section[2] > section[1]])
+    return documents
+
+
+def chunk_coverage(chunks: List[Chunk], documents: Dict[str, Tuple[str, List[Tuple[str, int, int]]]]
+                   ) -> Tuple[List[Set[Tuple[str, str]]], int]:
+    """每个文本块覆盖的章节集合，以及无法在原文中定位的文本块数"""
+    cursors: Dict[str, int] = {}
+    coverage = []
+    unlocated = 0
+    for chunk in chunks:
+        text, sections = documents.get(chunk.source, ("", []))
+        content = chunk.content.strip()
+        # 按token切分时块首尾可能有不完整的字符，用中间一段定位
+        skip = min(10, len(content) // 10)
+        probe = content[skip:skip + 80]
+        position = text.find(probe, cursors.get(chunk.source, 0)) if probe else -1
+        if position < 0:
+            position = text.find(probe) if probe else -1
+        if position < 0:
+            unlocated += 1
+            coverage.append(set())
+            continue
+
+        start = position - skip
+        end = start + len(content)
+        cursors[chunk.source] = start + 1
+        covered = set()
+        for header, section_start, section_end in sections:
+            if section_start >= end:
+                break
+            overlap = min(end, section_end) - max(start, section_start)
+            if overlap > 0 and overlap >= MIN_SECTION_OVERLAP * min(end - start, section_end - section_start):
+                covered.add((chunk.source, header))
+        coverage.append(covered)
+    return coverage, unlocated
+
+
+def evaluate(store: VectorStore, questions: List[Dict[str, Any]], query_embeddings: List[List[float]],
+             coverage: Dict[str, Set[Tuple[str, str]]], top_k: int, threshold: float) -> Dict[str, Any]:
+    """在一个索引上执行全部问题，计算召回率、MRR、提示词token数和检索延迟"""
+    encoding = get_encoding()
+    recalls, reciprocal_ranks, prompt_tokens, latencies = [], [], [], []
+    for question, embedding in zip(questions, query_embeddings):
+        languages, _ = resolve_languages(question['query'])
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            hits = store.search_by_embedding(embedding, top_k, threshold, languages=languages)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        found = set()
+        reciprocal_rank = 0.0
+        for rank, hit in enumerate(hits, 1):
+            matched = coverage.get(hit.id, set()) & question['labels']
+            if matched and not reciprocal_rank:
+                reciprocal_rank = 1.0 / rank
+            found |= matched
+        recalls.append(len(found) / len(question['labels']))
+        reciprocal_ranks.append(reciprocal_rank)
+
+        prompt = RAGSystem.build_prompt(question['query'], RAGSystem.build_context(hits))
+        prompt_tokens.append(len(encoding.encode(prompt)))
+
+    return {
+        'recall@k': round(float(np.mean(recalls)), 4),
+        'mrr': round(float(np.mean(reciprocal_ranks)), 4),
+        'prompt_tokens': round(float(np.mean(prompt_tokens)), 1),
+        'latency_ms': round(float(np.mean(latencies)), 2),
+        'latency_p95_ms': round(float(np.percentile(latencies, 95)), 2)
+    }
+
+
+def build_variants(splittings: List[str], chunk_sizes: List[int], overlaps: List[int]
+                   ) -> List[Tuple[str, Optional[int], Optional[int]]]:
+    """需要分别建索引的分块配置（按标题分块与大小参数无关）"""
+    variants = []
+    for splitting in splittings:
+        if splitting == 'header':
+            variants.append(('header', None, None))
+            continue
+        for chunk_size in chunk_sizes:
+            for overlap in overlaps:
+                if overlap < chunk_size:
+                    variants.append(('size', chunk_size, overlap))
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检索效果评估：recall@k / MRR / 提示词token / 检索延迟')
+    parser.add_argument('--questions', default='eval_questions.jsonl', help='标注问题文件（JSONL）')
+    parser.add_argument('--txt-dir', default='txt', help='文档目录')
+    parser.add_argument('--embedding', choices=('stub', 'cached'), default='stub',
+                        help='stub: 本地哈希嵌入；cached: 调用嵌入接口并缓存到本地')
+    parser.add_argument('--splitting', nargs='+', choices=('header', 'size'), default=['header', 'size'],
+                        help='分块方式')
+    parser.add_argument('--chunk-size', type=int, nargs='+', default=[CHUNK_SIZE], help='按大小分块的token数')
+    parser.add_argument('--overlap', type=int, nargs='+', default=[CHUNK_OVERLAP], help='按大小分块的重叠token数')
+    parser.add_argument('--top-k', type=int, nargs='+', default=[TOP_K_RESULTS], help='检索返回的文档数')
+    parser.add_argument('--threshold', type=float, nargs='+', default=[SIMILARITY_THRESHOLD], help='相似度阈值')
+    parser.add_argument('--target-recall', type=float, default=0.8, help='推荐配置需要达到的recall@k')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    documents = load_sections(args.txt_dir)
+    print(f"问题: {len(questions)} 个, 文档: {len(documents)} 个, 嵌入: {args.embedding}")
+
+    work_dir = tempfile.mkdtemp(prefix="retrieval_eval_")
+    results = []
+    failed = []
+    try:
+        if args.embedding == 'cached':
+            with contextlib.redirect_stdout(io.StringIO()):
+                fetcher = VectorStore(os.path.join(work_dir, "fetch"), mode=CHROMA_MODE_PERSISTENT)
+            embed_fn = EmbeddingCache(EVAL_EMBEDDING_CACHE_PATH, fetcher.get_embeddings)
+        else:
+            embed_fn = hash_embeddings
+        query_embeddings = embed_fn([question['query'] for question in questions])
+
+        for index, (splitting, chunk_size, overlap) in enumerate(build_variants(args.splitting, args.chunk_size,
+                                                                                  args.overlap)):
+            started = time.perf_counter()
+            build_log = io.StringIO()
+            with contextlib.redirect_stdout(build_log):
+                processor = DataProcessor(args.txt_dir, chunk_size or CHUNK_SIZE, overlap or 0)
+                chunks = processor.process_documents(use_header_splitting=(splitting == 'header'))
+                if DEDUP_ENABLED:
+                    chunks = deduplicate_chunks(chunks)
+                store = VectorStore(os.path.join(work_dir, f"variant_{index}"), mode=CHROMA_MODE_PERSISTENT)
+                built = store.add_documents(chunks, embed_fn=embed_fn)
+            build_seconds = time.perf_counter() - started
+            if not built:
+                # 索引不完整时的召回率没有意义，该配置不参与评估和推荐
+                print(f"❌ 配置 分块={splitting}, CHUNK_SIZE={chunk_size}, CHUNK_OVERLAP={overlap} 的索引构建失败:")
+                print("\n".join(build_log.getvalue().strip().splitlines()[-5:]))
+                failed.append({'splitting': splitting, 'chunk_size': chunk_size, 'overlap': overlap})
+                continue
+
+            covered, unlocated = chunk_coverage(chunks, documents)
+            coverage = {f"doc_{i}_{chunk.source}": sections for i, (chunk, sections) in enumerate(zip(chunks, covered))}
+            for top_k in args.top_k:
+                for threshold in args.threshold:
+                    row = {
+                        'splitting': splitting,
+                        'chunk_size': chunk_size,
+                        'overlap': overlap,
+                        'chunks': len(chunks),
+                        'unlocated_chunks': unlocated,
+                        'build_seconds': round(build_seconds, 2),
+                        'top_k': top_k,
+                        'threshold': threshold
+                    }
+                    row.update(evaluate(store, questions, query_embeddings, coverage, top_k, threshold))
+                    results.append(row)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    header = (f"{'splitting':<9} {'size':>5} {'overlap':>7} {'chunks':>6} {'top_k':>5} {'thresh':>6} "
+              f"{'recall@k':>8} {'mrr':>6} {'tokens':>8} {'ms':>7} {'p95 ms':>7}")
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(f"{row['splitting']:<9} {row['chunk_size'] or '-':>5} {row['overlap'] if row['overlap'] is not None else '-':>7} "
+              f"{row['chunks']:>6} {row['top_k']:>5} {row['threshold']:>6.2f} {row['recall@k']:>8.4f} "
+              f"{row['mrr']:>6.4f} {row['prompt_tokens']:>8.1f} {row['latency_ms']:>7.2f} {row['latency_p95_ms']:>7.2f}")
+
+    # 满足召回目标的配置中，提示词token最少的（其次检索最快）
+    qualified = [row for row in results if row['recall@k'] >= args.target_recall]
+    if qualified:
+        best = min(qualified, key=lambda row: (row['prompt_tokens'], row['latency_ms']))
+        print(f"✅ 满足 recall@k ≥ {args.target_recall} 的最省配置: 分块={best['splitting']}, "
+              f"CHUNK_SIZE={best['chunk_size']}, CHUNK_OVERLAP={best['overlap']}, "
+              f"TOP_K_RESULTS={best['top_k']}, SIMILARITY_THRESHOLD={best['threshold']}")
+    else:
+        print(f"⚠️ 没有配置达到 recall@k ≥ {args.target_recall}")
+    if failed:
+        print(f"⚠️ {len(failed)} 个分块配置的索引构建失败，未参与评估")
+
+    if isinstance(embed_fn, EmbeddingCache):
+        print(f"嵌入缓存: 命中 {embed_fn.hits}, 调用接口 {embed_fn.misses}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'questions': len(questions), 'embedding': args.embedding, 'results': results,
+                       'failed': failed},
+                      f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import re
+import threading
+import unicodedata
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def normalize_text(text: str, casefold: bool = False) -> str:
+    """规范化文本用作合并键：统一全半角、折叠空白，可选忽略大小写"""
+    normalized = unicodedata.normalize('NFKC', text)
+    normalized = re.sub(r'\s+', ' ', normalized).strip()
+    if casefold:
+        normalized = normalized.casefold()
+    return normalized
+
+
+class _Call:
+    """一次正在执行中的调用"""
+    __slots__ = ('event', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """合并相同键的并发调用：第一个调用者执行，其余调用者等待并共享其结果"""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args,
+           wait_timeout: Optional[float] = None, **kwargs) -> Tuple[Any, bool]:
+        """执行fn并返回 (结果, 是否为共享结果)；leader抛出的异常会同样传递给等待者
+
+        wait_timeout只限制等待者的等待时间，超时抛出TimeoutError。
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.shared += 1
+                is_leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                is_leader = True
+
+        if not is_leader:
+            if not call.event.wait(wait_timeout):
+                raise TimeoutError(f"[{self.name}] 等待相同请求的结果超时")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # 先移除再唤醒，之后到达的请求会重新执行而不是拿到旧结果
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+        if call.followers:
+            print(f"[{self.name}] 合并了 {call.followers} 个相同的并发请求")
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """当前正在执行的不同请求数"""
+        with self._lock:
+            return len(self._calls)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计信息"""
+        return {
+            'name': self.name,
+            'leaders': self.leaders,
+            'shared': self.shared,
+            'in_flight': self.in_flight()
+        }
@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+import numpy as np
+
+from lexical_index import tokenize
+
+# 本地哈希嵌入的维度
+STUB_EMBEDDING_DIM = 256
+
+
+def hash_embeddings(texts: List[str], dim: int = STUB_EMBEDDING_DIM) -> List[List[float]]:
+    """本地哈希词袋嵌入：不调用接口、结果确定，相同的词落在相同的维度上"""
+    embeddings = []
+    for text in texts:
+        vector = np.zeros(dim, dtype=np.float32)
+        for token in tokenize(text):
+            h = zlib.crc32(token.encode('utf-8'))
+            vector[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = float(np.linalg.norm(vector))
+        embeddings.append((vector / norm if norm > 0 else vector).tolist())
+    return embeddings
+
+
+class StubUpstream:
+    """本地模拟的嵌入和LLM接口（OpenAI兼容格式），用于回放压测，不产生API调用费用
+
+    嵌入接口返回哈希词袋向量，LLM接口返回固定格式的回答；embedding_delay和llm_delay
+    模拟上游耗时（秒），使压测结果接近真实的阶段耗时分布。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 embedding_delay: float = 0.0, llm_delay: float = 0.0):
+        self.embedding_delay = embedding_delay
+        self.llm_delay = llm_delay
+        self.embedding_calls = 0
+        self.embedding_inputs = 0
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def embedding_url(self) -> str:
+        return f"{self.base_url}/embeddings"
+
+    @property
+    def llm_url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    def start(self) -> "StubUpstream":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-upstream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取模拟上游的调用统计"""
+        return {
+            'embedding_calls': self.embedding_calls,
+            'embedding_inputs': self.embedding_inputs,
+            'llm_calls': self.llm_calls
+        }
+
+    def _embeddings(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        texts = data.get('input', [])
+        if isinstance(texts, str):
+            texts = [texts]
+        with self._lock:
+            self.embedding_calls += 1
+            self.embedding_inputs += len(texts)
+        time.sleep(self.embedding_delay)
+        embeddings = hash_embeddings(texts)
+        return {'data': [{'index': i, 'embedding': embedding} for i, embedding in enumerate(embeddings)]}
+
+    def _chat(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self.llm_calls += 1
+        time.sleep(self.llm_delay)
+        prompt = data['messages'][-1]['content']
+        question = prompt.split("用户问题: ", 1)[-1].split("\n", 1)[0] if "用户问题: " in prompt else ""
+        return {'choices': [{'message': {'content': f"（模拟回答）{question}"}}]}
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                data = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+                if self.path.endswith("/embeddings"):
+                    body = upstream._embeddings(data)
+                elif self.path.endswith("/chat/completions"):
+                    body = upstream._chat(data)
+                else:
+                    self.send_error(404)
+                    return
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
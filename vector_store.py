@@ -1,108 +1,445 @@
 import chromadb
 from chromadb.config import Settings
+import numpy as np
 import requests
-from typing import List, Dict, Any
+import itertools
+import os
+import threading
+import time
+from typing import Callable, Iterable, List, Dict, Any, Optional
 from config import *
+from single_flight import SingleFlight, normalize_text
+from embedding_batcher import EmbeddingBatcher
+from admission import ConcurrencyGate, AdmissionRejected, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from lexical_index import LexicalIndex
+from hedging import Hedger
+from full_vector_store import FullVectorStore
+from chunk_store import ChunkStore
+from models import Chunk, Hit
+from serving_cache import LRUCache
+from binary_index import BinaryIndex, cosine_rescore
+from build_journal import BuildJournal
+from partitions import (source_language, known_languages, build_where, matches, metadata_sources, metadata_languages,
+                        membership_metadata, has_membership_metadata, any_of, SOURCE_KEY_PREFIX)
+
+# 检索引擎
+ENGINE_CHROMA = "chroma"
+ENGINE_BINARY = "binary"
+SEARCH_ENGINES = (ENGINE_CHROMA, ENGINE_BINARY)
+
+# ChromaDB客户端模式
+CHROMA_MODE_PERSISTENT = "persistent"
+CHROMA_MODE_HTTP = "http"
+CHROMA_MODES = (CHROMA_MODE_PERSISTENT, CHROMA_MODE_HTTP)
+
+# 与输入内容无关的4xx状态码（鉴权、模型地址、超时、限流），按暂时性错误处理
+NON_INPUT_CLIENT_ERRORS = (401, 403, 404, 408, 429)
+
+
+def configured_coarse_dim() -> int:
+    """配置的粗检索维度，未启用降维时为0"""
+    return MATRYOSHKA_DIM if MATRYOSHKA_ENABLED else 0
+
+
+def collection_metadata(space: str = HNSW_SPACE, construction_ef: int = HNSW_CONSTRUCTION_EF,
+                        search_ef: int = HNSW_SEARCH_EF, m: int = HNSW_M,
+                        coarse_dim: Optional[int] = None, external_text: Optional[bool] = None) -> Dict[str, Any]:
+    """创建集合时使用的元数据，包含距离空间、HNSW参数、粗检索维度和文本是否存放在文本块存储中"""
+    if coarse_dim is None:
+        coarse_dim = configured_coarse_dim()
+    if external_text is None:
+        external_text = CHUNK_STORE_ENABLED
+    metadata = {
+        "description": "MCP知识库向量存储",
+        "hnsw:space": space,
+        "hnsw:construction_ef": construction_ef,
+        "hnsw:search_ef": search_ef,
+        "hnsw:M": m
+    }
+    if coarse_dim:
+        metadata["matryoshka_dim"] = coarse_dim
+    if external_text:
+        metadata["chunk_store"] = True
+    return metadata
+
+
+def create_chroma_client(db_path: str = CHROMA_DB_PATH, mode: str = CHROMA_MODE):
+    """创建ChromaDB客户端
+
+    persistent模式在进程内打开db_path下的索引；http模式连接CHROMA_HOST:CHROMA_PORT上独立运行的Chroma服务，
+    多个进程共享服务端的同一份索引，请求通过连接池复用的HTTP连接发送。
+    """
+    if mode == CHROMA_MODE_HTTP:
+        return chromadb.HttpClient(
+            host=CHROMA_HOST,
+            port=CHROMA_PORT,
+            settings=Settings(
+                anonymized_telemetry=False,
+                chroma_http_max_connections=CHROMA_HTTP_POOL_SIZE,
+                chroma_http_max_keepalive_connections=CHROMA_HTTP_POOL_SIZE,
+                chroma_http_keepalive_secs=CHROMA_HTTP_KEEPALIVE_SECONDS
+            )
+        )
+    if mode != CHROMA_MODE_PERSISTENT:
+        raise ValueError(f"不支持的ChromaDB模式: {mode}，可选值: {', '.join(CHROMA_MODES)}")
+    return chromadb.PersistentClient(
+        path=db_path,
+        settings=Settings(
+            anonymized_telemetry=False,
+            allow_reset=True
+        )
+    )
+
+
+def is_rejected_input(error: Exception) -> bool:
+    """嵌入接口是否因输入内容本身（如超长文本）拒绝了请求，这类请求重试也不会成功"""
+    if not isinstance(error, requests.HTTPError) or error.response is None:
+        return False
+    status = error.response.status_code
+    return 400 <= status < 500 and status not in NON_INPUT_CLIENT_ERRORS
+
+
+def truncate_embedding(embedding: List[float], dim: int) -> List[float]:
+    """取嵌入向量的前dim维并重新归一化（Matryoshka表示的前缀本身就是有效的低维嵌入）"""
+    prefix = np.asarray(embedding[:dim], dtype=np.float32)
+    norm = float(np.linalg.norm(prefix))
+    return (prefix / norm if norm > 0 else prefix).tolist()
+
+
+def distance_to_similarity(distance: float, space: str) -> float:
+    """把ChromaDB返回的距离换算为余弦相似度"""
+    if space == "l2":
+        # ChromaDB的l2为平方欧氏距离，对归一化向量有 d = 2 - 2cos
+        return 1 - distance / 2
+    # cosine距离为 1 - cos，ip距离为 1 - 内积（归一化向量即余弦）
+    return 1 - distance
+
+
+def similarity_to_distance(similarity: float, space: str) -> float:
+    """把余弦相似度换算为给定距离空间下的距离"""
+    if space == "l2":
+        return 2 - 2 * similarity
+    return 1 - similarity
 
 class VectorStore:
-    def __init__(self):
+    def __init__(self, db_path: str = CHROMA_DB_PATH, mode: str = CHROMA_MODE, read_only: bool = CHROMA_READ_ONLY):
+        """db_path为其他目录时（例如评估工具构建的临时索引），旁路向量和文本块存储也放在该目录下
+
+        mode为http时向量索引在Chroma服务中，db_path只存放旁路向量、文本块存储和知识库版本号；
+        read_only为True时作为只读副本，拒绝写入和迁移，并按写入节点更新的版本号刷新。
+        """
+        self.db_path = db_path
+        self.mode = mode
+        self.read_only = read_only
         # 初始化阿里云百炼API配置
         self.api_key = API_KEY
-        self.embedding_url = "https://dashscope.aliyuncs.com/compatible-mode/v1/embeddings"
+        self.embedding_url = EMBEDDING_API_URL
         
         # 初始化ChromaDB客户端
-        self.client = chromadb.PersistentClient(
-            path=CHROMA_DB_PATH,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
-        )
+        self.client = create_chroma_client(db_path, mode)
         
         # 获取或创建集合
         self.collection = self.client.get_or_create_collection(
             name=COLLECTION_NAME,
-            metadata={"description": "MCP知识库向量存储"}
+            metadata=collection_metadata()
+        )
+        
+        # 已有集合保持创建时的距离空间，相似度按实际空间换算
+        self.space = self._collection_space()
+        if self.space != HNSW_SPACE:
+            print(f"⚠️ 现有集合使用 {self.space} 距离，与配置的 {HNSW_SPACE} 不一致，"
+                  f"可运行 python main.py --migrate-index 迁移")
+        
+        # 降维粗检索时，全维度向量保存在旁路存储中用于重排
+        self.full_vectors = FullVectorStore(
+            FULL_VECTOR_PATH if db_path == CHROMA_DB_PATH else os.path.join(db_path, "full_vectors")
+        )
+        self.coarse_dim = self._collection_coarse_dim()
+        if self.coarse_dim != configured_coarse_dim():
+            print(f"⚠️ 现有集合的粗检索维度为 {self.coarse_dim or '全维度'}，与配置不一致，"
+                  f"可运行 python main.py --migrate-index 迁移")
+        
+        # 文本块内容存放在ChromaDB之外，检索时只取回通过阈值的文本
+        self.chunk_store = ChunkStore(
+            CHUNK_STORE_PATH if db_path == CHROMA_DB_PATH else os.path.join(db_path, "chunks.sqlite3"),
+            CHUNK_STORE_COMPRESSION_LEVEL
+        )
+        self.external_text = self._collection_external_text()
+        if self.external_text != CHUNK_STORE_ENABLED:
+            print(f"⚠️ 现有集合的文本{'存放在文本块存储中' if self.external_text else '存放在ChromaDB中'}，"
+                  f"与配置不一致，可运行 python main.py --migrate-index 迁移")
+        
+        # 按语言分区的独立索引，过滤检索时只搜索对应分区
+        self.partition_collections = self._open_partitions()
+        if self.collection.count() and (not self._has_filter_metadata()
+                                        or (PARTITION_INDEXES_ENABLED and not self.partition_collections)):
+            print("⚠️ 现有集合缺少来源/语言过滤元数据或分区索引，可运行 python main.py --migrate-index 补充")
+        
+        # 写入节点每次更新后写入版本号，只读副本发现版本变化后重新打开集合和旁路存储
+        self.version_path = INDEX_VERSION_PATH if db_path == CHROMA_DB_PATH else os.path.join(db_path, "index_version")
+        self.index_version = self._read_version()
+        self._version_checked = time.monotonic()
+        self.refreshes = 0
+        self._refresh_lock = threading.Lock()
+        
+        # 复用HTTP连接，连接池大小与并发数匹配
+        self.session = requests.Session()
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE))
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE))
+        
+        # 相同文本的并发嵌入请求合并为一次调用
+        self.embedding_flight = SingleFlight("embedding")
+        
+        # 查询向量缓存（只取决于文本和嵌入模型，知识库变化后仍然有效）
+        self.embedding_cache = LRUCache("embedding", EMBEDDING_CACHE_SIZE)
+        
+        # 限制同时进行的嵌入调用数量
+        self.embedding_gate = ConcurrencyGate(
+            "嵌入",
+            max_concurrent=EMBEDDING_MAX_CONCURRENCY,
+            max_queue=ADMISSION_MAX_QUEUE,
+            queue_timeout=ADMISSION_QUEUE_TIMEOUT
+        )
+        
+        # 时间窗口内的不同查询合并为一次多输入调用
+        self.embedding_batcher = EmbeddingBatcher(
+            self._request_embeddings,
+            window_ms=EMBEDDING_BATCH_WINDOW_MS,
+            max_batch_size=EMBEDDING_BATCH_MAX_SIZE
+        )
+        
+        # 嵌入接口持续出错或变慢时熔断，避免请求堆积
+        self.embedding_breaker = CircuitBreaker(
+            "嵌入",
+            window_size=CIRCUIT_WINDOW_SIZE,
+            min_calls=CIRCUIT_MIN_CALLS,
+            failure_rate=CIRCUIT_FAILURE_RATE,
+            slow_call_seconds=EMBEDDING_SLOW_CALL_SECONDS,
+            slow_call_rate=CIRCUIT_SLOW_CALL_RATE,
+            open_seconds=CIRCUIT_OPEN_SECONDS
         )
         
-        print(f"向量存储初始化完成: {CHROMA_DB_PATH}")
+        # 偶发的慢调用通过对冲请求削减尾延迟
+        self.embedding_hedger = Hedger(
+            "嵌入",
+            percentile=HEDGE_PERCENTILE,
+            min_samples=HEDGE_MIN_SAMPLES,
+            min_delay=HEDGE_MIN_DELAY_MS / 1000.0,
+            max_extra_ratio=HEDGE_MAX_EXTRA_RATIO,
+            burst=HEDGE_BURST,
+            gate=self.embedding_gate
+        )
+        
+        # 嵌入服务不可用时改用词法检索
+        self.lexical_index = LexicalIndex(self._load_all_documents)
+        
+        # 二值量化检索引擎，首次使用时构建
+        self.binary_index = BinaryIndex(self._iter_full_vectors)
+        
+        print(f"向量存储初始化完成: {db_path}（{mode}{'，只读副本' if read_only else ''}）")
     
-    def get_embedding(self, text: str) -> List[float]:
-        """使用阿里云百炼Qwen3 Embedding模型生成文本嵌入向量"""
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": EMBEDDING_MODEL,
-                "input": text
-            }
-            
-            response = requests.post(self.embedding_url, headers=headers, json=data)
-            response.raise_for_status()
-            
-            result = response.json()
-            if 'data' in result and len(result['data']) > 0:
-                return result['data'][0]['embedding']
-            else:
-                print(f"API响应格式错误: {result}")
+    def get_embedding(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        """使用阿里云百炼Qwen3 Embedding模型生成文本嵌入向量，timeout为本次调用的时间预算"""
+        key = normalize_text(text)
+        embedding = self.embedding_cache.get(key)
+        if embedding is not None:
+            return embedding
+        
+        if not SINGLE_FLIGHT_ENABLED:
+            embedding = self._request_embedding(text, timeout)
+        else:
+            try:
+                embedding, _ = self.embedding_flight.do(key, self._request_embedding, text, timeout,
+                                                        wait_timeout=timeout)
+            except TimeoutError as e:
+                print(f"生成嵌入向量时出错: {e}")
                 return []
+        
+        if embedding:
+            self.embedding_cache.put(key, embedding)
+        return embedding
+    
+    def _request_embedding(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        """生成单条文本的嵌入向量（启用批处理时与其他并发请求合并发送）"""
+        try:
+            if EMBEDDING_BATCH_ENABLED:
+                return self.embedding_batcher.embed(text, timeout)
+            return self._request_embeddings([text], timeout)[0]
                 
+        except AdmissionRejected:
+            raise
         except Exception as e:
             print(f"生成嵌入向量时出错: {e}")
             return []
     
-    def add_documents(self, documents: List[Dict[str, Any]]) -> bool:
-        """将文档添加到向量存储"""
+    def get_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """批量生成嵌入向量，按接口单次输入上限分批请求
+
+        接口拒绝某一批的输入（4xx）时逐条重试，被拒绝的文本对应None，由调用方跳过；
+        超时、5xx、限流、熔断等暂时性错误时不再请求后续批次，失败批次及之后的文本对应空向量。
+        """
+        embeddings = []
+        
+        for start in range(0, len(texts), EMBEDDING_BATCH_MAX_SIZE):
+            batch = texts[start:start + EMBEDDING_BATCH_MAX_SIZE]
+            try:
+                try:
+                    embeddings.extend(self._request_embeddings(batch, priority=PRIORITY_BACKGROUND))
+                except Exception as e:
+                    if not is_rejected_input(e):
+                        raise
+                    embeddings.extend(self._embed_individually(batch, e))
+            except Exception as e:
+                print(f"批量生成嵌入向量时出错: {e}")
+                embeddings.extend([] for _ in texts[start:])
+                break
+        
+        return embeddings
+    
+    def _embed_individually(self, texts: List[str], error: Exception) -> List[Optional[List[float]]]:
+        """整批请求被拒绝后逐条请求，找出被拒绝的文本（对应None）
+
+        整批文本都被拒绝时说明问题不在输入内容（如模型名配置错误），抛出原来的异常。
+        """
+        embeddings = []
+        for text in texts:
+            try:
+                embeddings.append(self._request_embeddings([text], priority=PRIORITY_BACKGROUND)[0])
+            except Exception as e:
+                if not is_rejected_input(e):
+                    raise
+                print(f"嵌入接口拒绝了一个文本块（{len(text)} 个字符），跳过: {e}")
+                embeddings.append(None)
+        if len(texts) > 1 and not any(embedding is not None for embedding in embeddings):
+            raise error
+        return embeddings
+    
+    def _request_embeddings(self, texts: List[str], timeout: Optional[float] = None,
+                            priority: int = PRIORITY_INTERACTIVE) -> List[List[float]]:
+        """向嵌入接口发起一次多输入请求，出错时抛出异常"""
+        if timeout is None:
+            timeout = EMBEDDING_HTTP_TIMEOUT
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        data = {
+            "model": EMBEDDING_MODEL,
+            "input": texts
+        }
+        
+        # 熔断期间直接失败，不占用排队名额
+        self.embedding_breaker.ensure_closed()
+        
+        started = time.monotonic()
+        with self.embedding_gate.slot(priority=priority, timeout=min(ADMISSION_QUEUE_TIMEOUT, timeout)):
+            # 排队时间同样计入预算
+            remaining = max(0.05, timeout - (time.monotonic() - started))
+            if HEDGE_EMBEDDING_ENABLED:
+                result = self.embedding_hedger.call(self.embedding_breaker.call, self._post_embeddings,
+                                                    headers, data, remaining)
+            else:
+                result = self.embedding_breaker.call(self._post_embeddings, headers, data, remaining)
+        
+        if 'data' not in result or len(result['data']) != len(texts):
+            raise ValueError(f"API响应格式错误: {result}")
+        
+        # 按index还原输入顺序
+        items = sorted(result['data'], key=lambda item: item.get('index', 0))
+        return [item['embedding'] for item in items]
+    
+    def _post_embeddings(self, headers: Dict[str, str], data: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """发送嵌入请求并解析响应"""
+        response = self.session.post(self.embedding_url, headers=headers, json=data, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    
+    def add_documents(self, documents: Iterable[Chunk], journal: Optional[BuildJournal] = None,
+                      id_prefix: str = "",
+                      embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                      total: Optional[int] = None) -> bool:
+        """将文档添加到向量存储
+        
+        按WRITE_BATCH_SIZE分批生成嵌入并立即写入；documents可以是逐个产出文本块的迭代器（需同时给出total），
+        此时每次只取一批文本块，内存占用不随文档数量增长；
+        提供journal时跳过日志中已提交的文本块，并在每批写入后记录检查点。
+        某一批的嵌入因暂时性错误生成失败时中止并返回False，之前已写入的批次保留在检查点中，下次构建从该批继续；
+        被嵌入接口拒绝的文本块（嵌入为None，如超长输入）记录日志后跳过，不影响其余文本块。
+        id_prefix用于增量更新时区分新旧版本的文本块ID；embed_fn替换默认的嵌入接口（评估工具使用本地嵌入）。
+        """
+        if not self._writable("添加文档"):
+            return False
+        embed_fn = embed_fn or self.get_embeddings
+        if total is None:
+            documents = list(documents)
+            total = len(documents)
+        pending = iter(documents)
+        added = 0
+        skipped = 0
         try:
-            print(f"开始添加 {len(documents)} 个文档到向量存储...")
+            print(f"开始添加 {total} 个文档到向量存储...")
             
-            # 准备数据
-            ids = []
-            texts = []
-            embeddings = []
-            metadatas = []
+            committed = journal.committed() if journal else set()
+            if committed:
+                print(f"从检查点继续: 已提交 {len(committed)} 个文档")
             
-            for i, doc in enumerate(documents):
-                # 生成唯一ID
-                doc_id = f"doc_{i}_{doc['source']}"
-                
-                # 生成嵌入向量
-                embedding = self.get_embedding(doc['content'])
-                if not embedding:
-                    print(f"跳过文档 {doc_id}，无法生成嵌入向量")
+            for start in itertools.count(0, WRITE_BATCH_SIZE):
+                # 生成唯一ID，跳过已提交的文档
+                batch = [(f"{id_prefix}doc_{i}_{doc.source}", doc)
+                         for i, doc in enumerate(itertools.islice(pending, WRITE_BATCH_SIZE), start)]
+                if not batch:
+                    break
+                batch = [(doc_id, doc) for doc_id, doc in batch if doc_id not in committed]
+                if not batch:
                     continue
                 
-                # 准备元数据
-                metadata = {
-                    'source': doc['source'],
-                    'size': doc['size'],
-                    'type': doc.get('type', 'unknown')
-                }
+                # 批量生成嵌入向量，每次请求携带多个文本块
+                batch_embeddings = embed_fn([doc.content for _, doc in batch])
                 
-                if 'header' in doc:
-                    metadata['header'] = doc['header']
+                if len(batch_embeddings) != len(batch) or not all(
+                        embedding is None or embedding for embedding in batch_embeddings):
+                    print(f"第 {start + 1}-{start + len(batch)} 个文档的嵌入向量生成失败，中止添加"
+                          f"（已写入 {added} 个文档）")
+                    if added:
+                        self._invalidate_indexes()
+                    return False
                 
-                ids.append(doc_id)
-                texts.append(doc['content'])
-                embeddings.append(embedding)
-                metadatas.append(metadata)
+                # 跳过被嵌入接口拒绝的文本块
+                rejected = [doc_id for (doc_id, _), embedding in zip(batch, batch_embeddings) if embedding is None]
+                if rejected:
+                    print(f"跳过 {len(rejected)} 个被嵌入接口拒绝的文本块: {', '.join(rejected)}")
+                    skipped += len(rejected)
+                    kept = [(item, embedding) for item, embedding in zip(batch, batch_embeddings)
+                            if embedding is not None]
+                    if not kept:
+                        continue
+                    batch = [item for item, _ in kept]
+                    batch_embeddings = [embedding for _, embedding in kept]
                 
-                if (i + 1) % 10 == 0:
-                    print(f"已处理 {i + 1}/{len(documents)} 个文档")
-            
-            # 批量添加到ChromaDB
-            if ids:
-                self.collection.add(
-                    ids=ids,
-                    documents=texts,
-                    embeddings=embeddings,
-                    metadatas=metadatas
-                )
+                # 准备数据
+                ids = [doc_id for doc_id, _ in batch]
+                texts = [doc.content for _, doc in batch]
+                metadatas = [self._chunk_metadata(doc) for _, doc in batch]
                 
-                print(f"成功添加 {len(ids)} 个文档到向量存储")
+                self._write_batch(ids, texts, batch_embeddings, metadatas)
+                if journal:
+                    journal.record(ids)
+                added += len(ids)
+                
+                print(f"已处理 {min(start + WRITE_BATCH_SIZE, total)}/{total} 个文档")
+            
+            if added:
+                if self.coarse_dim:
+                    # 每批追加了一个全维度向量段，添加完成后合并为一个段
+                    self.full_vectors.compact()
+                self._invalidate_indexes()
+                print(f"成功添加 {added} 个文档到向量存储" + (f"，跳过 {skipped} 个被拒绝的文本块" if skipped else ""))
+                return True
+            elif committed:
+                print("全部文档已在之前的构建中提交")
                 return True
             else:
                 print("没有有效的文档可以添加")
@@ -110,47 +447,139 @@ class VectorStore:
                 
         except Exception as e:
             print(f"添加文档到向量存储时出错: {e}")
+            if added:
+                self._invalidate_indexes()
             return False
     
-    def search(self, query: str, top_k: int = TOP_K_RESULTS, threshold: float = SIMILARITY_THRESHOLD) -> List[Dict[str, Any]]:
-        """搜索相关文档"""
+    @staticmethod
+    def _chunk_metadata(doc: Chunk) -> Dict[str, Any]:
+        """文本块写入ChromaDB的元数据"""
+        metadata = {
+            'source': doc.source,
+            'size': doc.size,
+            'type': doc.type
+        }
+        
+        if doc.header is not None:
+            metadata['header'] = doc.header
+        
+        metadata['language'] = source_language(doc.source)
+        
+        # 去重合并的文本块记录全部来源（ChromaDB元数据只支持标量，用逗号分隔）
+        if len(doc.all_sources()) > 1:
+            metadata['sources'] = ','.join(doc.sources)
+            metadata['languages'] = ','.join(dict.fromkeys(source_language(s) for s in doc.sources))
+            metadata['duplicate_count'] = doc.duplicate_count
+        
+        # 过滤用的布尔键，合并的文本块按任一来源或语言过滤都能检索到
+        metadata.update(membership_metadata(metadata_sources(metadata), metadata_languages(metadata)))
+        return metadata
+    
+    def _write_batch(self, ids: List[str], texts: List[str], embeddings: List[List[float]],
+                     metadatas: List[Dict[str, Any]]) -> None:
+        """写入一批向量（upsert，中断后重放同一批次不会重复）"""
+        if self.coarse_dim:
+            # 全维度向量写入旁路存储，ChromaDB中只保存低维向量
+            self.full_vectors.add(ids, embeddings)
+            embeddings = [truncate_embedding(embedding, self.coarse_dim) for embedding in embeddings]
+        
+        if self.external_text:
+            # 文本写入文本块存储，ChromaDB中只保存向量和元数据
+            self.chunk_store.put(ids, texts)
+            texts = None
+        
+        self.collection.upsert(
+            ids=ids,
+            documents=texts,
+            embeddings=embeddings,
+            metadatas=metadatas
+        )
+        self._add_to_partitions(ids, texts, embeddings, metadatas)
+    
+    def source_chunk_ids(self, sources: List[str]) -> List[str]:
+        """属于指定来源文件的全部文本块ID"""
+        if not sources:
+            return []
+        return self.collection.get(where=any_of(SOURCE_KEY_PREFIX, sources), include=[])['ids']
+    
+    def linked_sources(self, sources: List[str]) -> List[str]:
+        """与指定文件共享去重文本块的其他文件（这些文件需要一起重新处理）"""
+        merged = self.collection.get(where={"duplicate_count": {"$gte": 2}}, include=['metadatas'])
+        linked = set()
+        for metadata in merged['metadatas']:
+            members = metadata_sources(metadata)
+            if set(members) & set(sources):
+                linked.update(members)
+        return sorted(linked - set(sources))
+    
+    def delete_ids(self, ids: List[str]) -> None:
+        """从主集合、分区索引和全维度向量存储中删除文本块"""
+        if not ids or not self._writable("删除文本块"):
+            return
+        for start in range(0, len(ids), MIGRATION_BATCH_SIZE):
+            batch = ids[start:start + MIGRATION_BATCH_SIZE]
+            self.collection.delete(ids=batch)
+            for collection in self.partition_collections.values():
+                collection.delete(ids=batch)
+        if self.coarse_dim:
+            self.full_vectors.delete(ids)
+        if self.external_text:
+            self.chunk_store.delete(ids)
+        self._invalidate_indexes()
+    
+    def search(self, query: str, top_k: int = TOP_K_RESULTS, threshold: float = SIMILARITY_THRESHOLD,
+               engine: str = SEARCH_ENGINE, source: str = "",
+               languages: Optional[List[str]] = None) -> List[Hit]:
+        """搜索相关文档，engine选择检索引擎（chroma / binary），source和languages限定来源文件和语言分区"""
+        # 生成查询的嵌入向量
+        query_embedding = self.get_embedding(query)
+        if not query_embedding:
+            print("无法生成查询的嵌入向量")
+            return []
+        
+        return self.search_by_embedding(query_embedding, top_k, threshold, engine, source, languages)
+    
+    def search_by_embedding(self, query_embedding: List[float], top_k: int = TOP_K_RESULTS,
+                            threshold: float = SIMILARITY_THRESHOLD,
+                            engine: str = SEARCH_ENGINE, source: str = "",
+                            languages: Optional[List[str]] = None) -> List[Hit]:
+        """使用已生成的查询向量搜索相关文档"""
         try:
-            # 生成查询的嵌入向量
-            query_embedding = self.get_embedding(query)
-            if not query_embedding:
-                print("无法生成查询的嵌入向量")
-                return []
-            
-            # 在ChromaDB中搜索
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                include=['documents', 'metadatas', 'distances']
-            )
+            if engine == ENGINE_BINARY:
+                results = self._binary_query(query_embedding, top_k, source, languages)
+            elif self.coarse_dim:
+                # 低维向量粗检索多取候选，再用全维度向量精确重排
+                results = self._chroma_query(truncate_embedding(query_embedding, self.coarse_dim),
+                                             top_k * MATRYOSHKA_CANDIDATES, source, languages)
+                self._rescore(results, query_embedding, top_k)
+            else:
+                # 在ChromaDB中搜索
+                results = self._chroma_query(query_embedding, top_k, source, languages)
             
             # 处理结果
             documents = []
-            if results['documents'] and results['documents'][0]:
-                print(f"原始搜索结果数量: {len(results['documents'][0])}")
-                for i, (doc, metadata, distance) in enumerate(zip(
-                    results['documents'][0],
+            if results['ids'] and results['ids'][0]:
+                print(f"原始搜索结果数量: {len(results['ids'][0])}")
+                for i, (doc_id, metadata, distance) in enumerate(zip(
+                    results['ids'][0],
                     results['metadatas'][0],
                     results['distances'][0]
                 )):
                     # 计算相似度分数（距离越小，相似度越高）
-                    similarity = 1 - distance
+                    similarity = distance_to_similarity(distance, self.space)
                     
                     print(f"文档 {i+1}: 相似度={similarity:.3f}, 阈值={threshold:.3f}, 距离={distance:.3f}")
                     
                     if similarity >= threshold:
-                        documents.append({
-                            'content': doc,
-                            'metadata': metadata,
-                            'similarity': similarity,
-                            'distance': distance
-                        })
+                        documents.append(Hit(doc_id, metadata, similarity, distance))
                     else:
                         print(f"  文档 {i+1} 相似度低于阈值，已过滤")
+                
+                # 只读取通过阈值的文本块内容
+                texts = self._fetch_texts([doc.id for doc in documents])
+                for doc, text in zip(documents, texts):
+                    doc.content = text
+                documents = [doc for doc in documents if doc.content is not None]
             else:
                 print("ChromaDB返回空结果")
             
@@ -161,6 +590,215 @@ class VectorStore:
             print(f"搜索文档时出错: {e}")
             return []
     
+    def _chroma_query(self, query_embedding: List[float], n_results: int, source: str = "",
+                      languages: Optional[List[str]] = None) -> Dict[str, Any]:
+        """在ChromaDB中检索，限定语言且存在对应分区索引时只搜索这些分区
+        
+        只返回ID、元数据和距离，文本由search_by_embedding在过滤后读取。
+        """
+        include = ['metadatas', 'distances']
+        partitions = [self.partition_collections.get(language) for language in languages or []]
+        if partitions and all(partitions):
+            where = build_where(source)
+            per_partition = [collection.query(query_embeddings=[query_embedding], n_results=n_results,
+                                              where=where, include=include)
+                             for collection in partitions]
+            return self._merge_results(per_partition, n_results)
+        
+        return self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=build_where(source, languages),
+            include=include
+        )
+    
+    @staticmethod
+    def _merge_results(results_list: List[Dict[str, Any]], n_results: int) -> Dict[str, Any]:
+        """按距离合并多个分区的检索结果"""
+        rows = []
+        for results in results_list:
+            if results['ids'] and results['ids'][0]:
+                rows.extend(zip(results['ids'][0], results['metadatas'][0], results['distances'][0]))
+        rows.sort(key=lambda row: row[2])
+        rows = rows[:n_results]
+        return {
+            'ids': [[row[0] for row in rows]],
+            'metadatas': [[row[1] for row in rows]],
+            'distances': [[row[2] for row in rows]]
+        }
+    
+    def _rescore(self, results: Dict[str, Any], query_embedding: List[float], top_k: int) -> None:
+        """用全维度向量的余弦相似度重排粗检索结果，原地保留前top_k个
+        
+        重排后的距离按当前距离空间表示，缺少全维度向量的候选保留粗检索距离。
+        """
+        if not results['ids'] or not results['ids'][0]:
+            return
+        
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        
+        distances = []
+        for full, coarse_distance in zip(self.full_vectors.get(results['ids'][0]), results['distances'][0]):
+            if full is None:
+                distances.append(coarse_distance)
+                continue
+            cosine = float(full @ query) / max(float(np.linalg.norm(full)), 1e-12)
+            distances.append(similarity_to_distance(cosine, self.space))
+        
+        order = sorted(range(len(distances)), key=lambda i: distances[i])[:top_k]
+        for key in ('ids', 'metadatas'):
+            results[key][0] = [results[key][0][i] for i in order]
+        results['distances'][0] = [distances[i] for i in order]
+    
+    def _binary_query(self, query_embedding: List[float], top_k: int, source: str = "",
+                      languages: Optional[List[str]] = None) -> Dict[str, Any]:
+        """二值编码汉明距离预筛 + 全精度余弦重排，返回与collection.query相同格式的结果"""
+        filters = {}
+        if source:
+            filters['source'] = [source]
+        if languages:
+            filters['language'] = languages
+        candidate_ids = self.binary_index.candidates(query_embedding, top_k * BINARY_CANDIDATES, filters)
+        if not candidate_ids:
+            return {'ids': [[]], 'metadatas': [[]], 'distances': [[]]}
+        
+        # 只读取候选的全精度向量
+        if self.coarse_dim:
+            pairs = [(doc_id, vector) for doc_id, vector in zip(candidate_ids, self.full_vectors.get(candidate_ids))
+                     if vector is not None]
+        else:
+            stored = self.collection.get(ids=candidate_ids, include=['embeddings'])
+            pairs = list(zip(stored['ids'], stored['embeddings']))
+        
+        ranked = cosine_rescore(query_embedding, np.asarray([vector for _, vector in pairs], dtype=np.float32), top_k)
+        ids = [pairs[i][0] for i, _ in ranked]
+        
+        stored = self.collection.get(ids=ids, include=['metadatas'])
+        by_id = dict(zip(stored['ids'], stored['metadatas']))
+        hits = [(pairs[i][0], similarity) for i, similarity in ranked if pairs[i][0] in by_id]
+        
+        return {
+            'ids': [[doc_id for doc_id, _ in hits]],
+            'metadatas': [[by_id[doc_id] for doc_id, _ in hits]],
+            'distances': [[similarity_to_distance(similarity, self.space) for _, similarity in hits]]
+        }
+    
+    def _iter_full_vectors(self):
+        """分页读取全部全维度向量及其来源、语言标签，用于构建二值索引"""
+        if self.coarse_dim:
+            for page_ids, vectors in self.full_vectors.pages(MIGRATION_BATCH_SIZE):
+                stored = self.collection.get(ids=page_ids, include=['metadatas'])
+                by_id = dict(zip(stored['ids'], stored['metadatas']))
+                yield page_ids, vectors, [self._labels(by_id.get(doc_id) or {}) for doc_id in page_ids]
+            return
+        total = self.collection.count()
+        for offset in range(0, total, MIGRATION_BATCH_SIZE):
+            page = self.collection.get(include=['embeddings', 'metadatas'], limit=MIGRATION_BATCH_SIZE, offset=offset)
+            yield (page['ids'], np.asarray(page['embeddings'], dtype=np.float32),
+                   [self._labels(metadata) for metadata in page['metadatas']])
+    
+    @staticmethod
+    def _labels(metadata: Dict[str, Any]) -> Dict[str, List[str]]:
+        """二值索引中用于过滤的标签"""
+        return {'source': metadata_sources(metadata), 'language': metadata_languages(metadata)}
+    
+    def _invalidate_indexes(self) -> None:
+        """向量或文本变更后，标记内存中的辅助索引需要重建，并更新知识库版本号通知只读副本"""
+        self.lexical_index.invalidate()
+        self.binary_index.invalidate()
+        self._write_version()
+    
+    def _writable(self, action: str) -> bool:
+        """只读副本不执行写入操作"""
+        if self.read_only:
+            print(f"只读副本不能{action}，请在写入节点执行（python main.py --rebuild 或 --watch）")
+            return False
+        return True
+    
+    def _read_version(self) -> str:
+        """读取写入节点记录的知识库版本号，从未写入过时为空字符串"""
+        try:
+            with open(self.version_path, 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        except OSError:
+            return ""
+    
+    def _write_version(self) -> None:
+        """写入新的知识库版本号（先写临时文件再原子替换）"""
+        self.index_version = str(time.time_ns())
+        os.makedirs(os.path.dirname(self.version_path) or ".", exist_ok=True)
+        tmp_path = self.version_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.index_version)
+        os.replace(tmp_path, self.version_path)
+    
+    def refresh_if_changed(self, interval: float = CHROMA_REFRESH_SECONDS) -> bool:
+        """只读副本每隔interval秒检查一次知识库版本，写入节点更新过知识库时重新打开集合和旁路存储
+        
+        写入节点重建知识库时会删除并重新创建集合，副本持有的旧集合随之失效，需要按名称重新打开。
+        返回是否刷新（调用方据此清空检索结果和回答缓存）。
+        """
+        if not self.read_only or time.monotonic() - self._version_checked < interval:
+            return False
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            self._version_checked = time.monotonic()
+            version = self._read_version()
+            if version == self.index_version:
+                return False
+            self.collection = self.client.get_collection(COLLECTION_NAME)
+            self.space = self._collection_space()
+            self.coarse_dim = self._collection_coarse_dim()
+            self.external_text = self._collection_external_text()
+            self.partition_collections = self._open_partitions()
+            self.full_vectors.reload()
+            self.lexical_index.invalidate()
+            self.binary_index.invalidate()
+            self.index_version = version
+            self.refreshes += 1
+            print(f"知识库已由写入节点更新，重新打开集合: 版本 {version}")
+            return True
+        except Exception as e:
+            # 保留旧版本号，下次检查时重试
+            print(f"刷新向量存储时出错: {e}")
+            return False
+        finally:
+            self._refresh_lock.release()
+    
+    def lexical_search(self, query: str, top_k: int = TOP_K_RESULTS, source: str = "",
+                       languages: Optional[List[str]] = None) -> List[Hit]:
+        """不依赖嵌入服务的BM25词法检索"""
+        try:
+            predicate = None
+            if source or languages:
+                predicate = lambda metadata: matches(metadata, source, languages)
+            documents = self.lexical_index.search(query, top_k, predicate)
+            print(f"词法检索找到 {len(documents)} 个相关文档")
+            return documents
+        except Exception as e:
+            print(f"词法检索时出错: {e}")
+            return []
+    
+    def _fetch_texts(self, ids: List[str]) -> List[Optional[str]]:
+        """按ID读取文本块内容，不存在的ID对应None"""
+        if not ids:
+            return []
+        if self.external_text:
+            return self.chunk_store.get(ids)
+        stored = self.collection.get(ids=ids, include=['documents'])
+        by_id = dict(zip(stored['ids'], stored['documents']))
+        return [by_id.get(doc_id) for doc_id in ids]
+    
+    def _load_all_documents(self):
+        """读取集合中的全部文本和元数据，用于构建词法索引"""
+        if self.external_text:
+            results = self.collection.get(include=['metadatas'])
+            return results['ids'], self.chunk_store.get(results['ids']), results['metadatas']
+        results = self.collection.get(include=['documents', 'metadatas'])
+        return results['ids'], results['documents'], results['metadatas']
+    
     def get_collection_info(self) -> Dict[str, Any]:
         """获取集合信息"""
         try:
@@ -168,20 +806,210 @@ class VectorStore:
             return {
                 'name': COLLECTION_NAME,
                 'document_count': count,
-                'path': CHROMA_DB_PATH
+                'path': self.db_path,
+                'mode': self.mode,
+                'read_only': self.read_only,
+                'index_version': self.index_version,
+                'space': self.space,
+                'coarse_dim': self.coarse_dim,
+                'chunk_store': self.external_text,
+                'chunk_store_bytes': self.chunk_store.nbytes() if self.external_text else 0,
+                'partitions': {language: collection.count()
+                               for language, collection in self.partition_collections.items()}
             }
         except Exception as e:
             print(f"获取集合信息时出错: {e}")
             return {}
     
+    def _collection_space(self) -> str:
+        """当前集合的距离空间（未指定时为ChromaDB默认的l2）"""
+        return (self.collection.metadata or {}).get("hnsw:space", "l2")
+    
+    def _has_filter_metadata(self) -> bool:
+        """集合中的文档是否带有来源/语言过滤元数据（旧版本构建的知识库没有）"""
+        sample = self.collection.get(limit=1, include=['metadatas'])
+        if not sample['metadatas']:
+            return True
+        metadata = sample['metadatas'][0] or {}
+        return 'language' in metadata and has_membership_metadata(metadata)
+    
+    def _partition_name(self, language: str) -> str:
+        """语言分区索引的集合名"""
+        return f"{COLLECTION_NAME}_{language}"
+    
+    def _open_partitions(self) -> Dict[str, Any]:
+        """打开已存在的语言分区索引"""
+        if not PARTITION_INDEXES_ENABLED:
+            return {}
+        partitions = {}
+        for language in known_languages():
+            try:
+                partitions[language] = self.client.get_collection(self._partition_name(language))
+            except Exception:
+                pass
+        return partitions
+    
+    def _add_to_partitions(self, ids: List[str], documents: Optional[List[str]], embeddings: List[List[float]],
+                           metadatas: List[Dict[str, Any]]) -> None:
+        """把文档同时写入所属语言分区的索引（文本存放在文本块存储中时documents为None）"""
+        if not PARTITION_INDEXES_ENABLED:
+            return
+        
+        # 合并了多个来源的文本块写入每个来源所属的分区
+        groups: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            for language in metadata_languages(metadata):
+                groups.setdefault(language, []).append(i)
+        
+        for language, rows in groups.items():
+            collection = self.partition_collections.get(language)
+            if collection is None:
+                collection = self.client.get_or_create_collection(
+                    name=self._partition_name(language),
+                    metadata=collection_metadata(coarse_dim=self.coarse_dim, external_text=self.external_text)
+                )
+                self.partition_collections[language] = collection
+            collection.upsert(
+                ids=[ids[i] for i in rows],
+                documents=[documents[i] for i in rows] if documents is not None else None,
+                embeddings=[embeddings[i] for i in rows],
+                metadatas=[metadatas[i] for i in rows]
+            )
+    
+    def _drop_partitions(self) -> None:
+        """删除全部语言分区索引"""
+        for language in known_languages():
+            try:
+                self.client.delete_collection(self._partition_name(language))
+            except Exception:
+                pass
+        self.partition_collections = {}
+    
+    def _rebuild_partitions(self, batch_size: int = MIGRATION_BATCH_SIZE) -> None:
+        """按主集合的内容重建语言分区索引"""
+        self._drop_partitions()
+        if not PARTITION_INDEXES_ENABLED:
+            return
+        include = ['embeddings', 'metadatas'] if self.external_text else ['embeddings', 'documents', 'metadatas']
+        total = self.collection.count()
+        for offset in range(0, total, batch_size):
+            page = self.collection.get(include=include, limit=batch_size, offset=offset)
+            documents = None if self.external_text else page['documents']
+            self._add_to_partitions(page['ids'], documents, list(page['embeddings']), page['metadatas'])
+        counts = {language: collection.count() for language, collection in self.partition_collections.items()}
+        print(f"语言分区索引重建完成: {counts}")
+    
+    @staticmethod
+    def _with_filter_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """为旧版本构建的文档补充语言分区和来源/语言过滤元数据"""
+        if 'language' not in metadata:
+            metadata = dict(metadata, language=source_language(metadata.get('source', '')))
+        if not has_membership_metadata(metadata):
+            metadata = dict(metadata, **membership_metadata(metadata_sources(metadata), metadata_languages(metadata)))
+        return metadata
+    
+    def _collection_coarse_dim(self) -> int:
+        """当前集合中向量的截断维度，存储全维度向量时为0"""
+        return int((self.collection.metadata or {}).get("matryoshka_dim", 0))
+    
+    def _collection_external_text(self) -> bool:
+        """当前集合的文本是否存放在文本块存储中（旧版本构建的集合存放在ChromaDB中）"""
+        return bool((self.collection.metadata or {}).get("chunk_store", False))
+    
+    def migrate_collection(self, batch_size: int = MIGRATION_BATCH_SIZE) -> bool:
+        """按配置的距离空间和HNSW参数重建现有集合，复用已存储的向量，不重新调用嵌入接口"""
+        if not self._writable("迁移索引"):
+            return False
+        temp_name = f"{COLLECTION_NAME}_migrating"
+        try:
+            total = self.collection.count()
+            target_dim = configured_coarse_dim()
+            print(f"开始迁移集合 {COLLECTION_NAME}: {self.space} -> {HNSW_SPACE}，"
+                  f"粗检索维度 {self.coarse_dim} -> {target_dim}，共 {total} 个向量")
+            
+            # 清理上次中断留下的临时集合
+            try:
+                self.client.delete_collection(temp_name)
+            except Exception:
+                pass
+            
+            target = self.client.create_collection(name=temp_name, metadata=collection_metadata())
+            include = ['embeddings', 'metadatas'] if self.external_text else ['embeddings', 'documents', 'metadatas']
+            for offset in range(0, total, batch_size):
+                page = self.collection.get(include=include, limit=batch_size, offset=offset)
+                embeddings = self._migration_embeddings(page['ids'], page['embeddings'], target_dim)
+                if embeddings is None:
+                    raise ValueError("旁路存储缺少全维度向量，无法迁移，请运行 python main.py --rebuild")
+                texts = self.chunk_store.get(page['ids']) if self.external_text else page['documents']
+                if None in texts:
+                    raise ValueError("文本块存储缺少文本，无法迁移，请运行 python main.py --rebuild")
+                if CHUNK_STORE_ENABLED and not self.external_text:
+                    self.chunk_store.put(page['ids'], texts)
+                target.add(
+                    ids=page['ids'],
+                    embeddings=embeddings,
+                    documents=None if CHUNK_STORE_ENABLED else texts,
+                    metadatas=[self._with_filter_metadata(metadata) for metadata in page['metadatas']]
+                )
+                print(f"已迁移 {min(offset + batch_size, total)}/{total} 个向量")
+            if target_dim and not self.coarse_dim:
+                self.full_vectors.compact()
+            
+            # 新索引完整写入后再替换旧集合
+            self.client.delete_collection(COLLECTION_NAME)
+            target.modify(name=COLLECTION_NAME)
+            self.collection = self.client.get_collection(COLLECTION_NAME)
+            self.space = self._collection_space()
+            if self.coarse_dim and not target_dim:
+                self.full_vectors.clear()
+            self.coarse_dim = target_dim
+            if self.external_text and not CHUNK_STORE_ENABLED:
+                self.chunk_store.clear()
+            self.external_text = CHUNK_STORE_ENABLED
+            self._rebuild_partitions()
+            self._invalidate_indexes()
+            
+            print(f"集合迁移完成: 距离空间={self.space}, 粗检索维度={self.coarse_dim}, "
+                  f"文本块存储={self.external_text}, 向量数={self.collection.count()}")
+            return True
+        except Exception as e:
+            print(f"迁移集合时出错: {e}")
+            return False
+    
+    def _migration_embeddings(self, ids: List[str], stored: Any, target_dim: int) -> Optional[List[List[float]]]:
+        """迁移时写入新集合的向量，必要时在全维度和低维之间转换"""
+        if self.coarse_dim:
+            # 现有集合只存了低维向量，从旁路存储取回全维度向量
+            full = self.full_vectors.get(ids)
+            if any(vector is None for vector in full):
+                return None
+            full = [vector.tolist() for vector in full]
+        else:
+            full = [list(vector) for vector in stored]
+            if target_dim:
+                self.full_vectors.add(ids, full)
+        
+        if target_dim:
+            return [truncate_embedding(vector, target_dim) for vector in full]
+        return full
+    
     def clear_collection(self) -> bool:
         """清空集合"""
+        if not self._writable("清空集合"):
+            return False
         try:
             self.client.delete_collection(COLLECTION_NAME)
+            self._drop_partitions()
             self.collection = self.client.create_collection(
                 name=COLLECTION_NAME,
-                metadata={"description": "MCP知识库向量存储"}
+                metadata=collection_metadata()
             )
+            self.space = HNSW_SPACE
+            self.full_vectors.clear()
+            self.coarse_dim = configured_coarse_dim()
+            self.chunk_store.clear()
+            self.external_text = CHUNK_STORE_ENABLED
+            self._invalidate_indexes()
             print("集合已清空")
             return True
         except Exception as e:
@@ -202,6 +1030,6 @@ if __name__ == "__main__":
     
     for i, result in enumerate(results):
         print(f"\n=== 结果 {i+1} ===")
-        print(f"相似度: {result['similarity']:.3f}")
-        print(f"来源: {result['metadata']['source']}")
-        print(f"内容预览: {result['content'][:200]}...") 
\ No newline at end of file
+        print(f"相似度: {result.similarity:.3f}")
+        print(f"来源: {result.source}")
+        print(f"内容预览: {result.content[:200]}...") 
\ No newline at end of file
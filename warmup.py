@@ -0,0 +1,74 @@
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from config import *
+from batch_query import BatchRunner, iter_questions
+from partitions import LANGUAGE_AUTO
+from query_log import log_files, read_query_log
+from single_flight import normalize_text
+
+# 预热在准入控制中使用的客户端ID（后台优先级，不影响交互请求）
+WARMUP_CLIENT_ID = "warmup"
+
+
+def _item_key(item: Dict[str, Any]) -> tuple:
+    """与回答缓存相同的判重方式：忽略大小写和多余空白，区分回答模式和检索范围"""
+    return (normalize_text(item['query'], casefold=True), item.get('mode', ANSWER_MODE),
+            item.get('source', ""), item.get('language', LANGUAGE_AUTO))
+
+
+def popular_queries(path: str = WARMUP_QUERIES_PATH, use_query_log: bool = WARMUP_FROM_QUERY_LOG,
+                    top_n: int = WARMUP_TOP_N, log_paths: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """预热问题：常见问题文件中的问题在前，再按查询日志中成功请求的出现次数从高到低补足top_n个
+
+    log_paths默认为QUERY_LOG_PATH及其轮转文件。
+    """
+    items = []
+    seen = set()
+
+    def add(item: Dict[str, Any]) -> None:
+        key = _item_key(item)
+        if key not in seen:
+            seen.add(key)
+            items.append(item)
+
+    if path and os.path.exists(path):
+        for item in iter_questions(path):
+            add(item)
+
+    if use_query_log:
+        counts = Counter()
+        examples = {}
+        for record in read_query_log(log_files() if log_paths is None else log_paths):
+            if record.get('status') != 200 or not record.get('success'):
+                continue
+            item = {
+                'id': f"log:{len(examples)}",
+                'query': record['query'],
+                'mode': record.get('mode') or ANSWER_MODE,
+                'source': record.get('source', ""),
+                'language': record.get('language') or LANGUAGE_AUTO
+            }
+            key = _item_key(item)
+            counts[key] += 1
+            examples.setdefault(key, item)
+        for key, _ in counts.most_common():
+            add(examples[key])
+
+    return items[:top_n]
+
+
+def warm_up(rag, items: List[Dict[str, Any]], concurrency: int = WARMUP_CONCURRENCY,
+            answers: bool = WARMUP_ANSWERS) -> Dict[str, Any]:
+    """以有限并发执行预热问题，结果写入查询向量、检索结果和回答缓存
+
+    answers为False时只执行检索，不调用LLM。
+    """
+    started = time.perf_counter()
+    runner = BatchRunner(rag, concurrency, retrieval_only=not answers, client_id=WARMUP_CLIENT_ID)
+    stats = runner.run_items(items)
+    stats['answers'] = answers
+    stats['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+    return stats
@@ -5,26 +5,97 @@ MCP RAG系统 Web界面
 基于FastAPI提供美观的Web界面，支持RAG知识库查询
 """
 
+import ipaddress
+import os
 import sys
 from pathlib import Path
-from fastapi import FastAPI, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Form, Request
+from fastapi.responses import HTMLResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 from typing import Optional
 import json
+import time
 
 # 添加当前目录到Python路径
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
 from rag_system import RAGSystem
+from admission import ClientRateLimiter, AdmissionRejected, PRIORITY_INTERACTIVE
+from deadline import Deadline
+from extractive import ANSWER_MODES
+from partitions import LANGUAGE_AUTO, LANGUAGE_ALL, known_languages
+from file_watcher import FileWatcher
+from query_log import QueryLog
+from prefetch import Prefetcher
 from config import *
 
 # 创建FastAPI应用
 app = FastAPI(title="MCP智能知识库助手")
 
-# 创建全局RAG系统实例
-rag_system = RAGSystem()
+# 创建全局RAG系统实例（多进程启动时各worker进程为只读副本，由主进程通过环境变量通知）
+rag_system = RAGSystem(read_only=CHROMA_READ_ONLY or os.environ.get(READ_ONLY_ENV) == "1")
+
+# 按客户端限流
+rate_limiter = ClientRateLimiter(CLIENT_RATE_LIMIT, CLIENT_RATE_BURST)
+
+# 监视文档目录，文件变化后增量更新向量（由main(watch=True)启动）
+file_watcher = FileWatcher(
+    str(rag_system.data_processor.txt_dir),
+    rag_system.reindex_files,
+    poll_interval=WATCH_POLL_INTERVAL,
+    debounce=WATCH_DEBOUNCE_SECONDS
+)
+
+# 采样记录查询（脱敏），供 replay_queries.py 回放压测
+query_log = QueryLog()
+
+# 用户输入过程中预先检索
+prefetcher = Prefetcher(rag_system)
+
+
+# 可信的反向代理地址
+trusted_proxies = [ipaddress.ip_network(proxy, strict=False) for proxy in TRUSTED_PROXIES]
+
+
+def is_trusted_proxy(host: str) -> bool:
+    """地址是否属于可信的反向代理"""
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in trusted_proxies)
+
+
+def get_client_id(request: Request) -> str:
+    """获取客户端标识
+
+    只有直接连接来自可信代理时才使用X-Forwarded-For：从右向左跳过可信代理，取第一个不可信的地址；
+    其他情况使用连接地址，客户端无法通过伪造该请求头绕过限流。
+    """
+    host = request.client.host if request.client else ""
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded or not is_trusted_proxy(host):
+        return host
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else host
+
+
+def rejected_response(error: AdmissionRejected) -> JSONResponse:
+    """准入控制拒绝时快速返回429/503并附带Retry-After"""
+    return JSONResponse(
+        status_code=error.status_code,
+        headers={"Retry-After": error.retry_after_header()},
+        content={
+            "success": False,
+            "message": f"服务繁忙（{error.reason}），请稍后重试。",
+            "sources": []
+        }
+    )
 
 
 def get_web_interface():
@@ -688,6 +759,7 @@ def get_web_interface():
                         placeholder="问我任何关于MCP协议的问题，我会基于知识库为您提供准确回答..."
                         rows="2"
                         onkeydown="handleKeyPress(event)"
+                        oninput="schedulePrefetch()"
                     ></textarea>
                     <button type="submit" class="send-button" id="sendButton">
                         <i class="fas fa-paper-plane"></i>
@@ -697,6 +769,40 @@ def get_web_interface():
         </div>
 
 <script>
+// 停止输入后预先检索，提交时查询向量和检索结果已在缓存中
+const PREFETCH_ENABLED = __PREFETCH_ENABLED__;
+const PREFETCH_DEBOUNCE_MS = __PREFETCH_DEBOUNCE_MS__;
+const PREFETCH_MIN_CHARS = __PREFETCH_MIN_CHARS__;
+let prefetchTimer = null;
+let prefetchController = null;
+let lastPrefetched = '';
+
+function schedulePrefetch() {
+    if (!PREFETCH_ENABLED) return;
+    clearTimeout(prefetchTimer);
+    prefetchTimer = setTimeout(prefetch, PREFETCH_DEBOUNCE_MS);
+}
+
+async function prefetch() {
+    const text = document.getElementById('messageInput').value.trim();
+    if (text.length < PREFETCH_MIN_CHARS || text === lastPrefetched) return;
+    lastPrefetched = text;
+
+    // 取消仍在进行的旧预取（服务端收到新预取后也会停止旧预取）
+    if (prefetchController) prefetchController.abort();
+    prefetchController = new AbortController();
+    try {
+        await fetch('/prefetch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+            body: 'message=' + encodeURIComponent(text),
+            signal: prefetchController.signal
+        });
+    } catch (error) {
+        // 预取失败或被取消不影响正常提交
+    }
+}
+
 function askExample(text) {
     document.getElementById('messageInput').value = text;
     submitMessage();
@@ -720,6 +826,10 @@ async function submitMessage() {
     const message = input.value.trim();
     if (!message) return;
 
+    // 提交后不再发起新的预取；进行中的相同查询会与本次请求合并
+    clearTimeout(prefetchTimer);
+    lastPrefetched = '';
+
     addMessage(message, 'user');
     input.value = '';
     showLoading(true);
@@ -735,7 +845,14 @@ async function submitMessage() {
             const result = await response.json();
             addMessage(result.message, 'assistant', result.sources);
         } else {
-            addMessage('抱歉，发生了错误，请稍后重试。', 'assistant');
+            let errorMessage = '抱歉，发生了错误，请稍后重试。';
+            if (response.status === 429 || response.status === 503) {
+                const result = await response.json().catch(() => null);
+                if (result && result.message) {
+                    errorMessage = result.message;
+                }
+            }
+            addMessage(errorMessage, 'assistant');
         }
     } catch (error) {
         console.error('Error:', error);
@@ -1003,7 +1120,16 @@ function showCopySuccess(button) {
     </body>
     </html>
     """
-    return html_content
+    return (html_content
+            .replace("__PREFETCH_ENABLED__", "true" if PREFETCH_ENABLED else "false")
+            .replace("__PREFETCH_DEBOUNCE_MS__", str(PREFETCH_DEBOUNCE_MS))
+            .replace("__PREFETCH_MIN_CHARS__", str(PREFETCH_MIN_CHARS)))
+
+
+@app.on_event("startup")
+async def warm_up_on_startup():
+    """服务启动后在后台预热常见问题，部署后的第一批请求即可命中缓存"""
+    rag_system.start_warm_up()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -1013,16 +1139,57 @@ async def index():
 
 
 @app.post("/chat")
-async def chat(message: str = Form(...)):
-    """处理聊天请求 - RAG系统查询"""
+async def chat(request: Request, message: str = Form(...), mode: str = Form(ANSWER_MODE),
+               source: str = Form(""), language: str = Form(LANGUAGE_AUTO)):
+    """处理聊天请求 - RAG系统查询
+
+    mode: auto（自动选择）/ llm（总是调用大模型）/ extractive（直接返回原文摘录）
+    source: 只检索指定的来源文件，如 mcp_rule_py.txt
+    language: auto（根据问题识别SDK语言）/ all（不过滤）/ spec / python / typescript
+    """
+    if mode not in ANSWER_MODES:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "success": False,
+                "message": f"不支持的回答模式: {mode}，可选值: {', '.join(ANSWER_MODES)}",
+                "sources": []
+            }
+        )
+
+    languages = [LANGUAGE_AUTO, LANGUAGE_ALL] + known_languages()
+    if language not in languages:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "success": False,
+                "message": f"不支持的语言分区: {language}，可选值: {', '.join(languages)}",
+                "sources": []
+            }
+        )
+
+    client_id = get_client_id(request)
+    # 整个请求的时间预算从收到请求时开始计算
+    deadline = Deadline(REQUEST_TIMEOUT_SECONDS)
+    started = time.perf_counter()
     try:
+        rate_limiter.check(client_id)
+
         # 检查知识库状态
         info = rag_system.get_knowledge_base_info()
 
+        # 只读副本不能构建知识库
+        if info.get('document_count', 0) == 0 and rag_system.vector_store.read_only:
+            return {
+                "success": False,
+                "message": "知识库为空，请先运行 python main.py --rebuild 构建知识库。",
+                "sources": []
+            }
+
         # 如果知识库为空，先构建知识库
         if info.get('document_count', 0) == 0:
             print("知识库为空，开始构建...")
-            success = rag_system.build_knowledge_base()
+            success = await run_in_threadpool(rag_system.build_knowledge_base)
             if not success:
                 return {
                     "success": False,
@@ -1030,14 +1197,21 @@ async def chat(message: str = Form(...)):
                     "sources": []
                 }
 
-        # 生成回答
-        result = rag_system.generate_response(message)
+        # 生成回答（在线程池中执行，避免阻塞事件循环，相同的并发问题会被合并）
+        result = await run_in_threadpool(rag_system.generate_response, message, 1000, client_id,
+                                         PRIORITY_INTERACTIVE, deadline, mode, source, language)
+        query_log.record(message, client_id, 200, round((time.perf_counter() - started) * 1000, 1),
+                         result, mode, source, language)
 
         if result['success']:
             return {
                 "success": True,
                 "message": result['response'],
-                "sources": result['sources']
+                "sources": [source.to_dict() for source in result['sources']],
+                "mode": result.get('mode'),
+                "highlights": result.get('highlights', []),
+                "filters": result.get('filters'),
+                "degraded": result.get('degraded', [])
             }
         else:
             return {
@@ -1046,6 +1220,11 @@ async def chat(message: str = Form(...)):
                 "sources": []
             }
 
+    except AdmissionRejected as e:
+        print(f"⚠️ 请求被拒绝 ({client_id}): {e.reason}")
+        query_log.record(message, client_id, e.status_code, round((time.perf_counter() - started) * 1000, 1),
+                         None, mode, source, language)
+        return rejected_response(e)
     except Exception as e:
         print(f"❌ RAG聊天处理失败: {str(e)}")
         return {
@@ -1055,6 +1234,52 @@ async def chat(message: str = Form(...)):
         }
 
 
+@app.post("/prefetch")
+async def prefetch(request: Request, message: str = Form(...), source: str = Form(""),
+                   language: str = Form(LANGUAGE_AUTO)):
+    """输入过程中预先生成查询向量并检索（页面在用户停止输入后调用）
+
+    同一客户端的新预取会使旧预取在下一阶段前停止；超出预取限流时返回429。
+    """
+    if not PREFETCH_ENABLED:
+        return {"success": False, "reason": "disabled"}
+    if language not in [LANGUAGE_AUTO, LANGUAGE_ALL] + known_languages():
+        return JSONResponse(status_code=400, content={"success": False, "reason": "invalid_language"})
+
+    client_id = get_client_id(request)
+    # 先登记本次预取，即使被限流，进行中的旧预取也已过期
+    generation = prefetcher.begin(client_id)
+    try:
+        prefetcher.rate_limiter.check(client_id)
+        if await request.is_disconnected():
+            return {"success": False, "reason": "cancelled"}
+        result = await run_in_threadpool(prefetcher.prefetch, client_id, generation, message, source, language)
+        return {"success": True, **result}
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            headers={"Retry-After": e.retry_after_header()},
+            content={"success": False, "reason": e.reason}
+        )
+    except Exception as e:
+        print(f"❌ 预取失败: {str(e)}")
+        return {"success": False, "reason": str(e)}
+
+
+@app.get("/stats")
+async def get_stats():
+    """获取运行时统计信息"""
+    stats = rag_system.get_runtime_stats()
+    stats['rate_limited'] = rate_limiter.limited
+    stats['file_watcher'] = file_watcher.get_stats()
+    stats['query_log'] = query_log.get_stats()
+    stats['prefetch'] = prefetcher.get_stats()
+    return {
+        "success": True,
+        "stats": stats
+    }
+
+
 @app.get("/info")
 async def get_info():
     """获取知识库信息"""
@@ -1071,8 +1296,8 @@ async def get_info():
         }
 
 
-def main():
-    """主函数 - 启动Web界面"""
+def main(watch: bool = WATCH_ENABLED):
+    """主函数 - 启动Web界面，watch为True时文档变化后自动增量更新知识库"""
     print("🚀 启动MCP知识库RAG系统Web界面...")
     print("🧠 基于阿里云百炼Qwen3-Embedding + 千问2.5-72B")
     print("📚 知识库: MCP协议相关文档")
@@ -1080,6 +1305,11 @@ def main():
     print("💡 功能: 智能问答、向量检索、知识库管理")
     print()
 
+    if watch and rag_system.vector_store.read_only:
+        print("⚠️ 只读副本不能增量更新知识库，未启动文件监视")
+    elif watch:
+        file_watcher.start()
+
     uvicorn.run(app, host="localhost", port=8000)
 
 